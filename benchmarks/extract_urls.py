@@ -0,0 +1,80 @@
+import argparse
+import re
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, "src")
+
+from canrevan.parsing import extract_article_urls  # noqa: E402
+
+
+def _extract_article_urls_legacy(document: str, _: bool) -> List[str]:
+    # The previous implementation which slices the remaining document for each
+    # container. Note that it never ends if there is an empty container.
+    document = document[document.find('<ul class="type06_headline">') :]
+
+    list1 = document[: document.find("</ul>")]
+    list2 = document[document.find("</ul>") + 5 :]
+    list2 = list2[: list2.find("</ul>")]
+
+    document = list1 + list2
+
+    article_urls = []
+    while "<dt>" in document:
+        document = document[document.find("<dt>") :]
+        container = document[: document.find("</dt>")]
+
+        if not container.strip():
+            continue
+
+        article_urls.append(re.search(r'<a href="(.*?)"', container).group(1))
+        document = document[document.find("</dt>") :]
+
+    return article_urls
+
+
+def _measure(
+    extract_fn: Callable[[str, bool], List[str]], document: str, repeat: int
+) -> float:
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        extract_fn(document, False)
+    return (time.perf_counter() - start_time) / repeat * 1000
+
+
+def _main():
+    parser = argparse.ArgumentParser(
+        description="compare the article url extraction with the previous one"
+    )
+    parser.add_argument("--document", default="tests/resources/nav_html")
+    parser.add_argument("--repeat", default=200, type=int)
+    parser.add_argument(
+        "--scales",
+        default=[1, 10, 50],
+        type=int,
+        nargs="+",
+        help="number of times to repeat the article list in the page",
+    )
+    args = parser.parse_args()
+
+    with open(args.document, "r", encoding="utf-8") as fp:
+        document = fp.read()
+
+    # Enlarge the article list to show how the extraction time grows with the page
+    # size.
+    start = document.find('<ul class="type06_headline">')
+    begin, end = document.find("<li>", start), document.find("</ul>", start)
+    for scale in args.scales:
+        page = document[:begin] + document[begin:end] * scale + document[end:]
+
+        legacy = _measure(_extract_article_urls_legacy, page, args.repeat)
+        current = _measure(extract_article_urls, page, args.repeat)
+        print(
+            f"[*] {len(page) / 1024:.0f}KB page: legacy {legacy:.3f}ms, "
+            f"current {current:.3f}ms ({legacy / current:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+import random
+import re
+from multiprocessing.connection import Connection
+from typing import Dict, Tuple
+
+from aiohttp import web
+
+NAV_HTML_PATH = "tests/resources/nav_html"
+ARTICLE_HTML_PATH = "tests/resources/articles/naver_html"
+
+
+def _create_app(
+    latency: float, error_rate: float, max_concurrency: int, last_page: int
+) -> web.Application:
+    with open(NAV_HTML_PATH, "r", encoding="utf-8") as fp:
+        nav_html = fp.read()
+    with open(ARTICLE_HTML_PATH, "rb") as fp:
+        article_html = fp.read()
+
+    in_flight = 0
+
+    # Serve the recorded pages with the simulated latency, temporary errors and
+    # throttling of the concurrent requests.
+    async def simulate(request: web.Request, handler) -> web.Response:
+        nonlocal in_flight
+        if max_concurrency and in_flight >= max_concurrency:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+
+        in_flight += 1
+        try:
+            if latency:
+                await asyncio.sleep(random.uniform(0.5, 1.5) * latency)
+            if random.random() < error_rate:
+                return web.Response(status=503)
+            return await handler(request)
+        finally:
+            in_flight -= 1
+
+    # The recorded navigation page is rewritten for each date and page, so every
+    # page links different articles on the stub server. The out-of-range pages
+    # repeat the last page like Naver news.
+    async def handle_nav(request: web.Request) -> web.Response:
+        date = request.query.get("date", "20200101")
+        page = min(int(request.query.get("page", "1")), last_page)
+        aids: Dict[str, str] = {}
+
+        def replace_aid(match: re.Match) -> str:
+            if match.group(1) not in aids:
+                aids[match.group(1)] = (
+                    f"{int(date) % 10**6:06d}{page:02d}{len(aids):02d}"
+                )
+            return f"aid={aids[match.group(1)]}"
+
+        document = nav_html.replace("https://news.naver.com", f"http://{request.host}")
+        document = re.sub(r"aid=(\d+)", replace_aid, document)
+        return web.Response(text=document, content_type="text/html")
+
+    async def handle_article(request: web.Request) -> web.Response:
+        return web.Response(
+            body=article_html, content_type="text/html", charset="utf-8"
+        )
+
+    app = web.Application(middlewares=[web.middleware(simulate)])
+    app.router.add_get("/main/list.nhn", handle_nav)
+    app.router.add_get("/main/read.nhn", handle_article)
+    return app
+
+
+def _serve(conn: Connection, *args):
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(_create_app(*args), access_log=None)
+    loop.run_until_complete(runner.setup())
+
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+
+    conn.send(site._server.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+def start_stub_server(
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    max_concurrency: int = 0,
+    last_page: int = 10,
+) -> Tuple[str, multiprocessing.Process]:
+    # Run the server in a separate process, so it neither competes with the crawler
+    # for the event loop nor is counted in the resource usage of the crawler.
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=_serve,
+        args=(child_conn, latency, error_rate, max_concurrency, last_page),
+        daemon=True,
+    )
+    process.start()
+    return f"http://127.0.0.1:{parent_conn.recv()}", process
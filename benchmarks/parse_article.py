@@ -0,0 +1,41 @@
+import argparse
+import glob
+import sys
+import time
+
+sys.path.insert(0, "src")
+
+from canrevan.parsing import PARSER_BACKENDS  # noqa: E402
+
+
+def _main():
+    parser = argparse.ArgumentParser(
+        description="measure the article extraction time of each parser backend"
+    )
+    parser.add_argument(
+        "documents",
+        nargs="*",
+        default=sorted(glob.glob("tests/resources/articles/*")),
+        help="saved article html files",
+    )
+    parser.add_argument("--repeat", default=200, type=int)
+    args = parser.parse_args()
+
+    documents = []
+    for path in args.documents:
+        with open(path, "r", encoding="utf-8") as fp:
+            documents.append(fp.read())
+
+    for backend, extract_fn in sorted(PARSER_BACKENDS.items()):
+        start_time = time.perf_counter()
+        for _ in range(args.repeat):
+            for document in documents:
+                extract_fn(document)
+        elapsed = time.perf_counter() - start_time
+
+        per_document = elapsed / (args.repeat * len(documents)) * 1000
+        print(f"[*] {backend}: {per_document:.3f}ms per document")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import threading
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, "src")
+
+from canrevan.crawling import Crawler  # noqa: E402
+
+
+def _start_stub_server() -> str:
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=request.query.get("aid", ""))
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handle)
+
+    # Run the stub server in a background thread with its own event loop.
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app, access_log=None)
+    loop.run_until_complete(runner.setup())
+
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+def _main():
+    parser = argparse.ArgumentParser(
+        description="measure the peak memory of the crawling scheduler"
+    )
+    parser.add_argument("--num_urls", default=1000000, type=int)
+    parser.add_argument("--max_jobs", default=500, type=int)
+    args = parser.parse_args()
+
+    address = _start_stub_server()
+    urls = (f"{address}/read.nhn?aid={i}" for i in range(args.num_urls))
+
+    # Write the responses to the null device to measure the scheduler only.
+    with Crawler(concurrent_tasks=args.max_jobs, request_timeout=30) as crawler:
+        start_time = time.time()
+        written = crawler.reduce_to_file(urls, os.devnull, False)
+        elapsed = time.time() - start_time
+        stats = crawler.connection_stats
+
+    # Note that `ru_maxrss` is reported in kilobytes on Linux.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"[*] crawled urls: {written}")
+    print(f"[*] elapsed time: {elapsed:.2f}s ({written / elapsed:.2f} urls/s)")
+    print(f"[*] peak rss: {peak_rss:.2f}MB")
+    print(
+        f"[*] connections: {stats['connections_created']} created, "
+        f"{stats['connections_reused']} reused"
+    )
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from naver_stub import start_stub_server
+
+
+def _measure(command: List[str], repeat: int) -> float:
+    # Run the command in a new interpreter each time, since the startup cost is
+    # paid once per process.
+    env = dict(os.environ, PYTHONPATH="src")
+    elapsed = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run(command, env=env, check=True, capture_output=True)
+        elapsed.append(time.perf_counter() - start_time)
+    return statistics.median(elapsed) * 1000
+
+
+def _main():
+    parser = argparse.ArgumentParser(
+        description="measure the startup time of the command and short crawlings"
+    )
+    parser.add_argument("--repeat", default=5, type=int)
+    parser.add_argument("--num_cores", default=4, type=int)
+    parser.add_argument("--max_page", default=1, type=int)
+    args = parser.parse_args()
+
+    print(
+        f"[*] import: "
+        f"{_measure([sys.executable, '-c', 'import canrevan'], args.repeat):.0f}ms"
+    )
+
+    # Crawl a single navigation page group, which mostly consists of the startup
+    # of the command and the parsing processes, like the short incremental runs.
+    address, process = start_stub_server()
+    try:
+        with tempfile.TemporaryDirectory() as tdir:
+            command = [
+                sys.executable,
+                "-m",
+                "canrevan",
+                "--category",
+                "100",
+                "--start_date",
+                "20200501",
+                "--end_date",
+                "20200501",
+                "--max_page",
+                str(args.max_page),
+                "--num_cores",
+                str(args.num_cores),
+                "--base_url",
+                address,
+                "--output_path",
+                f"{tdir}/articles.txt",
+            ]
+            for name, options in [("fork", []), ("forkserver", ["--forkserver"])]:
+                elapsed = _measure(command + options, args.repeat)
+                print(f"[*] short crawling ({name}): {elapsed:.0f}ms")
+    finally:
+        process.terminate()
+        process.join()
+
+
+if __name__ == "__main__":
+    _main()
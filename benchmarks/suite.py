@@ -0,0 +1,304 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, "src")
+
+from naver_stub import ARTICLE_HTML_PATH, start_stub_server  # noqa: E402
+
+from canrevan import _main as canrevan_main  # noqa: E402
+from canrevan import parsing, prepare_nav_pages  # noqa: E402
+from canrevan.crawling import Crawler  # noqa: E402
+from canrevan.monitoring import Metrics  # noqa: E402
+from canrevan.planning import NavPlan  # noqa: E402
+from canrevan.writing import ShardedWriter  # noqa: E402
+
+
+def _create_crawler(args: argparse.Namespace, metrics: Metrics) -> Crawler:
+    return Crawler(
+        concurrent_tasks=args.max_jobs,
+        num_parsing_processes=args.num_cores,
+        request_timeout=30,
+        max_retries=args.max_retries,
+        retry_backoff=0.01,
+        metrics=metrics,
+    )
+
+
+def _nav_pages(args: argparse.Namespace, address: str) -> NavPlan:
+    return prepare_nav_pages(
+        args.category,
+        "20200501",
+        f"202005{args.num_days:02d}",
+        max_page=args.max_page,
+        base_url=address,
+    )
+
+
+def _run_nav(args: argparse.Namespace, address: str, metrics: Metrics) -> int:
+    with _create_crawler(args, metrics) as crawler:
+        pages = crawler.reduce_pages_to_array(
+            _nav_pages(args, address), False, parse_fn=parsing.extract_article_urls
+        )
+    return len(pages)
+
+
+def _run_article(args: argparse.Namespace, address: str, metrics: Metrics) -> int:
+    urls = (
+        f"{address}/main/read.nhn?mode=LSD&mid=shm&sid1=100&oid=001&aid={aid:010d}"
+        for aid in range(args.num_articles)
+    )
+
+    # Write the parsed contents to the null device to measure the crawling only.
+    with _create_crawler(args, metrics) as crawler:
+        with ShardedWriter(os.devnull) as writer:
+            return crawler.reduce_to_writer(
+                urls,
+                writer,
+                False,
+                parse_fn=partial(parsing.parse_article_content, backend=args.parser),
+            )
+
+
+def _run_pipeline(args: argparse.Namespace, address: str, metrics: Metrics) -> int:
+    # Run the command-line entry point as is, and collect its metrics from the last
+    # snapshot.
+    with tempfile.TemporaryDirectory() as tdir:
+        sys.argv = [
+            "canrevan",
+            "--base_url",
+            address,
+            "--category",
+            *map(str, args.category),
+            "--start_date",
+            "20200501",
+            "--end_date",
+            f"202005{args.num_days:02d}",
+            "--max_page",
+            str(args.max_page),
+            "--max_jobs",
+            str(args.max_jobs),
+            "--num_cores",
+            str(args.num_cores),
+            "--parser",
+            args.parser,
+            "--max_retries",
+            str(args.max_retries),
+            "--output_path",
+            f"{tdir}/articles.txt",
+            "--metrics_path",
+            f"{tdir}/metrics.jsonl",
+            "--metrics_interval",
+            "3600",
+        ] + (["--pipeline"] if args.pipeline else [])
+        canrevan_main()
+
+        with open(f"{tdir}/metrics.jsonl", "r") as fp:
+            snapshot = json.loads(fp.read().splitlines()[-1])
+        with open(f"{tdir}/articles.txt", "r") as fp:
+            written = len(fp.read().splitlines())
+
+    metrics.reported = snapshot
+    return written
+
+
+def _run_parse(args: argparse.Namespace, address: str, metrics: Metrics) -> int:
+    with open(ARTICLE_HTML_PATH, "r", encoding="utf-8") as fp:
+        document = fp.read()
+
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        parsing.parse_article_content(document, False, backend=args.parser)
+        metrics.observe("parse", time.perf_counter() - started)
+    return args.repeat
+
+
+SCENARIOS: Dict[str, Callable[[argparse.Namespace, str, Metrics], int]] = {
+    "nav": _run_nav,
+    "article": _run_article,
+    "pipeline": _run_pipeline,
+    "parse": _run_parse,
+}
+
+
+class _SampledMetrics(Metrics):
+    # Keep every observed latency to compute the exact percentiles, rather than the
+    # estimated ones from the histogram buckets.
+    def __init__(self):
+        super().__init__()
+        self.samples: Dict[str, List[float]] = {}
+
+        # The metrics snapshot reported by the entry point, which creates its own
+        # metrics.
+        self.reported: Optional[Dict] = None
+
+    def observe(self, name: str, value: float):
+        super().observe(name, value)
+        self.samples.setdefault(name, []).append(value)
+
+
+def _summarize_latencies(
+    metrics: _SampledMetrics, snapshot: Dict
+) -> Dict[str, Dict[str, float]]:
+    latencies = {
+        name: {
+            "count": len(samples),
+            "p50": statistics.median(samples),
+            "p99": (
+                statistics.quantiles(samples, n=100)[-1]
+                if len(samples) > 1
+                else samples[0]
+            ),
+        }
+        for name, samples in metrics.samples.items()
+    }
+
+    # The scenarios running in the entry point report the estimated percentiles
+    # from their metrics snapshots.
+    for name, histogram in snapshot["histograms"].items():
+        latencies.setdefault(
+            name,
+            {
+                "count": histogram["count"],
+                "p50": histogram["p50"],
+                "p99": histogram["p99"],
+            },
+        )
+    return latencies
+
+
+def _run_scenario(conn: Any, name: str, args: argparse.Namespace, address: str):
+    metrics = _SampledMetrics()
+
+    # The cpu times of the parsing processes are included in the children usage
+    # after they are joined.
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start_time = time.perf_counter()
+    items = SCENARIOS[name](args, address, metrics)
+    elapsed = time.perf_counter() - start_time
+    end_self = resource.getrusage(resource.RUSAGE_SELF)
+    end_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    snapshot = metrics.reported or metrics.snapshot()
+
+    # Note that `ru_maxrss` is reported in kilobytes on Linux.
+    conn.send(
+        {
+            "items": items,
+            "elapsed": elapsed,
+            "throughput": items / elapsed,
+            "cpu_main": (end_self.ru_utime + end_self.ru_stime)
+            - (usage_self.ru_utime + usage_self.ru_stime),
+            "cpu_workers": (end_children.ru_utime + end_children.ru_stime)
+            - (usage_children.ru_utime + usage_children.ru_stime),
+            "peak_rss_mb": end_self.ru_maxrss / 1024,
+            "peak_worker_rss_mb": end_children.ru_maxrss / 1024,
+            "latency": _summarize_latencies(metrics, snapshot),
+            "counters": snapshot["counters"],
+        }
+    )
+
+
+def _describe_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(results: Dict, baseline: Dict):
+    print(f"[*] compared with [{baseline['commit']}]")
+    for name, result in results["scenarios"].items():
+        if name in baseline["scenarios"]:
+            ratio = result["throughput"] / baseline["scenarios"][name]["throughput"]
+            print(f"    {name}: {ratio:.2f}x throughput")
+
+
+def _main():
+    parser = argparse.ArgumentParser(
+        description="run the offline benchmarks against the local naver stub server"
+    )
+    parser.add_argument(
+        "--scenarios", default=list(SCENARIOS), nargs="+", choices=list(SCENARIOS)
+    )
+    parser.add_argument("--output", default=None, help="json file to save results")
+    parser.add_argument("--compare", default=None, help="json results to compare")
+    parser.add_argument("--latency", default=0.01, type=float)
+    parser.add_argument("--error_rate", default=0.0, type=float)
+    parser.add_argument("--max_concurrency", default=0, type=int)
+    parser.add_argument("--category", default=[100, 101], type=int, nargs="+")
+    parser.add_argument("--num_days", default=5, type=int)
+    parser.add_argument("--max_page", default=10, type=int)
+    parser.add_argument("--last_page", default=5, type=int)
+    parser.add_argument("--num_articles", default=2000, type=int)
+    parser.add_argument("--max_jobs", default=100, type=int)
+    parser.add_argument("--num_cores", default=1, type=int)
+    parser.add_argument("--max_retries", default=3, type=int)
+    parser.add_argument("--parser", default="bs4", choices=["bs4", "lxml"])
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--repeat", default=200, type=int)
+    args = parser.parse_args()
+
+    address, server = start_stub_server(
+        args.latency, args.error_rate, args.max_concurrency, args.last_page
+    )
+
+    # Run each scenario in a fresh process, so the peak memory and cpu times are
+    # measured for the scenario only.
+    results = {
+        "commit": _describe_commit(),
+        "python": platform.python_version(),
+        "time": time.time(),
+        "config": vars(args),
+        "scenarios": {},
+    }
+    for name in args.scenarios:
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_run_scenario, args=(child_conn, name, args, address)
+        )
+        process.start()
+        result = results["scenarios"][name] = parent_conn.recv()
+        process.join()
+
+        print(
+            f"[*] {name}: {result['items']} items in {result['elapsed']:.2f}s "
+            f"({result['throughput']:.2f} items/s), "
+            f"cpu {result['cpu_main']:.2f}s + {result['cpu_workers']:.2f}s, "
+            f"peak rss {result['peak_rss_mb']:.2f}MB"
+        )
+        for stage, latency in sorted(result["latency"].items()):
+            print(
+                f"    {stage}: p50 {latency['p50'] * 1000:.2f}ms, "
+                f"p99 {latency['p99'] * 1000:.2f}ms"
+            )
+
+    server.terminate()
+    server.join()
+
+    if args.output is not None:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as fp:
+            _compare(results, json.load(fp))
+
+
+if __name__ == "__main__":
+    _main()
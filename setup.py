@@ -18,6 +18,11 @@ setup(
     packages=find_packages("src"),
     python_requires=">=3.6.0",
     install_requires=["tqdm>=4.46.0", "bs4", "lxml>=4.5.1", "aiohttp"],
+    extras_require={
+        "zstd": ["zstandard"],
+        "parquet": ["pyarrow>=7.0.0"],
+        "redis": ["redis>=3.0.0"],
+    },
     entry_points={"console_scripts": ["canrevan = canrevan:_main"]},
     classifiers=[
         "Environment :: Console",
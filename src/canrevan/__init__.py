@@ -1,11 +1,31 @@
 import argparse
-from typing import List
+import itertools
+import json
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
 
-import tqdm
+from . import normalizing, parsing, utils
+from .deduplicating import NearDuplicateIndex, deduplicate_output, sign_parsed
+from .indexing import ArticleIndex, CompletionIndex
+from .monitoring import Metrics, MetricsExporter
+from .planning import NAV_ORDERS, NavPlan, nav_group_pages
+from .writing import BackgroundWriter, ParquetWriter, ShardedWriter
 
-import parsing as parsing
-import utils as utils
-from crawling import Crawler
+# The modules which import the heavy dependencies (e.g. `aiohttp` and `tqdm`) or are
+# used in some modes only are imported when they are needed, so the command starts
+# quickly and the parsing processes do not import them.
+if TYPE_CHECKING:
+    from .crawling import Crawler
 
 DEFAULT_USER_AGENT_STRING = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -14,56 +34,593 @@ DEFAULT_USER_AGENT_STRING = (
     "Safari/537.36"
 )
 
+# The fields of the structured article records. The article id, category are parsed
+# from the article url and the others are extracted from the article page.
+ARTICLE_RECORD_SCHEMA = {
+    "url": "string",
+    "oid": "int64",
+    "aid": "int64",
+    "category": "int64",
+    "date": "string",
+    "press": "string",
+    "title": "string",
+    "content": "string",
+}
+
 
 def _main():
-    args = _create_argument_parser().parse_args()
+    parser = _create_argument_parser()
+    args = parser.parse_args()
+
+    # Check the normalization stages before crawling, rather than failing every
+    # article in the parsing processes.
+    try:
+        normalizing.build_normalizer(tuple(args.normalize))
+    except ValueError as e:
+        parser.error(str(e))
+
+    # The text output has no field to tag the near-duplicate articles.
+    if args.near_dup == "tag" and args.output_format == "text":
+        parser.error("--near_dup tag requires a structured --output_format")
+
+    # Parse the archived raw responses again without crawling.
+    if args.reparse:
+        if args.archive_path is None:
+            parser.error("--reparse requires --archive_path")
+        _reparse(args)
+        return
+
+    # The navigation pages are prepared by the coordinator if crawling from the
+    # shared work queue.
+    if (args.queue is None or args.coordinator) and (
+        not args.category or args.start_date is None or args.end_date is None
+    ):
+        parser.error("--category, --start_date and --end_date are required")
+
+    # Queue the navigation pages to the shared work queue and let the workers crawl
+    # them if running as a coordinator of the distributed crawling.
+    if args.coordinator:
+        if args.queue is None:
+            parser.error("--coordinator requires --queue")
+        _queue_nav_pages(args)
+        return
+
+    # Export the metrics of the crawling periodically to the snapshot file and/or
+    # through the prometheus endpoint.
+    metrics, exporter = Metrics(), None
+    if args.metrics_path is not None or args.metrics_port is not None:
+        exporter = MetricsExporter(
+            metrics,
+            snapshot_path=args.metrics_path,
+            interval=args.metrics_interval,
+            port=args.metrics_port,
+        )
+
+    # Archive the raw responses alongside the output if requested. The archive is
+    # appended across the crawlings.
+    archive = None
+    if args.archive_path is not None:
+        from .archiving import RawArchiveWriter
+
+        archive = RawArchiveWriter(args.archive_path)
+
+    # Cache the responses across the runs. The articles are cached forever, while
+    # the navigation pages are revalidated after their ttls.
+    cache = None
+    if args.cache_path is not None:
+        from .caching import HTTPCache, naver_cache_ttl
+
+        cache = HTTPCache(
+            args.cache_path,
+            max_bytes=args.cache_size << 20,
+            ttl_fn=partial(
+                naver_cache_ttl,
+                recent_ttl=args.recent_page_ttl,
+                past_ttl=args.past_page_ttl,
+            ),
+        )
 
     # Create a crawler for collecting article urls and news contents.
+    from .crawling import Crawler
+
     crawler = Crawler(
         concurrent_tasks=args.max_jobs,
         num_parsing_processes=args.num_cores,
         request_headers={"user-agent": args.user_agent},
         request_timeout=args.timeout,
+        parse_batch_size=args.parse_batch_size,
+        parse_batch_timeout=args.parse_batch_timeout,
+        inline_parse_bytes=args.inline_parse_bytes,
+        max_host_tasks=args.max_host_jobs,
+        max_requests_per_second=args.max_rps,
+        latency_threshold=args.latency_threshold,
+        max_retries=args.max_retries,
+        retry_backoff=args.retry_backoff,
+        max_host_connections=args.max_host_connections,
+        keepalive_timeout=args.keepalive_timeout,
+        dns_cache_ttl=args.dns_cache_ttl,
+        metrics=metrics,
+        profile_dir=args.profile_dir,
+        archive=archive,
+        cache=cache,
+        parse_initializer=partial(
+            parsing.warm_up_parser, args.parser, tuple(args.normalize)
+        ),
+        start_method="forkserver" if args.forkserver else None,
+        preload_modules=["canrevan.parsing", "bs4", "lxml.etree"],
     )
 
-    # Collect article urls from navigation pages.
-    nav_urls = _prepare_nav_urls(args)
-    print(f"[*] navigation pages: {len(nav_urls)}")
+    # Open the cross-run dedup index to skip the articles which are already stored
+    # in the previous runs.
+    dedup_index = None
+    if args.dedup_index is not None:
+        dedup_index = ArticleIndex(args.dedup_index)
+
+    # Open the near-duplicate index to drop or tag the articles whose contents are
+    # similar to the ones stored before (e.g. the same wire-service stories).
+    near_dup_index = _open_near_dup_index(args)
+
+    # Keep the session of the crawler across the crawling phases.
+    with crawler:
+        if args.queue is not None:
+            total_contents = _crawl_from_queue(
+                args, crawler, dedup_index, near_dup_index
+            )
+        else:
+            total_contents = _crawl_locally(args, crawler, dedup_index, near_dup_index)
+
+    if archive is not None:
+        archive.close()
+    if cache is not None:
+        cache.close()
+    if dedup_index is not None:
+        dedup_index.close()
+    if near_dup_index is not None:
+        near_dup_index.close()
+    if exporter is not None:
+        exporter.close()
+
+    stats = crawler.connection_stats
+    print(
+        f"[*] connections: {stats['connections_created']} created, "
+        f"{stats['connections_reused']} reused for {stats['requests']} requests"
+    )
+    print(
+        f"[*] finish crawling {total_contents} news articles to "
+        f"[{args.output_path}]"
+    )
+
+
+def _reparse(args: argparse.Namespace):
+    from .archiving import reparse_archive
+
+    # Parse the archived articles in parallel with the parser and output options of
+    # this run. The navigation pages in the archive are skipped.
+    near_dup_index = _open_near_dup_index(args)
+    parse_fn, format_fn, done_fn = _prepare_article_output(args, near_dup_index)
+    with _create_writer(args) as writer:
+        with _progress(desc="[*] reparse archived articles") as tbar:
+            total_contents = reparse_archive(
+                args.archive_path,
+                writer,
+                args.include_reporter_name,
+                parse_fn,
+                format_fn,
+                filter_fn=lambda url: utils.parse_article_id(url) is not None,
+                update_fn=tbar.update,
+                done_fn=done_fn,
+                num_processes=args.num_cores,
+            )
+
+    if near_dup_index is not None:
+        near_dup_index.close()
+
+    print(
+        f"[*] finish reparsing {total_contents} news articles to "
+        f"[{args.output_path}]"
+    )
+
+
+def _crawl_locally(
+    args: argparse.Namespace,
+    crawler: "Crawler",
+    dedup_index: Optional[ArticleIndex],
+    near_dup_index: Optional[NearDuplicateIndex] = None,
+) -> int:
+    # Open the completion index which records the finished navigation pages and
+    # articles. The completed ones are skipped if resuming the previous crawling.
+    index = CompletionIndex(f"{args.output_path}.index", resume=args.resume)
+
+    def is_new_article(url: str) -> bool:
+        if url in index.crawled:
+            return False
+        if dedup_index is not None:
+            article_id = utils.parse_article_id(url)
+            return article_id is None or article_id not in dedup_index
+        return True
+
+    # Plan the navigation pages of each category and date. The pages are navigated
+    # in order until the last page is reached. The groups are created lazily in the
+    # planned order while crawling, and the finished groups are skipped entirely.
+    nav_plan = _prepare_nav_pages(args)
+    nav_pages = (
+        pages
+        for pages in (
+            [url for url in pages if url not in index.navigated]
+            for pages in nav_plan
+            if pages[0] not in index.groups
+        )
+        if pages
+    )
+    print(f"[*] navigation page groups: {len(nav_plan)}")
+
+    # Create an output writer for the output format. The writer should be closed
+    # before the completion index, since the articles are marked as crawled after
+    # they are written.
+    writer = _create_writer(args)
+
+    # Record the navigation pages and the groups which are finished.
+    def nav_done_fn(url: str, article_urls: List[str]):
+        index.mark_navigated(url, article_urls)
+        _mark_finished_group(index, url, article_urls, args.max_page)
+
+    crawl_fn = _crawl_pipeline if args.pipeline else _crawl_in_phases
+    total_contents = crawl_fn(
+        args,
+        crawler,
+        writer,
+        nav_pages,
+        index,
+        nav_done_fn,
+        is_new_article,
+        near_dup_index,
+    )
+    writer.close()
+    index.close()
+
+    # Add the crawled articles (including the ones from the previous crawling if
+    # resumed) to the dedup index.
+    if dedup_index is not None:
+        dedup_index.update(
+            article_id
+            for article_id in map(utils.parse_article_id, index.crawled)
+            if article_id is not None
+        )
+
+    return total_contents
+
+
+def _mark_finished_group(
+    index: CompletionIndex, url: str, article_urls: List[str], max_page: int
+):
+    # The group is finished if all of its pages are navigated until the last page
+    # or the page which yields no new article, like the crawler stops navigating.
+    # Note that the out-of-range pages repeat the last page.
+    *previous, _ = pages = nav_group_pages(url)
+    if any(page not in index.navigated for page in previous):
+        return
+
+    visited = {article for page in previous for article in index.navigated[page]}
+    if len(pages) >= max_page or visited.issuperset(article_urls):
+        index.mark_group(pages[0])
+
+
+def _queue_nav_pages(args: argparse.Namespace):
+    from .distributing import open_work_queue
+
+    with open_work_queue(args.queue, lease_timeout=args.lease_timeout) as queue:
+        queued = queue.put(
+            "nav", (json.dumps(pages) for pages in _prepare_nav_pages(args))
+        )
+    print(f"[*] queued navigation page groups: {queued}")
+
 
-    with tqdm.tqdm(nav_urls, desc="[*] collect article urls") as tbar:
-        article_urls = crawler.reduce_to_array(
-            nav_urls, args.include_reporter_name, parse_fn=parsing.extract_article_urls, update_fn=tbar.update
+def _crawl_from_queue(
+    args: argparse.Namespace,
+    crawler: "Crawler",
+    dedup_index: Optional[ArticleIndex],
+    near_dup_index: Optional[NearDuplicateIndex] = None,
+) -> int:
+    from .distributing import crawl_from_queue, open_work_queue
+
+    # The work queue removes the duplicated articles across the workers, so only the
+    # dedup index is checked.
+    def is_new_article(url: str) -> bool:
+        if dedup_index is not None:
+            article_id = utils.parse_article_id(url)
+            return article_id is None or article_id not in dedup_index
+        return True
+
+    # Collect the ids of the crawled articles to add them to the dedup index. Note
+    # that they are collected from the writer thread.
+    crawled_ids = []
+
+    def done_fn(url: str):
+        article_id = utils.parse_article_id(url)
+        if article_id is not None:
+            crawled_ids.append(article_id)
+
+    # Each worker writes its own output. The writer should be closed before the
+    # work queue, since the articles are acknowledged after they are written.
+    parse_fn, format_fn, done_fn = _prepare_article_output(
+        args,
+        near_dup_index,
+        crawler.metrics,
+        done_fn=done_fn if dedup_index is not None else None,
+    )
+    with open_work_queue(args.queue, lease_timeout=args.lease_timeout) as queue:
+        writer = _create_writer(args)
+        with _progress(desc="[*] crawl news article contents") as tbar:
+            total_contents = crawl_from_queue(
+                crawler,
+                queue,
+                writer,
+                args.include_reporter_name,
+                extract_fn=parsing.extract_article_urls,
+                parse_fn=parse_fn,
+                format_fn=format_fn,
+                filter_fn=is_new_article,
+                update_fn=tbar.update,
+                done_fn=done_fn,
+                lease_size=args.lease_size,
+            )
+        writer.close()
+
+    if dedup_index is not None:
+        dedup_index.update(crawled_ids)
+
+    return total_contents
+
+
+def _crawl_in_phases(
+    args: argparse.Namespace,
+    crawler: "Crawler",
+    writer: BackgroundWriter,
+    nav_pages: Iterable[List[str]],
+    index: CompletionIndex,
+    nav_done_fn: Callable[[str, List[str]], None],
+    is_new_article: Callable[[str], bool],
+    near_dup_index: Optional[NearDuplicateIndex] = None,
+) -> int:
+    # Collect article urls from navigation pages.
+    with _progress(desc="[*] collect article urls", unit="page") as tbar:
+        article_urls = crawler.reduce_pages_to_array(
+            nav_pages,
+            args.include_reporter_name,
+            parse_fn=parsing.extract_article_urls,
+            update_fn=tbar.update,
+            done_fn=nav_done_fn,
         )
 
-    # Flatten the grouped urls and remove duplicates from the array.
-    article_urls = {url for urls in article_urls for url in urls}
+    # Flatten the grouped urls (including the ones from the navigated pages in the
+    # previous crawling) and remove duplicates and already-crawled articles. The
+    # duplicates are found by the article ids, which are more compact than the urls.
+    article_urls = {
+        utils.parse_article_id(url) or url: url
+        for urls in itertools.chain(article_urls, index.navigated.values())
+        for url in urls
+    }
+    article_urls = [url for url in article_urls.values() if is_new_article(url)]
     print(f"[*] total collected articles: {len(article_urls)}")
 
     # Crawl news articles from the collected article urls and save the content to the
     # output file.
-    with tqdm.tqdm(article_urls, desc="[*] crawl news article contents") as tbar:
-        total_contents = crawler.reduce_to_file(
+    parse_fn, format_fn, done_fn = _prepare_article_output(
+        args, near_dup_index, crawler.metrics, done_fn=index.mark_crawled
+    )
+    with _progress(article_urls, desc="[*] crawl news article contents") as tbar:
+        return crawler.reduce_to_writer(
             article_urls,
-            args.output_path,
+            writer,
             args.include_reporter_name,
-            parse_fn=parsing.parse_article_content,
+            parse_fn=parse_fn,
             update_fn=tbar.update,
+            done_fn=done_fn,
+            format_fn=format_fn,
         )
 
-    print(
-        f"[*] finish crawling {total_contents} news articles to "
-        f"[{args.output_path}]"
+
+def _crawl_pipeline(
+    args: argparse.Namespace,
+    crawler: "Crawler",
+    writer: BackgroundWriter,
+    nav_pages: Iterable[List[str]],
+    index: CompletionIndex,
+    nav_done_fn: Callable[[str, List[str]], None],
+    is_new_article: Callable[[str], bool],
+    near_dup_index: Optional[NearDuplicateIndex] = None,
+) -> int:
+    # Crawl news articles as soon as their urls are collected from the navigation
+    # pages. The article urls from the navigated pages in the previous crawling are
+    # crawled first.
+    parse_fn, format_fn, done_fn = _prepare_article_output(
+        args, near_dup_index, crawler.metrics, done_fn=index.mark_crawled
     )
+    with _progress(desc="[*] crawl news article contents") as tbar:
+        return crawler.reduce_pipeline_to_writer(
+            nav_pages,
+            writer,
+            args.include_reporter_name,
+            extract_fn=parsing.extract_article_urls,
+            parse_fn=parse_fn,
+            article_urls=[url for urls in index.navigated.values() for url in urls],
+            filter_fn=is_new_article,
+            update_fn=tbar.update,
+            nav_done_fn=nav_done_fn,
+            done_fn=done_fn,
+            format_fn=format_fn,
+        )
 
 
-def _prepare_nav_urls(args: argparse.Namespace) -> List[str]:
-    return [
-        f"https://news.naver.com/main/list.nhn?mode=LSD&mid=shm"
-        f"&sid1={category}&date={date}&page={page}"
-        for category in args.category
-        for date in utils.drange(args.start_date, args.end_date, args.skip_days)
-        for page in range(1, args.max_page + 1)
-    ]
+def _progress(*args: Any, **kwargs: Any) -> Any:
+    import tqdm
+
+    return tqdm.tqdm(*args, **kwargs)
+
+
+def _create_writer(args: argparse.Namespace) -> BackgroundWriter:
+    if args.output_format == "parquet":
+        schema = ARTICLE_RECORD_SCHEMA
+        if args.near_dup == "tag":
+            schema = {**schema, "near_duplicate": "bool"}
+
+        return ParquetWriter(
+            args.output_path,
+            schema,
+            row_group_size=args.row_group_size,
+            file_row_groups=args.file_row_groups,
+            append=args.resume,
+        )
+
+    # Rotate and compress the output shards if requested.
+    return ShardedWriter(
+        args.output_path,
+        shard_lines=args.shard_lines,
+        shard_bytes=args.shard_bytes,
+        compression=args.compression,
+        append=args.resume,
+    )
+
+
+def _make_article_record(url: str, record: Dict[str, Optional[str]]) -> Dict:
+    oid, aid = utils.parse_article_id(url) or (None, None)
+    return {
+        "url": url,
+        "oid": oid,
+        "aid": aid,
+        "category": utils.parse_article_category(url),
+        **record,
+    }
+
+
+def _format_article_json(url: str, record: Dict[str, Optional[str]]) -> str:
+    return json.dumps(_make_article_record(url, record), ensure_ascii=False)
+
+
+def _prepare_article_output(
+    args: argparse.Namespace,
+    near_dup_index: Optional[NearDuplicateIndex] = None,
+    metrics: Optional[Metrics] = None,
+    done_fn: Optional[Callable[[str], None]] = None,
+) -> Tuple[
+    Callable[[str, bool], Any],
+    Optional[Callable[[str, Any], Any]],
+    Optional[Callable[[str], None]],
+]:
+    # The plain format writes the escaped contents only, while the structured
+    # formats write the records with the article metadata.
+    if args.output_format == "text":
+        parse_fn = partial(
+            parsing.parse_article_content,
+            backend=args.parser,
+            normalization=tuple(args.normalize),
+        )
+        format_fn = None
+    else:
+        parse_fn = partial(
+            parsing.parse_article_record,
+            backend=args.parser,
+            normalization=tuple(args.normalize),
+        )
+        format_fn = (
+            _format_article_json
+            if args.output_format == "jsonl"
+            else _make_article_record
+        )
+
+    # Sign the parsed contents in the parsing processes and check the signatures
+    # against the near-duplicate index before writing them.
+    if near_dup_index is not None:
+        parse_fn = partial(
+            sign_parsed,
+            parse_fn,
+            near_dup_index.num_bands,
+            near_dup_index.rows,
+            args.near_dup_shingle_size,
+        )
+        format_fn, commit_fn = deduplicate_output(
+            near_dup_index, args.near_dup == "tag", format_fn, metrics
+        )
+
+        # Index the signatures of the articles once the writer commits them.
+        if done_fn is None:
+            done_fn = commit_fn
+        else:
+            done_fn = _chain_done_fns(commit_fn, done_fn)
+    return parse_fn, format_fn, done_fn
+
+
+def _chain_done_fns(*done_fns: Callable[[str], None]) -> Callable[[str], None]:
+    def chained_done_fn(url: str):
+        for done_fn in done_fns:
+            done_fn(url)
+
+    return chained_done_fn
+
+
+def _open_near_dup_index(args: argparse.Namespace) -> Optional[NearDuplicateIndex]:
+    if args.near_dup is None:
+        return None
+    return NearDuplicateIndex(
+        args.near_dup_index,
+        capacity=args.near_dup_capacity,
+        num_bands=args.near_dup_bands,
+        rows=args.near_dup_rows,
+    )
+
+
+def prepare_nav_pages(
+    category: Iterable[int],
+    start_date: str,
+    end_date: str,
+    skip_days: int = 1,
+    max_page: int = 10,
+    base_url: str = "https://news.naver.com",
+    order: str = "newest",
+) -> NavPlan:
+    return NavPlan(category, start_date, end_date, skip_days, max_page, base_url, order)
+
+
+def _prepare_nav_pages(args: argparse.Namespace) -> NavPlan:
+    return prepare_nav_pages(
+        args.category,
+        args.start_date,
+        args.end_date,
+        args.skip_days,
+        args.max_page,
+        args.base_url,
+        args.nav_order,
+    )
+
+
+async def stream_articles(
+    crawler: "Crawler",
+    category: Iterable[int],
+    start_date: str,
+    end_date: str,
+    skip_days: int = 1,
+    max_page: int = 10,
+    include_reporter_name: bool = False,
+    parser: str = "bs4",
+    max_buffered: int = 1000,
+    order: str = "newest",
+) -> AsyncIterator[Dict]:
+    # Crawl the articles of the categories and dates on the running event loop, and
+    # yield the article records as soon as they are parsed.
+    stream = crawler.stream_pipeline(
+        prepare_nav_pages(
+            category, start_date, end_date, skip_days, max_page, order=order
+        ),
+        include_reporter_name,
+        extract_fn=parsing.extract_article_urls,
+        parse_fn=partial(parsing.parse_article_record, backend=parser),
+        max_buffered=max_buffered,
+    )
+    try:
+        async for url, record in stream:
+            yield _make_article_record(url, record)
+    finally:
+        await stream.aclose()
 
 
 def _create_argument_parser() -> argparse.ArgumentParser:
@@ -74,24 +631,70 @@ def _create_argument_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--output_path", default="첫줄포함.txt", help="output file path"
     )
+    parser.add_argument(
+        "--output_format",
+        default="text",
+        choices=["text", "jsonl", "parquet"],
+        help="write escaped contents or structured records with metadata",
+    )
+    parser.add_argument(
+        "--row_group_size",
+        default=10000,
+        type=int,
+        help="number of records in each parquet row group",
+    )
+    parser.add_argument(
+        "--file_row_groups",
+        default=10,
+        type=int,
+        help="number of row groups in each parquet part file",
+    )
+    parser.add_argument(
+        "--shard_lines",
+        default=0,
+        type=int,
+        help="maximum number of articles in each output shard",
+    )
+    parser.add_argument(
+        "--shard_bytes",
+        default=0,
+        type=int,
+        help="maximum (compressed) size of each output shard in bytes",
+    )
+    parser.add_argument(
+        "--compression",
+        default=None,
+        choices=["gzip", "zstd"],
+        help="compress the output shards",
+    )
     parser.add_argument(
         "--category",
-        required=True,
         nargs="*",
         type=int,
         help="list of news article categories",
     )
+    parser.add_argument("--start_date", help="minimum date of news articles")
+    parser.add_argument("--end_date", help="maximum date of news articles")
     parser.add_argument(
-        "--start_date", required=True, help="minimum date of news articles"
+        "--skip_days", default=1, type=int, help="number of days to skip from crawling"
     )
     parser.add_argument(
-        "--end_date", required=True, help="maximum date of news articles"
+        "--max_page",
+        default=10,
+        type=int,
+        help="maximum number of pages to navigate (stops at the last page)",
     )
     parser.add_argument(
-        "--skip_days", default=1, type=int, help="number of days to skip from crawling"
+        "--base_url",
+        default="https://news.naver.com",
+        help="base url of the navigation pages (e.g. a local mirror for benchmarks)",
     )
     parser.add_argument(
-        "--max_page", default=10, type=int, help="maximum number of pages to navigate"
+        "--nav_order",
+        default="newest",
+        choices=NAV_ORDERS,
+        help="order of the navigation pages (newest and interleaved take the "
+        "categories in turns for each date)",
     )
     parser.add_argument(
         "--timeout", default=5, type=float, help="timeout for the whole request"
@@ -102,21 +705,234 @@ def _create_argument_parser() -> argparse.ArgumentParser:
         type=int,
         help="maximum number of concurrent requests",
     )
+    parser.add_argument(
+        "--max_host_jobs",
+        default=None,
+        type=int,
+        help="maximum number of concurrent requests to each host",
+    )
+    parser.add_argument(
+        "--max_rps",
+        default=None,
+        type=float,
+        help="maximum number of requests per second across the hosts",
+    )
+    parser.add_argument(
+        "--latency_threshold",
+        default=None,
+        type=float,
+        help="reduce the concurrent requests if responses are slower than this",
+    )
+    parser.add_argument(
+        "--max_host_connections",
+        default=0,
+        type=int,
+        help="maximum number of connections to each host (0 for no limit)",
+    )
+    parser.add_argument(
+        "--keepalive_timeout",
+        default=30,
+        type=float,
+        help="seconds to keep the idle connections alive for reuse",
+    )
+    parser.add_argument(
+        "--dns_cache_ttl",
+        default=300,
+        type=int,
+        help="seconds to cache the resolved host addresses",
+    )
+    parser.add_argument(
+        "--max_retries",
+        default=3,
+        type=int,
+        help="number of retries for throttled or failed requests",
+    )
+    parser.add_argument(
+        "--retry_backoff",
+        default=0.5,
+        type=float,
+        help="initial delay in seconds before retrying the failed request",
+    )
     parser.add_argument(
         "--num_cores",
         default=4,
         type=int,
         help="number of multi-processing cores for parsing",
     )
+    parser.add_argument(
+        "--forkserver",
+        action="store_true",
+        default=False,
+        help="fork the parsing processes from a server which has imported the parsers",
+    )
+    parser.add_argument(
+        "--parse_batch_size",
+        default=16,
+        type=int,
+        help="maximum number of documents to parse in a single subprocess call",
+    )
+    parser.add_argument(
+        "--parse_batch_timeout",
+        default=0.05,
+        type=float,
+        help="maximum seconds to wait for filling a parsing batch",
+    )
+    parser.add_argument(
+        "--inline_parse_bytes",
+        default=0,
+        type=int,
+        help="parse the documents up to this size in the main process",
+    )
     parser.add_argument(
         "--user-agent",
         default=DEFAULT_USER_AGENT_STRING,
         help="use custom user-agent string",
     )
+    parser.add_argument(
+        "--parser",
+        default="bs4",
+        choices=sorted(parsing.PARSER_BACKENDS),
+        help="html parser backend for extracting article contents",
+    )
+    parser.add_argument(
+        "--normalize",
+        default=list(normalizing.DEFAULT_NORMALIZATION),
+        nargs="*",
+        help="normalization stages of the contents in order (stages: "
+        + ", ".join(sorted(normalizing.NORMALIZATION_STAGES))
+        + ", with an optional argument like min_length=20)",
+    )
     parser.add_argument(
         "--include_reporter_name",
         default=False,
         help="remove broadcasting station, reporter name in front sentence",
     )
+    parser.add_argument(
+        "--dedup_index",
+        default=None,
+        help="index file of the stored article ids to skip across the runs",
+    )
+    parser.add_argument(
+        "--near_dup",
+        default=None,
+        choices=["drop", "tag"],
+        help="drop or tag the articles whose contents are similar to the earlier ones",
+    )
+    parser.add_argument(
+        "--near_dup_index",
+        default=None,
+        help="index file of the near-duplicate signatures to keep across the runs",
+    )
+    parser.add_argument(
+        "--near_dup_capacity",
+        default=1000000,
+        type=int,
+        help="number of articles to index before the false positives increase",
+    )
+    parser.add_argument(
+        "--near_dup_bands",
+        default=16,
+        type=int,
+        help="number of the lsh bands (more bands find less similar articles)",
+    )
+    parser.add_argument(
+        "--near_dup_rows",
+        default=8,
+        type=int,
+        help="number of the minhash values in each lsh band",
+    )
+    parser.add_argument(
+        "--near_dup_shingle_size",
+        default=5,
+        type=int,
+        help="number of characters in each shingle of the contents",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="crawl articles as soon as their urls are collected from each page",
+    )
+    parser.add_argument(
+        "--queue",
+        default=None,
+        help="shared work queue for distributed crawling (sqlite path or redis url)",
+    )
+    parser.add_argument(
+        "--coordinator",
+        action="store_true",
+        help="queue the navigation pages to the work queue for the workers",
+    )
+    parser.add_argument(
+        "--lease_size",
+        default=100,
+        type=int,
+        help="number of articles to take from the work queue at once",
+    )
+    parser.add_argument(
+        "--lease_timeout",
+        default=600,
+        type=float,
+        help="seconds before the unfinished tasks of a worker are given to others",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip the completed pages and articles of the previous crawling",
+    )
+    parser.add_argument(
+        "--archive_path",
+        default=None,
+        help="compressed archive of the raw responses to reparse them later",
+    )
+    parser.add_argument(
+        "--reparse",
+        action="store_true",
+        help="parse the articles in --archive_path again without crawling",
+    )
+    parser.add_argument(
+        "--cache_path",
+        default=None,
+        help="cache file of the responses to reuse them across the runs",
+    )
+    parser.add_argument(
+        "--cache_size",
+        default=1024,
+        type=int,
+        help="maximum size of the cached responses in megabytes",
+    )
+    parser.add_argument(
+        "--recent_page_ttl",
+        default=600,
+        type=float,
+        help="seconds to cache the navigation pages of today and yesterday",
+    )
+    parser.add_argument(
+        "--past_page_ttl",
+        default=86400,
+        type=float,
+        help="seconds to cache the navigation pages of the past dates",
+    )
+    parser.add_argument(
+        "--metrics_path",
+        default=None,
+        help="file to append the json snapshots of the crawling metrics",
+    )
+    parser.add_argument(
+        "--metrics_interval",
+        default=10,
+        type=float,
+        help="seconds between the metrics snapshots",
+    )
+    parser.add_argument(
+        "--metrics_port",
+        default=None,
+        type=int,
+        help="port to serve the metrics in the prometheus text format",
+    )
+    parser.add_argument(
+        "--profile_dir",
+        default=None,
+        help="directory to dump the cProfile results of the parsing processes",
+    )
 
     return parser
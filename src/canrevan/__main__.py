@@ -1,4 +1,4 @@
-from __init__ import _main
+from canrevan import _main
 
 if __name__ == "__main__":
     _main()
@@ -0,0 +1,228 @@
+import collections
+import gzip
+import os
+import re
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import utils
+from .writing import BackgroundWriter
+
+_CHARSET_PATTERN = re.compile(rb"^Content-Type:.*charset=([\w-]+)", re.I | re.M)
+
+
+def _load_index(path: str, truncate: bool = False) -> Dict[str, Tuple[int, int]]:
+    # Read the offsets and lengths of the archived records. The later records
+    # override the earlier ones of the same url. Note that the last line may be
+    # truncated if the previous crawling was killed while writing it.
+    index, valid_size = {}, 0
+    if os.path.exists(path):
+        with open(path, "rb") as fp:
+            for line in fp:
+                if not line.endswith(b"\n"):
+                    break
+                valid_size += len(line)
+
+                url, offset, length = line.decode("utf-8").rstrip("\n").split("\t")
+                index[url] = (int(offset), int(length))
+
+        # Remove the truncated record to append new records after the valid ones.
+        if truncate:
+            os.truncate(path, valid_size)
+    return index
+
+
+def _read_record(
+    fp: IO[bytes], offset: int, length: int
+) -> Tuple[bytes, Optional[str]]:
+    # Each record is compressed as an independent gzip member, so it can be read
+    # without decompressing the preceding records.
+    fp.seek(offset)
+    headers, _, body = gzip.decompress(fp.read(length)).partition(b"\r\n\r\n")
+
+    charset = _CHARSET_PATTERN.search(headers)
+    return body[:-4], charset.group(1).decode("ascii") if charset else None
+
+
+class RawArchiveWriter(BackgroundWriter):
+    def __init__(
+        self, path: str, compress_level: int = 6, max_queued_records: int = 1000
+    ):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.compress_level = compress_level
+
+        self._fp, self._index_fp = None, None
+        super().__init__(max_queued_records)
+
+    def _start(self):
+        # The archive and its index are append-only, so the records of the previous
+        # crawlings are kept.
+        _load_index(self.index_path, truncate=True)
+        self._fp = open(self.path, "ab")
+        self._index_fp = open(self.index_path, "a", encoding="utf-8")
+
+    def _flush(self):
+        # Flush the archive before the index, so the index never refers to the
+        # records which are not written yet.
+        self._fp.flush()
+        self._index_fp.flush()
+        self._commit()
+
+    def _write(self, record: Tuple[str, bytes, Optional[str]], idle: bool):
+        url, body, charset = record
+
+        # Write the response as a WARC resource record.
+        content_type = f"text/html; charset={charset}" if charset else "text/html"
+        headers = (
+            f"WARC/1.0\r\n"
+            f"WARC-Type: resource\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+            f"WARC-Date: {datetime.now(timezone.utc):%Y-%m-%dT%H:%M:%SZ}\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"\r\n"
+        )
+        data = gzip.compress(
+            headers.encode("utf-8") + body + b"\r\n\r\n", self.compress_level
+        )
+
+        offset = self._fp.tell()
+        self._fp.write(data)
+        self._index_fp.write(f"{url}\t{offset}\t{len(data)}\n")
+
+        if idle:
+            self._flush()
+
+    def _finish(self):
+        self._flush()
+        self._fp.close()
+        self._index_fp.close()
+
+    def write(
+        self,
+        url: str,
+        body: bytes,
+        charset: Optional[str] = None,
+        done_fn: Optional[Callable[[], None]] = None,
+    ):
+        super().write((url, body, charset), done_fn)
+
+    async def awrite(
+        self,
+        url: str,
+        body: bytes,
+        charset: Optional[str] = None,
+        done_fn: Optional[Callable[[], None]] = None,
+    ):
+        await super().awrite((url, body, charset), done_fn)
+
+
+class RawArchive:
+    def __init__(self, path: str):
+        self.path = path
+        self.index = _load_index(f"{path}.idx")
+        self._fp = open(path, "rb")
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.index
+
+    def read(self, url: str) -> Tuple[bytes, Optional[str]]:
+        return _read_record(self._fp, *self.index[url])
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self) -> "RawArchive":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _reparse_records(
+    path: str,
+    parse_fn: Callable[[str, bool], Any],
+    include_reporter_name: bool,
+    records: List[Tuple[int, int, str]],
+) -> List[Tuple[str, Any]]:
+    # Parse the records independently, so an invalid document does not affect the
+    # other ones in the chunk.
+    results = []
+    with open(path, "rb") as fp:
+        for offset, length, url in records:
+            body, charset = _read_record(fp, offset, length)
+            try:
+                document = utils.decode_document(body, charset)
+                results.append((url, parse_fn(document, include_reporter_name)))
+            except Exception:
+                results.append((url, None))
+    return results
+
+
+def _map_bounded(
+    pool: Executor, fn: Callable[[Any], Any], items: Iterable[Any], max_pending: int
+) -> Iterator[Any]:
+    # Submit the items lazily and yield the results in order. Unlike `Executor.map`,
+    # which submits all items at once, only `max_pending` results are kept in memory
+    # if the consumer is slower than the workers.
+    pending = collections.deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def reparse_archive(
+    path: str,
+    writer: BackgroundWriter,
+    include_reporter_name: bool,
+    parse_fn: Callable[[str, bool], Any],
+    format_fn: Optional[Callable[[str, Any], Any]] = None,
+    filter_fn: Optional[Callable[[str], bool]] = None,
+    update_fn: Optional[Callable[[], None]] = None,
+    done_fn: Optional[Callable[[str], None]] = None,
+    num_processes: Optional[int] = None,
+    chunk_size: int = 256,
+) -> int:
+    # Split the archived records into the chunks in the order of their offsets, so
+    # each process reads its part of the archive sequentially.
+    records = sorted(
+        (offset, length, url)
+        for url, (offset, length) in _load_index(f"{path}.idx").items()
+        if filter_fn is None or filter_fn(url)
+    )
+    chunks = (records[i : i + chunk_size] for i in range(0, len(records), chunk_size))
+
+    written = 0
+    with ProcessPoolExecutor(max_workers=num_processes) as pool:
+        for results in _map_bounded(
+            pool,
+            partial(_reparse_records, path, parse_fn, include_reporter_name),
+            chunks,
+            max_pending=2 * (num_processes or os.cpu_count() or 1),
+        ):
+            for url, data in results:
+                if update_fn is not None:
+                    update_fn()
+
+                if data is None:
+                    continue
+
+                # The formatter may drop the item (e.g. a near-duplicate article).
+                item = format_fn(url, data) if format_fn is not None else str(data)
+                if item is not None:
+                    writer.write(
+                        item, partial(done_fn, url) if done_fn is not None else None
+                    )
+                    written += 1
+    return written
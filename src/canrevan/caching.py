@@ -0,0 +1,190 @@
+import math
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable, Dict, NamedTuple, Optional
+
+from . import utils
+
+_NAV_DATE_PATTERN = re.compile(r"[?&]date=(\d{8})")
+_EVICTION_BATCH_SIZE = 100
+_ACCESS_BATCH_SIZE = 100
+
+
+class CacheEntry(NamedTuple):
+    body: bytes
+    charset: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fresh: bool
+
+    def validators(self) -> Dict[str, str]:
+        # The headers to ask the server whether the cached response is modified.
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def naver_cache_ttl(
+    url: str, recent_ttl: float = 600, past_ttl: float = 86400, recent_days: int = 1
+) -> float:
+    # The articles rarely change after publication, so they are cached forever. The
+    # navigation pages of the recent dates get new articles, while the ones of the
+    # past dates barely change.
+    if utils.parse_article_id(url) is not None:
+        return math.inf
+
+    date = _NAV_DATE_PATTERN.search(url)
+    if date is None:
+        return 0
+
+    recent = (datetime.now() - timedelta(days=recent_days)).strftime("%Y%m%d")
+    return recent_ttl if date.group(1) >= recent else past_ttl
+
+
+class HTTPCache:
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 1 << 30,
+        ttl_fn: Callable[[str], float] = naver_cache_ttl,
+        compress_level: int = 6,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_fn = ttl_fn
+        self.compress_level = compress_level
+
+        # The entries are looked up and stored from the executor threads, so that the
+        # compression and the queries do not block the event loop.
+        self._lock = threading.Lock()
+        self._accessed: Dict[str, float] = {}
+        self._conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "url TEXT PRIMARY KEY, body BLOB NOT NULL, charset TEXT, etag TEXT, "
+            "last_modified TEXT, validated REAL NOT NULL, accessed REAL NOT NULL, "
+            "size INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+        )
+
+        # Track the total size of the stored bodies to evict the least recently used
+        # entries when the cache is full.
+        self.size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, charset, etag, last_modified, validated FROM entries "
+                "WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            # Update the access times of the entries in batches, rather than writing
+            # to the database on every lookup.
+            self._accessed[url] = time.time()
+            if len(self._accessed) >= _ACCESS_BATCH_SIZE:
+                self._flush_accessed()
+
+        body, charset, etag, last_modified, validated = row
+
+        # The entry is used without any request until its ttl is expired. After
+        # that, it should be revalidated with the conditional request.
+        fresh = time.time() - validated < self.ttl_fn(url)
+        return CacheEntry(zlib.decompress(body), charset, etag, last_modified, fresh)
+
+    def store(
+        self,
+        url: str,
+        body: bytes,
+        charset: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        # The entries which expire immediately and cannot be revalidated are useless.
+        if self.ttl_fn(url) <= 0 and etag is None and last_modified is None:
+            return
+
+        body = zlib.compress(body, self.compress_level)
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+
+            now = time.time()
+            self._accessed.pop(url, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body, charset, etag, last_modified, now, now, len(body)),
+            )
+            self.size += len(body) - (previous[0] if previous is not None else 0)
+
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def refresh(self, url: str):
+        # Mark the entry as validated by the server (i.e. `304 Not Modified`).
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entries SET validated = ? WHERE url = ?", (time.time(), url)
+            )
+
+    def _flush_accessed(self):
+        if not self._accessed:
+            return
+
+        self._conn.execute("BEGIN")
+        self._conn.executemany(
+            "UPDATE entries SET accessed = ? WHERE url = ?",
+            ((accessed, url) for url, accessed in self._accessed.items()),
+        )
+        self._conn.execute("COMMIT")
+        self._accessed = {}
+
+    def _evict(self):
+        # The least recently used entries are found with the latest access times.
+        self._flush_accessed()
+        while self.size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, size FROM entries ORDER BY accessed LIMIT ?",
+                (_EVICTION_BATCH_SIZE,),
+            ).fetchall()
+            if not rows:
+                break
+
+            # Remove the least recently used entries until the cache fits in the
+            # limit.
+            evicted = []
+            for url, size in rows:
+                if self.size <= self.max_bytes:
+                    break
+                evicted.append((url,))
+                self.size -= size
+            self._conn.executemany("DELETE FROM entries WHERE url = ?", evicted)
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._conn.close()
+
+    def __enter__(self) -> "HTTPCache":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,13 +1,55 @@
 import argparse
 import asyncio
+import importlib
+import inspect
+import multiprocessing
+import sys
+import time
 import warnings
+import weakref
 from asyncio import Semaphore
+from collections import deque
 from concurrent.futures import Executor, ProcessPoolExecutor
-from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+from urllib.parse import urlsplit
 
-from aiohttp import ClientSession, ClientTimeout
+from aiohttp import (
+    ClientConnectionError,
+    ClientPayloadError,
+    ClientResponse,
+    ClientSession,
+    ClientTimeout,
+    TCPConnector,
+    TraceConfig,
+)
 
-import utils as utils
+from . import utils
+from .archiving import RawArchiveWriter
+from .caching import CacheEntry, HTTPCache
+from .monitoring import Metrics, RecordedMetrics, profile_call, worker_metrics
+from .throttling import AdaptiveLimiter, RequestBudget, parse_retry_after, retry_delay
+from .writing import BackgroundWriter, ShardedWriter
+
+# The start method and the initializer of the process pool are supported from Python
+# 3.7. The older versions start the parsing processes by the default method without
+# warming them up.
+_POOL_OPTIONS_SUPPORTED = sys.version_info >= (3, 7)
 
 # Ignore warnings from `aiohttp` module.
 warnings.filterwarnings("ignore", module="aiohttp")
@@ -15,6 +57,171 @@ warnings.filterwarnings("ignore", module="aiohttp")
 T = TypeVar("T")
 
 
+class _RetryableStatusError(Exception):
+    pass
+
+
+# The requests which fail with these errors or statuses are retried after backoff,
+# since they usually indicate throttling or temporary server problems.
+_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+_RETRYABLE_ERRORS = (
+    ClientConnectionError,
+    ClientPayloadError,
+    asyncio.TimeoutError,
+    _RetryableStatusError,
+)
+
+
+def _decode_cached(
+    entry: CacheEntry, raw: bool
+) -> Tuple[Union[str, bytes], Optional[str]]:
+    if raw:
+        return entry.body, entry.charset
+    return utils.decode_document(entry.body, entry.charset), None
+
+
+def _describe_error(e: BaseException) -> str:
+    # The failures by the http statuses are distinguished by their status codes.
+    if isinstance(e, _RetryableStatusError):
+        return f"HTTP {e.args[0]}"
+    return type(e).__name__
+
+
+def _decode_and_parse(
+    parse_fn: Callable[[str, bool], T],
+    body: bytes,
+    charset: Optional[str],
+    include_reporter_name: bool,
+) -> T:
+    return parse_fn(utils.decode_document(body, charset), include_reporter_name)
+
+
+def _decode_and_parse_batch(
+    jobs: List[Tuple[Callable[[str, bool], T], bytes, Optional[str], bool]],
+    profile_dir: Optional[str] = None,
+) -> Tuple[List[Tuple[bool, Union[T, Exception], float]], RecordedMetrics]:
+    # Profile the parsing in the worker process if the output directory is given.
+    if profile_dir is not None:
+        return profile_call(profile_dir, _decode_and_parse_batch, jobs)
+
+    # Parse the documents independently, so an invalid document does not affect the
+    # other ones in the batch. The parsing time of each document is measured in the
+    # worker process, without the time spent in the queue.
+    results = []
+    for job in jobs:
+        started = time.perf_counter()
+        try:
+            succeeded, result = True, _decode_and_parse(*job)
+        except Exception as e:
+            succeeded, result = False, e
+        results.append((succeeded, result, time.perf_counter() - started))
+
+    # Send the metrics recorded while parsing (e.g. by the normalization stages)
+    # with the results.
+    return results, worker_metrics.drain()
+
+
+class _BatchParser:
+    def __init__(
+        self,
+        pool: Executor,
+        batch_size: int = 1,
+        batch_timeout: float = 0.01,
+        inline_bytes: int = 0,
+        metrics: Optional[Metrics] = None,
+        profile_dir: Optional[str] = None,
+    ):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.inline_bytes = inline_bytes
+        self.metrics = metrics or Metrics()
+        self.profile_dir = profile_dir
+
+        self._jobs, self._futures = [], []
+        self._timer = None
+
+    async def parse(
+        self,
+        parse_fn: Callable[[str, bool], T],
+        body: bytes,
+        charset: Optional[str],
+        include_reporter_name: bool,
+    ) -> T:
+        # Parse tiny documents directly on the event loop, since sending them to the
+        # subprocess costs more than parsing them.
+        if len(body) <= self.inline_bytes:
+            started = time.perf_counter()
+            try:
+                return _decode_and_parse(parse_fn, body, charset, include_reporter_name)
+            finally:
+                self.metrics.observe("parse", time.perf_counter() - started)
+                self.metrics.merge(worker_metrics.drain())
+
+        future = asyncio.get_event_loop().create_future()
+        self._jobs.append((parse_fn, body, charset, include_reporter_name))
+        self._futures.append(future)
+        self.metrics.add_gauge("parse_queue", 1)
+
+        # Submit the collected documents if the batch is full. Otherwise, they will be
+        # submitted after the timeout even if the batch is not full.
+        if len(self._jobs) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(
+                self.batch_timeout, self.flush
+            )
+
+        return await future
+
+    def close(self):
+        # Drop the jobs which are not submitted yet.
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.metrics.add_gauge("parse_queue", -len(self._jobs))
+        self._jobs, self._futures = [], []
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._jobs:
+            return
+
+        jobs, futures = self._jobs, self._futures
+        self._jobs, self._futures = [], []
+        submitted = time.perf_counter()
+
+        # Fan the parsed results of the batch out to the waiting futures. The time
+        # from the submission to the results includes the transfer and the waiting
+        # in the process-pool queue.
+        def callback_fn(f: asyncio.Future):
+            self.metrics.add_gauge("parse_queue", -len(jobs))
+            self.metrics.observe("parse_wait", time.perf_counter() - submitted)
+
+            if f.exception() is not None:
+                results = [(False, f.exception(), 0.0)] * len(futures)
+            else:
+                results, recorded = f.result()
+                for _, _, elapsed in results:
+                    self.metrics.observe("parse", elapsed)
+                self.metrics.merge(recorded)
+
+            for future, (succeeded, result, _) in zip(futures, results):
+                if future.done():
+                    continue
+                if succeeded:
+                    future.set_result(result)
+                else:
+                    future.set_exception(result)
+
+        asyncio.get_event_loop().run_in_executor(
+            self.pool, _decode_and_parse_batch, jobs, self.profile_dir
+        ).add_done_callback(callback_fn)
+
+
 class Crawler:
     def __init__(
         self,
@@ -22,125 +229,884 @@ class Crawler:
         num_parsing_processes: int = 1,
         request_headers: Optional[Dict[str, str]] = None,
         request_timeout: Optional[float] = None,
+        parse_batch_size: int = 1,
+        parse_batch_timeout: float = 0.01,
+        inline_parse_bytes: int = 0,
+        max_host_tasks: Optional[int] = None,
+        max_requests_per_second: Optional[float] = None,
+        latency_threshold: Optional[float] = None,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        max_retry_backoff: float = 30.0,
+        max_connections: Optional[int] = None,
+        max_host_connections: int = 0,
+        keepalive_timeout: float = 30.0,
+        dns_cache_ttl: Optional[int] = 300,
+        accept_compression: bool = True,
+        metrics: Optional[Metrics] = None,
+        profile_dir: Optional[str] = None,
+        archive: Optional[RawArchiveWriter] = None,
+        cache: Optional[HTTPCache] = None,
+        parse_initializer: Optional[Callable[[], None]] = None,
+        start_method: Optional[str] = None,
+        preload_modules: Sequence[str] = (),
     ):
         self.concurrent_tasks = concurrent_tasks
         self.num_parsing_processes = num_parsing_processes
         self.request_headers = request_headers
         self.request_timeout = request_timeout
+        self.parse_batch_size = parse_batch_size
+        self.parse_batch_timeout = parse_batch_timeout
+        self.inline_parse_bytes = inline_parse_bytes
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.max_connections = max_connections or concurrent_tasks
+        self.max_host_connections = max_host_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.accept_compression = accept_compression
+        self.profile_dir = profile_dir
+        self.parse_initializer = parse_initializer
+        self.start_method = start_method
+        self.preload_modules = preload_modules
+
+        # Keep the raw responses in the archive to parse them again without crawling
+        # (e.g. after the cleaning rules are changed).
+        self.archive = archive
+
+        # Reuse the cached responses and revalidate the stale ones with the
+        # conditional requests, so the repeated crawlings get mostly cache hits or
+        # `304 Not Modified` responses.
+        self.cache = cache
+
+        # The latencies of the stages, the failures and the queue depths of the
+        # crawlings, which are exported by `MetricsExporter`.
+        self.metrics = metrics or Metrics()
+
+        # The number of requests, created and reused connections and dns cache
+        # hits, to check if the connections are actually reused.
+        self.connection_stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+        }
+        self._session: Optional[ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stale_sessions: List[Tuple[ClientSession, asyncio.AbstractEventLoop]] = []
+        self._keep_session = False
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        # Adapt the number of concurrent requests to each host, which shrinks on
+        # throttling and grows while the responses are healthy. The windows are kept
+        # across the crawlings of this crawler.
+        self.limiter = AdaptiveLimiter(
+            max_limit=max_host_tasks or concurrent_tasks,
+            latency_threshold=latency_threshold,
+        )
+        self.metrics.register_gauge("requests_in_flight", self.limiter.in_flight)
+
+        # Spread the requests (including the retries) evenly under the budget across
+        # the hosts, rather than sending them in bursts.
+        self.budget = None
+        if max_requests_per_second is not None:
+            self.budget = RequestBudget(max_requests_per_second)
+
+    def _create_trace_config(self) -> TraceConfig:
+        def count_fn(name: str):
+            async def on_signal(*args):
+                self.connection_stats[name] += 1
+
+            return on_signal
+
+        # Measure the latencies of the connection stages of each request with the
+        # per-request trace context.
+        def mark_fn(attr: str):
+            async def on_signal(session, context, params):
+                setattr(context, attr, time.perf_counter())
+
+            return on_signal
+
+        def observe_fn(name: str, attr: str):
+            async def on_signal(session, context, params):
+                if hasattr(context, attr):
+                    elapsed = time.perf_counter() - getattr(context, attr)
+                    self.metrics.observe(name, elapsed)
+
+            return on_signal
+
+        trace_config = TraceConfig()
+        trace_config.on_request_start.append(count_fn("requests"))
+        trace_config.on_request_start.append(mark_fn("request_started"))
+        trace_config.on_connection_queued_start.append(mark_fn("queued"))
+        trace_config.on_connection_queued_end.append(
+            observe_fn("connection_wait", "queued")
+        )
+        trace_config.on_connection_create_start.append(mark_fn("connecting"))
+        trace_config.on_connection_create_end.append(
+            observe_fn("connect", "connecting")
+        )
+        trace_config.on_request_end.append(observe_fn("ttfb", "request_started"))
+        trace_config.on_connection_create_end.append(count_fn("connections_created"))
+        trace_config.on_connection_reuseconn.append(count_fn("connections_reused"))
+        trace_config.on_dns_cache_hit.append(count_fn("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(count_fn("dns_cache_misses"))
+        return trace_config
+
+    async def _get_session(self) -> ClientSession:
+        # Create a long-lived http client session on the first crawling. It is shared
+        # across the crawlings (e.g. navigation and article phases), so the opened
+        # connections and the resolved addresses are reused.
+        loop = asyncio.get_event_loop()
+        if self._session is not None and self._session_loop is not loop:
+            self._retire_session()
+        await self._aclose_stale_sessions()
+
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_host_connections,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=self.dns_cache_ttl is not None,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+
+            # Ask the server not to compress the responses if the bandwidth is
+            # cheaper than decompressing them in the main process.
+            headers = dict(self.request_headers or {})
+            if not self.accept_compression:
+                headers["Accept-Encoding"] = "identity"
+
+            self._session = ClientSession(
+                connector=connector,
+                headers=headers,
+                timeout=ClientTimeout(total=self.request_timeout),
+                trace_configs=[self._create_trace_config()],
+            )
+            self._session_loop = loop
+        return self._session
+
+    def _retire_session(self):
+        # The session is bound to the event loop where it is created, so it cannot be
+        # used or closed on the other loops (e.g. the sync reductions run on the
+        # default loop while `asyncio.run` creates a new one). It is closed later on
+        # its own loop.
+        if self._session is not None:
+            self._stale_sessions.append((self._session, self._session_loop))
+        self._session = None
+
+    def _close_stale_sessions(self, loop: asyncio.AbstractEventLoop):
+        # Note that the connections of a closed loop are not waited for, so the
+        # sessions of the closed loops are closed on the given loop.
+        for session, session_loop in self._stale_sessions:
+            if session_loop.is_closed():
+                session_loop = loop
+            session_loop.run_until_complete(session.close())
+        self._stale_sessions = []
+
+    async def _aclose_stale_sessions(self):
+        # Close the stale sessions which can be closed on the running loop. The others
+        # are kept until their loops are available.
+        loop, stale_sessions = asyncio.get_event_loop(), []
+        for session, session_loop in self._stale_sessions:
+            if session_loop is loop or session_loop.is_closed():
+                await session.close()
+            else:
+                stale_sessions.append((session, session_loop))
+        self._stale_sessions = stale_sessions
+
+    def _close_session(self, loop: asyncio.AbstractEventLoop):
+        self._retire_session()
+        self._close_stale_sessions(loop)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Create a process pool on the first crawling and keep it across the
+        # crawlings, so the parsing processes are started and warmed up by
+        # `parse_initializer` only once.
+        if self._pool is None:
+            # Import `preload_modules` once rather than in every parsing process. The
+            # forked processes inherit the modules imported in this process, while
+            # the forkserver imports them before forking the processes.
+            context = multiprocessing.get_context(
+                self.start_method if _POOL_OPTIONS_SUPPORTED else None
+            )
+            if context.get_start_method() == "fork":
+                for name in self.preload_modules:
+                    importlib.import_module(name)
+            elif context.get_start_method() == "forkserver":
+                context.set_forkserver_preload(list(self.preload_modules))
+
+            options = {}
+            if _POOL_OPTIONS_SUPPORTED:
+                options = {"mp_context": context, "initializer": self.parse_initializer}
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_parsing_processes, **options
+            )
+
+            # Stop the processes even if the crawler is not closed explicitly.
+            weakref.finalize(self, self._pool.shutdown, wait=False)
+        return self._pool
+
+    def _shutdown_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        self._pool = None
+
+    def close(self):
+        self._close_session(self._get_event_loop())
+        self._keep_session = False
+        self._shutdown_pool()
+
+    async def aclose(self):
+        self._retire_session()
+        await self._aclose_stale_sessions()
+        self._keep_session = False
+        self._shutdown_pool()
+
+    def __enter__(self) -> "Crawler":
+        self._keep_session = True
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    async def __aenter__(self) -> "Crawler":
+        self._keep_session = True
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def _read_response(
+        self, url: str, resp: ClientResponse, raw: bool
+    ) -> Tuple[Union[str, bytes], Optional[str]]:
+        # Pass the raw response body to the subprocess without decoding it, so the
+        # main process neither decodes the body nor encodes it again for pickling.
+        reading = time.perf_counter()
+        if raw:
+            content, charset = await resp.read(), resp.charset
+        else:
+            content, charset = await resp.text(), None
+
+        self.metrics.observe("body", time.perf_counter() - reading)
+        self.metrics.increment("bytes_in", resp.content.total_bytes)
+
+        # Note that the body is read only once, even if it is decoded above. The
+        # response is compressed and stored in the executor thread.
+        if self.cache is not None and resp.status == 200:
+            self.metrics.increment("cache", result="miss")
+            await asyncio.get_event_loop().run_in_executor(
+                None,
+                self.cache.store,
+                url,
+                await resp.read(),
+                resp.charset,
+                resp.headers.get("ETag"),
+                resp.headers.get("Last-Modified"),
+            )
+        return content, charset
+
+    async def _fetch(
+        self, sess: ClientSession, url: str, raw: bool
+    ) -> Tuple[Union[str, bytes], Optional[str], bool]:
+        # Use the cached response without any request if it is fresh. Otherwise, ask
+        # the server whether the cached response is modified. The cached response is
+        # read and decompressed in the executor thread. Whether the content comes from
+        # the cache is returned as well.
+        entry = None
+        if self.cache is not None:
+            entry = await asyncio.get_event_loop().run_in_executor(
+                None, self.cache.lookup, url
+            )
+        if entry is not None and entry.fresh:
+            self.metrics.increment("cache", result="hit")
+            content, charset = _decode_cached(entry, raw)
+            return content, charset, True
+        headers = entry.validators() if entry is not None else None
+
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            if self.budget is not None:
+                self.metrics.observe("budget_wait", await self.budget.acquire())
+            started = await self.limiter.acquire(host)
+
+            retry_after = None
+            try:
+                async with sess.get(url, headers=headers) as resp:
+                    self.metrics.increment("responses", status=resp.status)
+                    if resp.status in _RETRYABLE_STATUSES:
+                        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                        raise _RetryableStatusError(resp.status)
+
+                    if resp.status == 304 and entry is not None:
+                        self.metrics.increment("cache", result="revalidated")
+                        await asyncio.get_event_loop().run_in_executor(
+                            None, self.cache.refresh, url
+                        )
+                        content, charset = _decode_cached(entry, raw)
+                        cached = True
+                    else:
+                        content, charset = await self._read_response(url, resp, raw)
+                        cached = False
+            except _RETRYABLE_ERRORS as e:
+                self.limiter.release(host, started, succeeded=False)
+                if attempt == self.max_retries:
+                    raise
+
+                self.metrics.increment("retries", error=_describe_error(e))
+
+                # Retry the request after the exponential backoff with jitter.
+                await asyncio.sleep(
+                    retry_delay(
+                        attempt,
+                        self.retry_backoff,
+                        self.max_retry_backoff,
+                        retry_after,
+                    )
+                )
+                continue
+            except BaseException:
+                self.limiter.release(host, started, succeeded=None)
+                raise
+
+            self.limiter.release(host, started, succeeded=True)
+            return content, charset, cached
 
     async def _fetch_and_parse(
         self,
-        sem: Semaphore,
-        pool: Executor,
+        parser: _BatchParser,
         sess: ClientSession,
         url: str,
         include_reporter_name: bool,
         parse_fn: Optional[Callable[[str, bool], T]] = None,
-    ) -> Optional[str]:
+    ) -> Optional[T]:
+        # The failures are counted by their stages and exception classes.
+        stage = "fetch"
         try:
-            async with sess.get(url) as resp:
-                content = await resp.text()
+            content, charset, cached = await self._fetch(
+                sess, url, raw=parse_fn is not None
+            )
+
+            # Archive the responses from the network only. The cached ones have been
+            # archived when they are fetched.
+            if self.archive is not None and not cached:
+                if isinstance(content, str):
+                    await self.archive.awrite(url, content.encode("utf-8"), "utf-8")
+                else:
+                    await self.archive.awrite(url, content, charset)
 
             # Run `parse_fn` in subprocess from process-pool for parallelism.
             if parse_fn is not None:
-                content = await asyncio.get_event_loop().run_in_executor(
-                    pool, parse_fn, content, include_reporter_name
+                stage = "parse"
+                content = await parser.parse(
+                    parse_fn, content, charset, include_reporter_name
                 )
-        except Exception:
+        except Exception as e:
+            self.metrics.increment("failures", stage=stage, error=_describe_error(e))
             content = None
 
-        sem.release()
         return content
 
-    async def _crawl_and_reduce(
+    async def _fetch_and_reduce(
         self,
+        parser: _BatchParser,
+        sess: ClientSession,
         urls: Iterable[str],
         include_reporter_name: bool,
-        parse_fn: Optional[Callable[[str], T]] = None,
-        callback_fn: Optional[Callable[[Optional[T]], None]] = None,
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
+        callback_fn: Optional[Callable[[str, Optional[T]], None]] = None,
+        paginate: bool = False,
     ):
-        # Create a semaphore to limit the number of concurrent tasks, a process-pool
-        # executor to run `parse_fn` in parallel and a http client session for
-        # asynchronous HTTP requests.
-        sem = Semaphore(self.concurrent_tasks)
-        pool = ProcessPoolExecutor(max_workers=self.num_parsing_processes)
-        sess = ClientSession(
-            headers=self.request_headers,
-            timeout=ClientTimeout(total=self.request_timeout),
-        )
-
-        futures = []
+        visited = set()
         for url in urls:
-            await sem.acquire()
-
-            # Create a fetching future.
-            f = asyncio.ensure_future(
-                self._fetch_and_parse(sem, pool, sess, url, include_reporter_name, parse_fn)
+            data = await self._fetch_and_parse(
+                parser, sess, url, include_reporter_name, parse_fn
             )
 
-            # Add done-callback function to the future.
+            # The callback function may be a coroutine function to wait for the
+            # consumer (e.g. streaming), which blocks the task and the scheduler.
             if callback_fn is not None:
-                f.add_done_callback(lambda f: callback_fn(f.result()))
+                result = callback_fn(url, data)
+                if inspect.isawaitable(result):
+                    await result
 
-            futures.append(f)
+            # Stop navigating the pages if the page yields no new item. Note that the
+            # out-of-range pages repeat the last page.
+            if paginate and data is not None:
+                if visited.issuperset(data):
+                    break
+                visited.update(data)
 
-        # Wait for the tasks to be complete and close the http client session and
-        # process-pool executor
-        await asyncio.wait(futures)
-        await sess.close()
-        pool.shutdown(wait=True)
-
-    def reduce_to_array(
+    def _spawn(
         self,
+        pending: Set[asyncio.Future],
+        sem: Semaphore,
+        parser: _BatchParser,
+        sess: ClientSession,
         urls: Iterable[str],
         include_reporter_name: bool,
-        parse_fn: Optional[Callable[[str], T]] = None,
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
+        callback_fn: Optional[Callable[[str, Optional[T]], None]] = None,
+        paginate: bool = False,
+    ) -> asyncio.Future:
+        # Create a fetching future which releases the semaphore when it is complete.
+        f = asyncio.ensure_future(
+            self._fetch_and_reduce(
+                parser,
+                sess,
+                urls,
+                include_reporter_name,
+                parse_fn,
+                callback_fn,
+                paginate,
+            )
+        )
+        f.add_done_callback(lambda f: sem.release())
+
+        self.metrics.add_gauge("in_flight", 1)
+        f.add_done_callback(lambda f: self.metrics.add_gauge("in_flight", -1))
+
+        # Keep only the in-flight tasks in memory. Each task is dropped from `pending`
+        # as soon as it is complete, so finished tasks and their results can be
+        # released immediately.
+        pending.add(f)
+        f.add_done_callback(pending.discard)
+
+        return f
+
+    def _cleanup(self, pending: Set[asyncio.Future], parser: _BatchParser):
+        # Cancel the remaining tasks if the crawling is stopped in the middle (e.g.
+        # the consumer stops streaming). The process pool is kept for the next
+        # crawlings.
+        for f in list(pending):
+            f.cancel()
+        parser.close()
+
+    async def _crawl_and_reduce(
+        self,
+        url_groups: Iterable[Iterable[str]],
+        include_reporter_name: bool,
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
+        callback_fn: Optional[Callable[[str, Optional[T]], None]] = None,
+        paginate: bool = False,
+    ):
+        # Create a semaphore to limit the number of concurrent tasks and a batch
+        # parser to run `parse_fn` in the process pool. The http client session and
+        # the process pool are shared across the crawlings.
+        sem = Semaphore(self.concurrent_tasks)
+        parser = _BatchParser(
+            self._get_pool(),
+            self.parse_batch_size,
+            self.parse_batch_timeout,
+            self.inline_parse_bytes,
+            self.metrics,
+            self.profile_dir,
+        )
+        sess = await self._get_session()
+
+        # Note that the urls are consumed lazily and the urls in each group are
+        # fetched in order.
+        pending = set()
+        try:
+            for urls in url_groups:
+                await sem.acquire()
+                self._spawn(
+                    pending,
+                    sem,
+                    parser,
+                    sess,
+                    urls,
+                    include_reporter_name,
+                    parse_fn,
+                    callback_fn,
+                    paginate,
+                )
+
+            # Wait for the remaining tasks to be complete.
+            if pending:
+                await asyncio.wait(pending)
+        finally:
+            self._cleanup(pending, parser)
+
+    async def _crawl_pipeline_and_reduce(
+        self,
+        nav_pages: Iterable[Iterable[str]],
+        article_urls: Iterable[str],
+        include_reporter_name: bool,
+        extract_fn: Callable[[str, bool], List[str]],
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
+        filter_fn: Optional[Callable[[str], bool]] = None,
+        nav_callback_fn: Optional[Callable[[str, Optional[List[str]]], None]] = None,
+        callback_fn: Optional[Callable[[str, Optional[T]], None]] = None,
+    ):
+        sem = Semaphore(self.concurrent_tasks)
+        parser = _BatchParser(
+            self._get_pool(),
+            self.parse_batch_size,
+            self.parse_batch_timeout,
+            self.inline_parse_bytes,
+            self.metrics,
+            self.profile_dir,
+        )
+        sess = await self._get_session()
+
+        # A queue of article urls to crawl. The duplicated articles and the ones
+        # rejected by `filter_fn` are removed before being queued. The articles are
+        # identified by their compact ids rather than the urls.
+        queue, visited = deque(), set()
+
+        def enqueue_fn(urls: Iterable[str]):
+            for url in urls:
+                key = utils.parse_article_id(url) or url
+                if key not in visited and (filter_fn is None or filter_fn(url)):
+                    visited.add(key)
+                    queue.append(url)
+
+        # A callback function to queue the article urls as soon as the navigation
+        # page is parsed.
+        def extract_callback_fn(url: str, urls: Optional[List[str]]):
+            if urls is not None:
+                enqueue_fn(urls)
+                discovered.set()
+
+            if nav_callback_fn is not None:
+                nav_callback_fn(url, urls)
+
+        # A callback function to notify that all pages in the group are navigated.
+        def navigated_fn(f: asyncio.Future):
+            nonlocal navigating
+            navigating -= 1
+            discovered.set()
+
+        enqueue_fn(article_urls)
+        nav_pages = iter(nav_pages)
+        navigating, discovered = 0, asyncio.Event()
+
+        pending = set()
+        try:
+            while True:
+                await sem.acquire()
+
+                # Crawl the queued articles first so that the contents are reduced as
+                # soon as possible, and navigate the next page only if there is no
+                # article to crawl.
+                if queue:
+                    self._spawn(
+                        pending,
+                        sem,
+                        parser,
+                        sess,
+                        [queue.popleft()],
+                        include_reporter_name,
+                        parse_fn,
+                        callback_fn,
+                    )
+                    continue
+
+                pages = next(nav_pages, None)
+                if pages is not None:
+                    navigating += 1
+                    self._spawn(
+                        pending,
+                        sem,
+                        parser,
+                        sess,
+                        pages,
+                        include_reporter_name,
+                        extract_fn,
+                        extract_callback_fn,
+                        paginate=True,
+                    ).add_done_callback(navigated_fn)
+                    continue
+
+                # Wait for the navigating tasks to discover new article urls. If there
+                # is no navigating task, then no more article will be queued.
+                sem.release()
+                if navigating == 0:
+                    break
+
+                discovered.clear()
+                await discovered.wait()
+
+            # Wait for the remaining tasks to be complete.
+            if pending:
+                await asyncio.wait(pending)
+        finally:
+            self._cleanup(pending, parser)
+
+    def _get_event_loop(self) -> asyncio.AbstractEventLoop:
+        # Create a new loop if the default one is closed or unset (e.g. after
+        # `asyncio.run`).
+        try:
+            loop = asyncio.get_event_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or loop.is_closed():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+        return loop
+
+    def _run_until_complete(self, coro: Awaitable):
+        # Get event loop and set to ignore `SSLError`s from `aiohttp` module.
+        loop = self._get_event_loop()
+        utils.ignore_aiohttp_ssl_error(loop)
+
+        try:
+            loop.run_until_complete(coro)
+        finally:
+            # Close the session which is created implicitly for this call, since
+            # nothing would close it otherwise. The crawler keeps the session across
+            # the calls only if it is used as a context manager.
+            if not self._keep_session:
+                self._close_session(loop)
+            else:
+                self._close_stale_sessions(loop)
+
+    def _reduce_to_writer(
+        self,
+        writer: BackgroundWriter,
+        crawl_fn: Callable[
+            [Callable[[str, Optional[T]], Awaitable[None]]], Awaitable[None]
+        ],
+        update_fn: Optional[Callable[[], None]] = None,
+        done_fn: Optional[Callable[[str], None]] = None,
+        format_fn: Optional[Callable[[str, T], Any]] = None,
+    ) -> int:
+        # A callback function to reduce collected data to the output writer. It waits
+        # for the writer if its queue is full.
+        async def callback_fn(url: str, data: Optional[T]):
+            if update_fn is not None:
+                update_fn()
+
+            if data is None:
+                return
+
+            # The formatter may drop the item (e.g. a near-duplicate article). It is
+            # completely reduced without being written.
+            item = format_fn(url, data) if format_fn is not None else str(data)
+            if item is None:
+                if done_fn is not None:
+                    done_fn(url)
+                return
+
+            # Increase the counter which indicates the number of actual reduced items.
+            nonlocal written
+            written += 1
+
+            # Notify that the url is completely reduced after the data is stored by
+            # the writer. Note that `done_fn` is called from the writer thread, and
+            # only the url is kept until then.
+            await writer.awrite(
+                item, partial(done_fn, url) if done_fn is not None else None
+            )
+
+        writer.attach_metrics(self.metrics)
+        written = 0
+        self._run_until_complete(crawl_fn(callback_fn))
+
+        return written
+
+    def _reduce_to_array(
+        self,
+        crawl_fn: Callable[[Callable[[str, Optional[T]], None]], Awaitable[None]],
         update_fn: Optional[Callable[[], None]] = None,
+        done_fn: Optional[Callable[[str, T], None]] = None,
     ) -> List[T]:
         # A callback function to reduce collected data to the array.
-        def callback_fn(data: Optional[T]):
+        def callback_fn(url: str, data: Optional[T]):
             if update_fn is not None:
                 update_fn()
 
             if data is not None:
                 results.append(data)
 
-        # Get event loop and set to ignore `SSLError`s from `aiohttp` module.
-        loop = asyncio.get_event_loop()
-        utils.ignore_aiohttp_ssl_error(loop)
+                # Notify that the url is completely reduced.
+                if done_fn is not None:
+                    done_fn(url, data)
 
         results = []
-        loop.run_until_complete(self._crawl_and_reduce(urls, include_reporter_name, parse_fn, callback_fn))
+        self._run_until_complete(crawl_fn(callback_fn))
 
         return results
 
+    def reduce_to_array(
+        self,
+        urls: Iterable[str],
+        include_reporter_name: bool,
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
+        update_fn: Optional[Callable[[], None]] = None,
+        done_fn: Optional[Callable[[str, T], None]] = None,
+    ) -> List[T]:
+        return self._reduce_to_array(
+            lambda callback_fn: self._crawl_and_reduce(
+                ([url] for url in urls), include_reporter_name, parse_fn, callback_fn
+            ),
+            update_fn,
+            done_fn,
+        )
+
+    def reduce_pages_to_array(
+        self,
+        pages: Iterable[Iterable[str]],
+        include_reporter_name: bool,
+        parse_fn: Callable[[str, bool], Collection[T]],
+        update_fn: Optional[Callable[[], None]] = None,
+        done_fn: Optional[Callable[[str, Collection[T]], None]] = None,
+    ) -> List[Collection[T]]:
+        return self._reduce_to_array(
+            lambda callback_fn: self._crawl_and_reduce(
+                pages, include_reporter_name, parse_fn, callback_fn, paginate=True
+            ),
+            update_fn,
+            done_fn,
+        )
+
     def reduce_to_file(
         self,
         urls: Iterable[str],
         filename: str,
         include_reporter_name: bool,
-        parse_fn: Optional[Callable[[str], T]] = None,
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
         update_fn: Optional[Callable[[], None]] = None,
+        done_fn: Optional[Callable[[str], None]] = None,
+        append: bool = False,
     ) -> int:
-        with open(filename, "w") as fp:
-            # A callback function to reduce collected data to the output file.
-            def callback_fn(data: Optional[T]):
-                if update_fn is not None:
-                    update_fn()
+        with ShardedWriter(filename, append=append) as writer:
+            return self.reduce_to_writer(
+                urls, writer, include_reporter_name, parse_fn, update_fn, done_fn
+            )
 
-                if data is not None:
-                    # Increase the counter which indicates the number of actual reduced
-                    # items.
-                    nonlocal written
-                    written += 1
+    def reduce_to_writer(
+        self,
+        urls: Iterable[str],
+        writer: BackgroundWriter,
+        include_reporter_name: bool,
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
+        update_fn: Optional[Callable[[], None]] = None,
+        done_fn: Optional[Callable[[str], None]] = None,
+        format_fn: Optional[Callable[[str, T], Any]] = None,
+    ) -> int:
+        return self._reduce_to_writer(
+            writer,
+            lambda callback_fn: self._crawl_and_reduce(
+                ([url] for url in urls), include_reporter_name, parse_fn, callback_fn
+            ),
+            update_fn,
+            done_fn,
+            format_fn,
+        )
 
-                    fp.write(str(data) + "\n")
+    def reduce_pipeline_to_writer(
+        self,
+        nav_pages: Iterable[Iterable[str]],
+        writer: BackgroundWriter,
+        include_reporter_name: bool,
+        extract_fn: Callable[[str, bool], List[str]],
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
+        article_urls: Iterable[str] = (),
+        filter_fn: Optional[Callable[[str], bool]] = None,
+        update_fn: Optional[Callable[[], None]] = None,
+        nav_done_fn: Optional[Callable[[str, List[str]], None]] = None,
+        done_fn: Optional[Callable[[str], None]] = None,
+        format_fn: Optional[Callable[[str, T], Any]] = None,
+    ) -> int:
+        # A callback function to notify that the navigation page is completely parsed.
+        def nav_callback_fn(url: str, urls: Optional[List[str]]):
+            if urls is not None and nav_done_fn is not None:
+                nav_done_fn(url, urls)
 
-            # Get event loop and set to ignore `SSLError`s from `aiohttp` module.
-            loop = asyncio.get_event_loop()
-            utils.ignore_aiohttp_ssl_error(loop)
+        return self._reduce_to_writer(
+            writer,
+            lambda callback_fn: self._crawl_pipeline_and_reduce(
+                nav_pages,
+                article_urls,
+                include_reporter_name,
+                extract_fn,
+                parse_fn,
+                filter_fn,
+                nav_callback_fn,
+                callback_fn,
+            ),
+            update_fn,
+            done_fn,
+            format_fn,
+        )
 
-            written = 0
-            loop.run_until_complete(self._crawl_and_reduce(urls, include_reporter_name, parse_fn, callback_fn))
+    async def _stream(
+        self,
+        crawl_fn: Callable[[Callable[[str, Optional[T]], Awaitable[None]]], Awaitable],
+        max_buffered: int,
+    ) -> AsyncIterator[Tuple[str, T]]:
+        # The crawled items are buffered until the consumer takes them. If the buffer
+        # is full, the tasks wait for the consumer and the scheduler stops spawning
+        # new tasks.
+        buffer, available = asyncio.Queue(), Semaphore(max_buffered)
 
-        return written
+        async def callback_fn(url: str, data: Optional[T]):
+            if data is not None:
+                await available.acquire()
+                buffer.put_nowait((url, data))
+
+        # Run the crawling on the running event loop of the caller. The end of the
+        # crawling is notified with `None`.
+        crawling = asyncio.ensure_future(crawl_fn(callback_fn))
+        crawling.add_done_callback(lambda f: buffer.put_nowait(None))
+
+        try:
+            while True:
+                item = await buffer.get()
+                if item is None:
+                    break
+
+                available.release()
+                yield item
+
+            # Raise the exception from the crawling if exists.
+            await crawling
+        finally:
+            # Stop the crawling if the consumer stops streaming in the middle.
+            if not crawling.done():
+                crawling.cancel()
+                try:
+                    await crawling
+                except asyncio.CancelledError:
+                    pass
+
+    def stream(
+        self,
+        urls: Iterable[str],
+        include_reporter_name: bool,
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
+        max_buffered: int = 1000,
+    ) -> AsyncIterator[Tuple[str, T]]:
+        return self._stream(
+            lambda callback_fn: self._crawl_and_reduce(
+                ([url] for url in urls), include_reporter_name, parse_fn, callback_fn
+            ),
+            max_buffered,
+        )
+
+    def stream_pipeline(
+        self,
+        nav_pages: Iterable[Iterable[str]],
+        include_reporter_name: bool,
+        extract_fn: Callable[[str, bool], List[str]],
+        parse_fn: Optional[Callable[[str, bool], T]] = None,
+        article_urls: Iterable[str] = (),
+        filter_fn: Optional[Callable[[str], bool]] = None,
+        max_buffered: int = 1000,
+    ) -> AsyncIterator[Tuple[str, T]]:
+        return self._stream(
+            lambda callback_fn: self._crawl_pipeline_and_reduce(
+                nav_pages,
+                article_urls,
+                include_reporter_name,
+                extract_fn,
+                parse_fn,
+                filter_fn,
+                callback_fn=callback_fn,
+            ),
+            max_buffered,
+        )
@@ -0,0 +1,250 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Any, Callable, Dict, Optional, Sequence, Set, Tuple
+
+from .monitoring import Metrics
+
+# The header of the index file contains its parameters, the number of the indexed
+# documents and the bit array of the bloom filter follows it.
+_INDEX_MAGIC = b"CRVNLSH1"
+_INDEX_HEADER = struct.Struct("<8sIIQIQ")
+
+_UINT64_MASK = (1 << 64) - 1
+_GOLDEN_RATIO_64 = 0x9E3779B97F4A7C15
+
+
+def minhash_signature(
+    text: str, num_perm: int = 128, shingle_size: int = 5
+) -> Optional[Tuple[int, ...]]:
+    # Compute the signature with one permutation hashing, which splits the hashed
+    # shingles into `num_perm` bins and takes the minimum of each bin, rather than
+    # hashing every shingle `num_perm` times. The character shingles are taken from
+    # the whitespace-normalized text, since Korean words are inflected.
+    text = " ".join(text.split())
+    shingles = {text[i : i + shingle_size] for i in range(len(text) - shingle_size + 1)}
+    if not shingles:
+        return None
+
+    # The 32-bit checksums are spread to 64 bits by the multiplicative hashing. The
+    # hashes are sorted in descending order, so the minimum of each bin is assigned
+    # last.
+    hashes = sorted(
+        (
+            (zlib.crc32(shingle.encode("utf-8")) * _GOLDEN_RATIO_64) & _UINT64_MASK
+            for shingle in shingles
+        ),
+        reverse=True,
+    )
+    bins = {h % num_perm: h // num_perm for h in hashes}
+
+    # Fill the empty bins with the values of the next non-empty bins (rotation), so
+    # the similar documents still agree on them.
+    signature = []
+    for i in range(num_perm):
+        offset = 0
+        while (i + offset) % num_perm not in bins:
+            offset += 1
+        signature.append(bins[(i + offset) % num_perm] + (offset << 64))
+    return tuple(signature)
+
+
+def band_keys(signature: Sequence[int], num_bands: int) -> Tuple[int, ...]:
+    # Hash each band of the signature with its position to a 64-bit key. The
+    # documents which share any band key are the near-duplicate candidates.
+    rows = len(signature) // num_bands
+    return tuple(
+        int.from_bytes(
+            hashlib.blake2b(
+                repr((b, signature[b * rows : (b + 1) * rows])).encode("ascii"),
+                digest_size=8,
+            ).digest(),
+            "little",
+        )
+        for b in range(num_bands)
+    )
+
+
+def sign_parsed(
+    parse_fn: Callable[[str, bool], Any],
+    num_bands: int,
+    rows: int,
+    shingle_size: int,
+    document: str,
+    include_reporter_name: bool,
+) -> Tuple[Any, Optional[Tuple[int, ...]]]:
+    # Compute the band keys of the parsed content in the parsing process, so the
+    # main process only looks them up. The structured records are signed by their
+    # contents.
+    data = parse_fn(document, include_reporter_name)
+    content = data["content"] if isinstance(data, dict) else data
+
+    signature = minhash_signature(content, num_bands * rows, shingle_size)
+    return data, band_keys(signature, num_bands) if signature is not None else None
+
+
+class NearDuplicateIndex:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        capacity: int = 1000000,
+        error_rate: float = 0.001,
+        num_bands: int = 16,
+        rows: int = 8,
+    ):
+        self.path = path
+        self.num_bands = num_bands
+        self.rows = rows
+
+        # The band keys are stored in a bloom filter rather than the buckets of the
+        # documents, so the memory is bounded regardless of the number of the indexed
+        # documents. Each band is checked separately, so the false positive rate of a
+        # key is divided by the number of the bands.
+        key_error_rate = error_rate / num_bands
+        self.num_bits = math.ceil(
+            -capacity * num_bands * math.log(key_error_rate) / math.log(2) ** 2
+        )
+        self.num_hashes = max(1, round(-math.log2(key_error_rate)))
+        self.count = 0
+
+        if path is None:
+            self._mmap, self._bits = None, bytearray((self.num_bits + 7) // 8)
+        else:
+            self._open(path)
+
+    def _open(self, path: str):
+        # Create the index file with the empty bit array, or continue with the one of
+        # the previous runs. Its parameters are kept, since the bit positions depend
+        # on them.
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as fp:
+                fp.write(self._pack_header())
+                fp.truncate(_INDEX_HEADER.size + (self.num_bits + 7) // 8)
+
+        with open(path, "r+b") as fp:
+            magic, num_bands, rows, num_bits, num_hashes, count = _INDEX_HEADER.unpack(
+                fp.read(_INDEX_HEADER.size)
+            )
+            if magic != _INDEX_MAGIC:
+                raise ValueError(f"[{path}] is not a near-duplicate index.")
+            if (num_bands, rows) != (self.num_bands, self.rows):
+                raise ValueError(
+                    f"[{path}] is built with {num_bands} bands of {rows} rows."
+                )
+
+            self.num_bits, self.num_hashes, self.count = num_bits, num_hashes, count
+            self._mmap = mmap.mmap(fp.fileno(), 0)
+        self._bits = memoryview(self._mmap)[_INDEX_HEADER.size :]
+
+    def _pack_header(self) -> bytes:
+        return _INDEX_HEADER.pack(
+            _INDEX_MAGIC,
+            self.num_bands,
+            self.rows,
+            self.num_bits,
+            self.num_hashes,
+            self.count,
+        )
+
+    def _positions(self, key: int) -> range:
+        # Derive the bit positions of the key by the double hashing.
+        step = (key >> 32) | 1
+        return range(key, key + step * self.num_hashes, step)
+
+    def _contains_key(self, key: int) -> bool:
+        for position in self._positions(key):
+            position %= self.num_bits
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def contains(self, keys: Sequence[int]) -> bool:
+        # Check whether any band of the document matches the indexed ones.
+        return any(self._contains_key(key) for key in keys)
+
+    def insert(self, keys: Sequence[int]):
+        for key in keys:
+            for position in self._positions(key):
+                position %= self.num_bits
+                self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def add(self, keys: Sequence[int]) -> bool:
+        # Only the new documents are indexed, so the near-duplicates do not chain the
+        # dissimilar documents together.
+        if self.contains(keys):
+            return True
+        self.insert(keys)
+        return False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def flush(self):
+        if self._mmap is not None:
+            self._mmap[: _INDEX_HEADER.size] = self._pack_header()
+            self._mmap.flush()
+
+    def close(self):
+        if self._mmap is not None:
+            self.flush()
+            self._bits.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> "NearDuplicateIndex":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def deduplicate_output(
+    index: NearDuplicateIndex,
+    tag: bool = False,
+    format_fn: Optional[Callable[[str, Any], Any]] = None,
+    metrics: Optional[Metrics] = None,
+) -> Tuple[
+    Callable[[str, Tuple[Any, Optional[Tuple[int, ...]]]], Any], Callable[[str], None]
+]:
+    # The keys of the new documents are kept in memory until the writer commits them,
+    # and then inserted by the returned commit function. Otherwise the articles lost
+    # in a crash would be dropped as the duplicates of themselves on resume. Note
+    # that the commit function is called from the writer thread.
+    pending: Dict[str, Tuple[int, ...]] = {}
+    pending_keys: Set[int] = set()
+    lock = threading.Lock()
+
+    # Check the signed data from `sign_parsed` against the index and the uncommitted
+    # documents before writing it. The near-duplicates are dropped (formatted to
+    # `None`) or tagged in their records.
+    def dedup_format_fn(url: str, signed: Tuple[Any, Optional[Tuple[int, ...]]]):
+        data, keys = signed
+        duplicated = False
+        if keys is not None:
+            with lock:
+                duplicated = not pending_keys.isdisjoint(keys) or index.contains(keys)
+                if not duplicated:
+                    pending[url] = keys
+                    pending_keys.update(keys)
+        if metrics is not None and duplicated:
+            metrics.increment("near_duplicates")
+
+        if tag:
+            data = {**data, "near_duplicate": duplicated}
+        elif duplicated:
+            return None
+        return format_fn(url, data) if format_fn is not None else str(data)
+
+    def commit_fn(url: str):
+        with lock:
+            keys = pending.pop(url, None)
+            if keys is not None:
+                index.insert(keys)
+                pending_keys.difference_update(keys)
+
+    return dedup_format_fn, commit_fn
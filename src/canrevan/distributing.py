@@ -0,0 +1,428 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+# The states of the tasks in the sqlite work queue.
+_PENDING, _LEASED, _DONE, _FAILED = range(4)
+
+# The redis work queue keeps the attempts of every task in a hash (which also
+# removes the duplicated tasks), the pending tasks in a list and the leased tasks in
+# a sorted set with their lease deadlines. The scripts are run atomically.
+_REDIS_PUT_SCRIPT = """
+local added = 0
+for _, item in ipairs(ARGV) do
+    if redis.call("HSETNX", KEYS[1], item, 0) == 1 then
+        redis.call("RPUSH", KEYS[2], item)
+        added = added + 1
+    end
+end
+return added
+"""
+_REDIS_LEASE_SCRIPT = """
+for _, item in ipairs(redis.call("ZRANGEBYSCORE", KEYS[3], "-inf", ARGV[1])) do
+    redis.call("ZREM", KEYS[3], item)
+    redis.call("RPUSH", KEYS[2], item)
+end
+
+local leased = {}
+while #leased < tonumber(ARGV[3]) do
+    local item = redis.call("LPOP", KEYS[2])
+    if not item then
+        break
+    end
+
+    if redis.call("HINCRBY", KEYS[1], item, 1) <= tonumber(ARGV[4]) then
+        redis.call("ZADD", KEYS[3], ARGV[2], item)
+        table.insert(leased, item)
+    end
+end
+return leased
+"""
+_REDIS_NACK_SCRIPT = """
+for _, item in ipairs(ARGV) do
+    if redis.call("ZREM", KEYS[3], item) == 1 then
+        redis.call("RPUSH", KEYS[2], item)
+    end
+end
+"""
+
+
+class WorkQueue:
+    def put(self, kind: str, items: Iterable[str]) -> int:
+        raise NotImplementedError()
+
+    def lease(self, kind: str, count: int) -> List[str]:
+        raise NotImplementedError()
+
+    def ack(self, kind: str, items: Iterable[str]):
+        raise NotImplementedError()
+
+    def nack(self, kind: str, items: Iterable[str]):
+        raise NotImplementedError()
+
+    def renew(self, kind: str, items: Iterable[str]):
+        raise NotImplementedError()
+
+    def remaining(self, kind: str) -> int:
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SQLiteWorkQueue(WorkQueue):
+    def __init__(self, path: str, lease_timeout: float = 600, max_attempts: int = 3):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+
+        # The tasks are acknowledged from the output writer thread as well.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "kind TEXT NOT NULL, item TEXT NOT NULL, state INTEGER NOT NULL, "
+            "deadline REAL NOT NULL, attempts INTEGER NOT NULL, "
+            "PRIMARY KEY (kind, item))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS tasks_state ON tasks (kind, state, deadline)"
+        )
+
+    def _execute_in_transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            # Lock the database for writing at the beginning of the transaction, so
+            # the workers do not lease the same tasks.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def put(self, kind: str, items: Iterable[str]) -> int:
+        def put_fn(conn: sqlite3.Connection) -> int:
+            total_changes = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks VALUES (?, ?, ?, 0, 0)",
+                ((kind, item, _PENDING) for item in items),
+            )
+            return conn.total_changes - total_changes
+
+        return self._execute_in_transaction(put_fn)
+
+    def lease(self, kind: str, count: int) -> List[str]:
+        def lease_fn(conn: sqlite3.Connection) -> List[str]:
+            # The pending tasks and the ones whose lease is expired are available.
+            # The tasks which are attempted too many times are given up.
+            now = time.time()
+            available = "kind = ? AND (state = ? OR (state = ? AND deadline < ?))"
+            conn.execute(
+                f"UPDATE tasks SET state = ? WHERE {available} AND attempts >= ?",
+                (_FAILED, kind, _PENDING, _LEASED, now, self.max_attempts),
+            )
+
+            items = [
+                item
+                for item, in conn.execute(
+                    f"SELECT item FROM tasks WHERE {available} LIMIT ?",
+                    (kind, _PENDING, _LEASED, now, count),
+                )
+            ]
+            conn.executemany(
+                "UPDATE tasks SET state = ?, deadline = ?, attempts = attempts + 1 "
+                "WHERE kind = ? AND item = ?",
+                ((_LEASED, now + self.lease_timeout, kind, item) for item in items),
+            )
+            return items
+
+        return self._execute_in_transaction(lease_fn)
+
+    def ack(self, kind: str, items: Iterable[str]):
+        self._execute_in_transaction(
+            lambda conn: conn.executemany(
+                "UPDATE tasks SET state = ? WHERE kind = ? AND item = ?",
+                ((_DONE, kind, item) for item in items),
+            )
+        )
+
+    def nack(self, kind: str, items: Iterable[str]):
+        self._execute_in_transaction(
+            lambda conn: conn.executemany(
+                "UPDATE tasks SET state = ? WHERE kind = ? AND item = ? AND state = ?",
+                ((_PENDING, kind, item, _LEASED) for item in items),
+            )
+        )
+
+    def renew(self, kind: str, items: Iterable[str]):
+        deadline = time.time() + self.lease_timeout
+        self._execute_in_transaction(
+            lambda conn: conn.executemany(
+                "UPDATE tasks SET deadline = ? "
+                "WHERE kind = ? AND item = ? AND state = ?",
+                ((deadline, kind, item, _LEASED) for item in items),
+            )
+        )
+
+    def remaining(self, kind: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE kind = ? AND state IN (?, ?)",
+                (kind, _PENDING, _LEASED),
+            ).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class RedisWorkQueue(WorkQueue):
+    def __init__(
+        self,
+        client: Any,
+        prefix: str = "canrevan",
+        lease_timeout: float = 600,
+        max_attempts: int = 3,
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+
+        self._put_script = client.register_script(_REDIS_PUT_SCRIPT)
+        self._lease_script = client.register_script(_REDIS_LEASE_SCRIPT)
+        self._nack_script = client.register_script(_REDIS_NACK_SCRIPT)
+
+    def _keys(self, kind: str) -> List[str]:
+        return [
+            f"{self.prefix}:{kind}:{name}" for name in ["items", "pending", "leased"]
+        ]
+
+    def put(self, kind: str, items: Iterable[str]) -> int:
+        items = list(items)
+        return self._put_script(keys=self._keys(kind), args=items) if items else 0
+
+    def lease(self, kind: str, count: int) -> List[str]:
+        # Note that the lease deadlines are compared with the clocks of the workers,
+        # so the clocks should be synchronized.
+        now = time.time()
+        items = self._lease_script(
+            keys=self._keys(kind),
+            args=[now, now + self.lease_timeout, count, self.max_attempts],
+        )
+        return [item.decode("utf-8") for item in items]
+
+    def ack(self, kind: str, items: Iterable[str]):
+        items = list(items)
+        if items:
+            self.client.zrem(self._keys(kind)[2], *items)
+
+    def nack(self, kind: str, items: Iterable[str]):
+        items = list(items)
+        if items:
+            self._nack_script(keys=self._keys(kind), args=items)
+
+    def renew(self, kind: str, items: Iterable[str]):
+        # Extend the deadlines of the items which are still leased only.
+        deadline = time.time() + self.lease_timeout
+        items = list(items)
+        if items:
+            self.client.zadd(
+                self._keys(kind)[2], {item: deadline for item in items}, xx=True
+            )
+
+    def remaining(self, kind: str) -> int:
+        _, pending, leased = self._keys(kind)
+        return self.client.llen(pending) + self.client.zcard(leased)
+
+
+def open_work_queue(url: str, **kwargs: Any) -> WorkQueue:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        # `redis` is an optional dependency which is required only for the redis
+        # work queue.
+        import redis
+
+        return RedisWorkQueue(redis.Redis.from_url(url), **kwargs)
+
+    if url.startswith("sqlite://"):
+        url = url[len("sqlite://") :]
+    return SQLiteWorkQueue(url, **kwargs)
+
+
+class _UncommittedArticles:
+    def __init__(self, queue: WorkQueue, done_fn: Optional[Callable[[str], None]]):
+        self.queue = queue
+        self.done_fn = done_fn
+
+        # The articles are acknowledged from the output writer thread.
+        self._urls: Set[str] = set()
+        self._lock = threading.Lock()
+        self._renewed = time.time()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._urls)
+
+    def add(self, url: str):
+        with self._lock:
+            self._urls.add(url)
+
+    def ack(self, url: str):
+        self.queue.ack("article", [url])
+        with self._lock:
+            self._urls.discard(url)
+
+        if self.done_fn is not None:
+            self.done_fn(url)
+
+    def renew(self):
+        # Renew the leases before a half of the lease timeout is passed.
+        if time.time() - self._renewed < self.queue.lease_timeout / 2:
+            return
+
+        with self._lock:
+            urls = list(self._urls)
+        self.queue.renew("article", urls)
+        self._renewed = time.time()
+
+
+def crawl_from_queue(
+    crawler: Any,
+    queue: WorkQueue,
+    writer: Any,
+    include_reporter_name: bool,
+    extract_fn: Callable[[str, bool], List[str]],
+    parse_fn: Optional[Callable[[str, bool], Any]] = None,
+    format_fn: Optional[Callable[[str, Any], Any]] = None,
+    filter_fn: Optional[Callable[[str], bool]] = None,
+    update_fn: Optional[Callable[[], None]] = None,
+    done_fn: Optional[Callable[[str], None]] = None,
+    lease_size: int = 100,
+    nav_lease_size: int = 8,
+    poll_interval: float = 5.0,
+) -> int:
+    # The articles passed to the writer stay leased until the writer stores them,
+    # which may take a while with the compressed or parquet outputs. Their leases
+    # are renewed meanwhile so that they are not crawled again.
+    uncommitted = _UncommittedArticles(queue, done_fn)
+
+    written = 0
+    while True:
+        uncommitted.renew()
+
+        # Crawl the discovered articles first so that the contents are reduced as
+        # soon as possible, and navigate the next pages only if there is no article.
+        urls = queue.lease("article", lease_size)
+        if urls:
+            written += _crawl_leased_articles(
+                crawler,
+                queue,
+                writer,
+                urls,
+                include_reporter_name,
+                uncommitted,
+                parse_fn,
+                format_fn,
+                update_fn,
+            )
+            continue
+
+        groups = queue.lease("nav", nav_lease_size)
+        if groups:
+            # Share the article urls with the other workers as soon as each page is
+            # navigated.
+            navigated = {}
+
+            def nav_done_fn(url: str, article_urls: List[str]):
+                navigated[url] = article_urls
+                queue.put(
+                    "article",
+                    (u for u in article_urls if filter_fn is None or filter_fn(u)),
+                )
+
+            crawler.reduce_pages_to_array(
+                [json.loads(pages) for pages in groups],
+                include_reporter_name,
+                parse_fn=extract_fn,
+                done_fn=nav_done_fn,
+            )
+
+            # Release the groups with the failed pages to be retried by any worker.
+            # They are given up after too many attempts.
+            finished = [g for g in groups if _is_group_navigated(g, navigated)]
+            queue.ack("nav", finished)
+            queue.nack("nav", [g for g in groups if g not in finished])
+            continue
+
+        # Finish if all tasks are done, except the articles of this worker which are
+        # acknowledged when the writer is closed. Otherwise, wait for the other
+        # workers to discover new articles or for their leases to be expired.
+        remaining = queue.remaining("article") - len(uncommitted)
+        if queue.remaining("nav") == 0 and remaining <= 0:
+            break
+        time.sleep(poll_interval)
+
+    return written
+
+
+def _is_group_navigated(group: str, navigated: Dict[str, List[str]]) -> bool:
+    # Follow the pages of the group as the crawler does. The group is navigated if
+    # its pages are navigated until the last one or the one which yields no new
+    # article.
+    visited = set()
+    for url in json.loads(group):
+        if url not in navigated:
+            return False
+        if visited.issuperset(navigated[url]):
+            break
+        visited.update(navigated[url])
+    return True
+
+
+def _crawl_leased_articles(
+    crawler: Any,
+    queue: WorkQueue,
+    writer: Any,
+    urls: List[str],
+    include_reporter_name: bool,
+    uncommitted: _UncommittedArticles,
+    parse_fn: Optional[Callable[[str, bool], Any]] = None,
+    format_fn: Optional[Callable[[str, Any], Any]] = None,
+    update_fn: Optional[Callable[[], None]] = None,
+) -> int:
+    # Track the articles which are passed to the writer. They are acknowledged after
+    # being stored by the writer.
+    submitted = set()
+
+    def submit_fn(url: str, data: Any) -> Any:
+        submitted.add(url)
+        uncommitted.add(url)
+        return format_fn(url, data) if format_fn is not None else str(data)
+
+    written = crawler.reduce_to_writer(
+        urls,
+        writer,
+        include_reporter_name,
+        parse_fn=parse_fn,
+        update_fn=update_fn,
+        done_fn=uncommitted.ack,
+        format_fn=submit_fn,
+    )
+
+    # Release the failed articles to be retried by any worker. They are given up
+    # after too many attempts.
+    queue.nack("article", [url for url in urls if url not in submitted])
+    return written
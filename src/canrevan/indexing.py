@@ -0,0 +1,133 @@
+import bisect
+import heapq
+import mmap
+import os
+import threading
+from array import array
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Article ids are packed into unsigned 64-bit integers as `oid * 10 ** 10 + aid`,
+# since `aid` has at most 10 digits.
+_AID_DIGITS_BASE = 10**10
+_MERGE_CHUNK_SIZE = 1 << 16
+
+
+class CompletionIndex:
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.navigated: Dict[str, List[str]] = {}
+        self.crawled: Set[str] = set()
+        self.groups: Set[str] = set()
+
+        if resume and os.path.exists(path):
+            self._load()
+        self.fp = open(path, "a" if resume else "w", encoding="utf-8")
+
+        # The records may be written from the output writer thread as well.
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Read the completion records from the index file. Note that the last line
+        # may be truncated if the previous crawling was killed while writing it.
+        valid_size = 0
+        with open(self.path, "rb") as fp:
+            for line in fp:
+                if not line.endswith(b"\n"):
+                    break
+                valid_size += len(line)
+
+                kind, url, *article_urls = line.decode("utf-8").rstrip("\n").split("\t")
+                if kind == "nav":
+                    self.navigated[url] = article_urls
+                elif kind == "article":
+                    self.crawled.add(url)
+                elif kind == "group":
+                    self.groups.add(url)
+
+        # Remove the truncated record to append new records after the valid ones.
+        os.truncate(self.path, valid_size)
+
+    def mark_navigated(self, url: str, article_urls: List[str]):
+        with self._lock:
+            self.navigated[url] = article_urls
+            self.fp.write("\t".join(["nav", url] + article_urls) + "\n")
+            self.fp.flush()
+
+    def mark_crawled(self, url: str):
+        with self._lock:
+            self.crawled.add(url)
+            self.fp.write(f"article\t{url}\n")
+            self.fp.flush()
+
+    def mark_group(self, url: str):
+        with self._lock:
+            self.groups.add(url)
+            self.fp.write(f"group\t{url}\n")
+            self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self) -> "CompletionIndex":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ArticleIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._open()
+
+    def _open(self):
+        # Map the sorted packed ids to the memory rather than loading them, so only
+        # the pages touched by binary searches are read from the disk.
+        self._mmap, self.ids = None, array("Q")
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb") as fp:
+                self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            self.ids = memoryview(self._mmap).cast("Q")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, article_id: Tuple[int, int]) -> bool:
+        key = article_id[0] * _AID_DIGITS_BASE + article_id[1]
+        i = bisect.bisect_left(self.ids, key)
+        return i < len(self.ids) and self.ids[i] == key
+
+    def update(self, article_ids: Iterable[Tuple[int, int]]):
+        new_ids = sorted({oid * _AID_DIGITS_BASE + aid for oid, aid in article_ids})
+
+        # Merge the new ids into the sorted ids and write them to the temporary file
+        # chunk by chunk to avoid loading the whole index into the memory.
+        with open(f"{self.path}.tmp", "wb") as fp:
+            chunk, last = array("Q"), None
+            for key in heapq.merge(self.ids, new_ids):
+                if key == last:
+                    continue
+                chunk.append(key)
+                last = key
+
+                if len(chunk) >= _MERGE_CHUNK_SIZE:
+                    chunk.tofile(fp)
+                    del chunk[:]
+            chunk.tofile(fp)
+
+        # Replace the index file with the merged one.
+        self.close()
+        os.replace(f"{self.path}.tmp", self.path)
+        self._open()
+
+    def close(self):
+        if self._mmap is not None:
+            self.ids.release()
+            self._mmap.close()
+            self._mmap, self.ids = None, array("Q")
+
+    def __enter__(self) -> "ArticleIndex":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
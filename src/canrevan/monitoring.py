@@ -0,0 +1,300 @@
+import bisect
+import cProfile
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+# Upper bounds of the latency histogram buckets in seconds. The sub-millisecond
+# buckets measure the stages in the main process (e.g. the normalization stages and
+# the writes), which take only microseconds.
+_LATENCY_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = _LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float:
+        # Estimate the quantile by interpolating linearly within the bucket which
+        # contains it, like `histogram_quantile` of prometheus.
+        if self.count == 0:
+            return 0.0
+
+        rank, accumulated, lower = q * self.count, 0, 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and accumulated + count >= rank:
+                return lower + (bound - lower) * (rank - accumulated) / count
+            accumulated, lower = accumulated + count, bound
+        return self.buckets[-1]
+
+    def cumulative_counts(self) -> Dict[str, int]:
+        counts, accumulated = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            accumulated += count
+            counts[str(bound)] = accumulated
+        counts["+Inf"] = self.count
+        return counts
+
+
+def _counter_key(
+    name: str, labels: Dict[str, Any]
+) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.gauge_fns: Dict[str, Callable[[], float]] = {}
+
+        # The metrics are updated from the output writer thread as well.
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(value)
+
+    def increment(self, name: str, value: float = 1, **labels: Any):
+        key = _counter_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def merge(self, recorded: "RecordedMetrics"):
+        histograms, counters = recorded
+        with self._lock:
+            for name, histogram in histograms.items():
+                if name not in self.histograms:
+                    self.histograms[name] = Histogram()
+                self.histograms[name].merge(histogram)
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_gauge(self, name: str, delta: float):
+        with self._lock:
+            self.gauges[name] = self.gauges.get(name, 0) + delta
+
+    def register_gauge(self, name: str, gauge_fn: Callable[[], float]):
+        self.gauge_fns[name] = gauge_fn
+
+    def _collect_gauges(self) -> Dict[str, float]:
+        gauges = dict(self.gauges)
+        gauges.update((name, fn()) for name, fn in self.gauge_fns.items())
+        return gauges
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "time": time.time(),
+                "uptime": time.time() - self.started,
+                "counters": {
+                    name + _format_labels(labels): value
+                    for (name, labels), value in sorted(self.counters.items())
+                },
+                "gauges": self._collect_gauges(),
+                "histograms": {
+                    name: {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "p50": histogram.quantile(0.5),
+                        "p99": histogram.quantile(0.99),
+                        "buckets": histogram.cumulative_counts(),
+                    }
+                    for name, histogram in sorted(self.histograms.items())
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"canrevan_{name}_total{_format_labels(labels)} {value}")
+            for name, value in sorted(self._collect_gauges().items()):
+                lines.append(f"canrevan_{name} {value}")
+            for name, histogram in sorted(self.histograms.items()):
+                for bound, count in histogram.cumulative_counts().items():
+                    lines.append(
+                        f'canrevan_{name}_seconds_bucket{{le="{bound}"}} {count}'
+                    )
+                lines.append(f"canrevan_{name}_seconds_sum {histogram.sum}")
+                lines.append(f"canrevan_{name}_seconds_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+RecordedMetrics = Tuple[
+    Dict[str, Histogram], Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]
+]
+
+
+class MetricsRecorder:
+    # Record the metrics in the parsing processes. They are sent back with the
+    # parsing results and merged into the metrics of the crawler. The observations
+    # are aggregated into the histograms, so the memory is bounded even if they are
+    # never collected.
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def observe(self, name: str, value: float):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].observe(value)
+
+    def increment(self, name: str, value: float = 1, **labels: Any):
+        key = _counter_key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def drain(self) -> RecordedMetrics:
+        recorded = (self.histograms, self.counters)
+        self.histograms, self.counters = {}, {}
+        return recorded
+
+
+# The recorder of the current process.
+worker_metrics = MetricsRecorder()
+
+
+class MetricsExporter:
+    def __init__(
+        self,
+        metrics: Metrics,
+        snapshot_path: Optional[str] = None,
+        interval: float = 10.0,
+        port: Optional[int] = None,
+    ):
+        self.metrics = metrics
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+
+        # Append the snapshots to the file periodically in the background thread.
+        self._stopped = threading.Event()
+        self._thread = None
+        if snapshot_path is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+        # Serve the metrics in the prometheus text format.
+        self.server = None
+        if port is not None:
+            from http.server import HTTPServer
+            from socketserver import ThreadingMixIn
+
+            # `http.server.ThreadingHTTPServer` is not available on Python 3.6.
+            class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+                daemon_threads = True
+
+            self.server = ThreadingHTTPServer(("", port), self._create_handler())
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _create_handler(self) -> type:
+        from http.server import BaseHTTPRequestHandler
+
+        metrics = self.metrics
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return MetricsHandler
+
+    def _write_snapshot(self):
+        with open(self.snapshot_path, "a") as fp:
+            fp.write(json.dumps(self.metrics.snapshot()) + "\n")
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._write_snapshot()
+
+    def close(self):
+        # Write the last snapshot after stopping the background thread.
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._write_snapshot()
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def __enter__(self) -> "MetricsExporter":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# The profiler of the current worker process.
+_worker_profile: Optional[cProfile.Profile] = None
+
+
+def profile_call(profile_dir: str, fn: Callable[..., Any], *args: Any) -> Any:
+    global _worker_profile
+    if _worker_profile is None:
+        os.makedirs(profile_dir, exist_ok=True)
+        _worker_profile = cProfile.Profile()
+
+    # Accumulate the profiling results of the calls in this process and dump them to
+    # the process-specific file after every call, since the worker processes are
+    # terminated without any notification.
+    _worker_profile.enable()
+    try:
+        return fn(*args)
+    finally:
+        _worker_profile.disable()
+        _worker_profile.dump_stats(
+            os.path.join(profile_dir, f"parse-{os.getpid()}.prof")
+        )
@@ -0,0 +1,122 @@
+import functools
+import re
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Pattern, Sequence, Tuple
+
+from . import utils
+from .monitoring import worker_metrics
+
+# The email addresses and urls which are usually written in the bylines and the
+# footers of the articles.
+_EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_URL_PATTERN = re.compile(r"(?:https?://|www\.)[^\s\"'<>()]+")
+_SENTENCE_BOUNDARY_PATTERN = re.compile(r"(?<=[.?!])\s+(?=\S)")
+_SPACES_PATTERN = re.compile(r"\s{2,}")
+
+# The stages which reproduce the previous hardcoded normalization: keep the lines
+# ending with a period and remove the reporter name in front of the first line.
+DEFAULT_NORMALIZATION = ("sentence_endings", "reporter_name")
+
+
+def _remove_reporter_name(lines: List[str]) -> List[str]:
+    if not lines:
+        return lines
+    return [utils.remove_reporter_name(lines[0])] + lines[1:]
+
+
+def _substitute(pattern: Pattern, lines: List[str]) -> List[str]:
+    # Collapse the spaces around the removed parts.
+    return [
+        (
+            _SPACES_PATTERN.sub(" ", pattern.sub("", line)).strip()
+            if pattern.search(line)
+            else line
+        )
+        for line in lines
+    ]
+
+
+def _split_sentences(lines: List[str]) -> List[str]:
+    return [
+        sentence
+        for line in lines
+        for sentence in _SENTENCE_BOUNDARY_PATTERN.split(line)
+    ]
+
+
+def _keep_sentence_endings(endings: Tuple[str, ...], lines: List[str]) -> List[str]:
+    return [line for line in lines if line.endswith(endings)]
+
+
+def _filter_length(
+    min_length: int, max_length: Optional[int], lines: List[str]
+) -> List[str]:
+    return [
+        line
+        for line in lines
+        if len(line) >= min_length and (max_length is None or len(line) <= max_length)
+    ]
+
+
+# The factories of the normalization stages. Each stage transforms or filters the
+# lines of the content, and is configured by an optional argument (e.g.
+# `min_length=20`). The empty lines are removed after every stage.
+NORMALIZATION_STAGES: Dict[str, Callable[..., Callable[[List[str]], List[str]]]] = {
+    "reporter_name": lambda: _remove_reporter_name,
+    "emails": lambda: functools.partial(_substitute, _EMAIL_PATTERN),
+    "urls": lambda: functools.partial(_substitute, _URL_PATTERN),
+    "sentences": lambda: _split_sentences,
+    "sentence_endings": lambda endings=".": functools.partial(
+        _keep_sentence_endings, tuple(endings)
+    ),
+    "min_length": lambda n: functools.partial(_filter_length, int(n), None),
+    "max_length": lambda n: functools.partial(_filter_length, 0, int(n)),
+}
+
+
+class NormalizationStage(NamedTuple):
+    name: str
+    fn: Callable[[List[str]], List[str]]
+
+
+@functools.lru_cache(maxsize=None)
+def build_normalizer(specs: Tuple[str, ...]) -> List[NormalizationStage]:
+    # Build the stages once in each process, since the normalization is passed to the
+    # parsing processes as the picklable specs.
+    stages = []
+    for spec in specs:
+        name, _, arg = spec.partition("=")
+        if name not in NORMALIZATION_STAGES:
+            raise ValueError(f"normalization stage [{name}] is not supported.")
+
+        try:
+            stage_fn = NORMALIZATION_STAGES[name](*([arg] if arg else []))
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid argument of normalization stage [{spec}].")
+        stages.append(NormalizationStage(name, stage_fn))
+    return stages
+
+
+def normalize_lines(
+    lines: List[str],
+    specs: Sequence[str] = DEFAULT_NORMALIZATION,
+    include_reporter_name: bool = False,
+) -> List[str]:
+    for stage in build_normalizer(tuple(specs)):
+        if include_reporter_name and stage.name == "reporter_name":
+            continue
+
+        # Record the elapsed time and the dropped lines of each stage to tune the
+        # stages by their costs and effects.
+        started = time.perf_counter()
+        normalized = [line for line in stage.fn(lines) if line]
+        worker_metrics.observe(f"normalize_{stage.name}", time.perf_counter() - started)
+
+        if len(normalized) < len(lines):
+            worker_metrics.increment(
+                "normalize_dropped_lines",
+                len(lines) - len(normalized),
+                stage=stage.name,
+            )
+        lines = normalized
+    return lines
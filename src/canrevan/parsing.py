@@ -1,45 +1,87 @@
+import functools
+import html
 import json
 import re
-from typing import List
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
-from bs4 import BeautifulSoup, SoupStrainer
+from . import normalizing, utils
+from .monitoring import worker_metrics
 
-import utils as utils
+_ASCII_WHITESPACES = " \t\n\f\r"
 
+# Article urls are linked in the `<dt>` containers of the article lists. The first
+# link of each container is matched without crossing the end of the container.
+_ARTICLE_LIST_BEGIN = '<ul class="type06_headline">'
+_ARTICLE_HREF_PATTERN = re.compile(r'<dt>(?:[^<]|<(?!/dt>|a ))*<a href="([^"]*)"')
 
-def extract_article_urls(document: str, _: bool) -> List[str]:
-    document = document[document.find('<ul class="type06_headline">'):]
+# Article metadata are extracted from the open graph tags and the publishing time in
+# the article header.
+_TITLE_PATTERN = re.compile(r'<meta property="og:title"\s+content="(.*?)"')
+_PRESS_PATTERN = re.compile(r'<meta property="og:article:author"\s+content="(.*?)"')
+_DATE_PATTERN = re.compile(
+    r'data-date-time="(\d{4})-(\d{2})-(\d{2})|class="t11">(\d{4})\.(\d{2})\.(\d{2})'
+)
+
+
+# A tiny article which passes every stage of the parsing.
+_WARM_UP_DOCUMENT = (
+    '<html><head><meta property="og:title" content="제목"></head><body>'
+    '<div id="dic_area">홍길동 기자 = 한국어로 작성된 기사의 첫 번째 문장입니다.<br>'
+    "두 번째 문장입니다.</div></body></html>"
+)
+
+
+class ArticleLink(NamedTuple):
+    url: str
+    article_id: Optional[Tuple[int, int]]
+
+
+def extract_article_links(document: str) -> List[ArticleLink]:
+    # The articles are listed in the headline list and the following one. The lists
+    # are scanned in place rather than slicing the document.
+    start = document.find(_ARTICLE_LIST_BEGIN)
+    if start < 0:
+        return []
+    end = document.find("</ul>", start)
+    end = document.find("</ul>", end + 5) if end >= 0 else -1
+    if end < 0:
+        end = len(document)
+
+    links, seen = [], set()
+    for href in _ARTICLE_HREF_PATTERN.findall(document, start, end):
+        # Normalize the urls of the articles by their ids. Each article is listed
+        # once, even if it is linked several times.
+        url, article_id = utils.normalize_article_url(href.replace("&amp;", "&"))
+
+        key = article_id or url
+        if key not in seen:
+            seen.add(key)
+            links.append(ArticleLink(url, article_id))
+    return links
 
-    # Extract article url containers.
-    list1 = document[: document.find("</ul>")]
-    list2 = document[document.find("</ul>") + 5:]
-    list2 = list2[: list2.find("</ul>")]
 
-    document = list1 + list2
+def extract_article_urls(document: str, _: bool) -> List[str]:
+    return [link.url for link in extract_article_links(document)]
 
-    # Extract all article urls from the containers.
-    article_urls = []
-    while "<dt>" in document:
-        document = document[document.find("<dt>"):]
-        container = document[: document.find("</dt>")]
 
-        if not container.strip():
-            continue
+# The parser backends are imported on their first use, so the processes which only
+# extract the article urls (e.g. the main process) do not import them.
+@functools.lru_cache(maxsize=None)
+def _lxml_html_parsers() -> Tuple[Any, Any]:
+    from lxml import etree
 
-        article_urls.append(re.search(r'<a href="(.*?)"', container).group(1))
-        document = document[document.find("</dt>"):]
+    return etree.HTMLParser(), etree.HTMLParser(encoding="utf-8")
 
-    return article_urls
 
+def _extract_content_bs4(document: str) -> Optional[str]:
+    from bs4 import BeautifulSoup, SoupStrainer
 
-def parse_article_content(document: str, include_reporter_name: bool) -> str:
     strainer = SoupStrainer("div", attrs={"id": "dic_area"})
     document = BeautifulSoup(document, "lxml", parse_only=strainer)
     content = document.find("div")
 
-    # Skip invalid articles which do not contain news contents.
     if content is None:
-        raise ValueError("there is no any news article content.")
+        return None
 
     # Remove unnecessary tags except `<br>` elements for preserving line-break
     # characters.
@@ -47,30 +89,127 @@ def parse_article_content(document: str, include_reporter_name: bool) -> str:
         if child.name != "br":
             child.clear()
 
-    content = content.get_text(separator="\n").strip()
+    return content.get_text(separator="\n")
+
+
+def _extract_content_lxml(document: str) -> Optional[str]:
+    from lxml import etree
+
+    html_parser, utf8_html_parser = _lxml_html_parsers()
+    try:
+        root = etree.fromstring(document, html_parser)
+    except ValueError:
+        # `lxml` does not accept unicode strings with encoding declaration.
+        root = etree.fromstring(document.encode("utf-8"), utf8_html_parser)
+
+    content = root.find('.//div[@id="dic_area"]') if root is not None else None
+    if content is None:
+        return None
+
+    # Since the child elements except `<br>` are cleared in `_extract_content_bs4`,
+    # only the direct text nodes of the container (the leading text and the tails of
+    # the child nodes) remain.
+    texts = [content.text] if content.text is not None else []
+    texts.extend(child.tail for child in content if child.tail is not None)
+
+    # Note that BeautifulSoup collapses the strings which consist of ASCII
+    # whitespace characters to a single line-break or space.
+    return "\n".join(
+        text if text.strip(_ASCII_WHITESPACES) else "\n" if "\n" in text else " "
+        for text in texts
+    )
+
+
+PARSER_BACKENDS: Dict[str, Callable[[str], Optional[str]]] = {
+    "bs4": _extract_content_bs4,
+    "lxml": _extract_content_lxml,
+}
+
+
+def _normalize_article_content(
+    document: str,
+    include_reporter_name: bool,
+    backend: str,
+    normalization: Sequence[str],
+) -> str:
+    content = PARSER_BACKENDS[backend](document)
+
+    # Skip invalid articles which do not contain news contents.
+    if content is None:
+        raise ValueError("there is no any news article content.")
+
+    content = content.strip()
     content = "\n".join([line.strip() for line in content.split('\n')])
 
     # Skip the contents which contain too many non-Korean characters.
     if utils.korean_character_ratio(content) < 0.5:
         raise ValueError("there are too few Korean characters in the content.")
 
-    # Normalize the contents by removing abnormal sentences.
+    # Normalize the contents by the configured stages (e.g. removing abnormal
+    # sentences and the reporter name).
     content = "\n".join(
-        [
-            line
-            for line in content.splitlines()
-            if line[-1] == "."
-        ]
+        normalizing.normalize_lines(
+            content.splitlines(), normalization, include_reporter_name
+        )
     )
 
-    # Remove reporter name part if set.
-    if not include_reporter_name:
-        splitted = content.split(sep='\n')
-        content = "\n".join(splitted[1:])
-        content = utils.remove_reporter_name(splitted[0]) + content
-
     # Remove empty string
     if content == "":
         raise ValueError("there is no news article content.")
 
+    return content
+
+
+def parse_article_content(
+    document: str,
+    include_reporter_name: bool,
+    backend: str = "bs4",
+    normalization: Sequence[str] = normalizing.DEFAULT_NORMALIZATION,
+) -> str:
+    content = _normalize_article_content(
+        document, include_reporter_name, backend, normalization
+    )
     return json.encoder.encode_basestring(content)
+
+
+def parse_article_record(
+    document: str,
+    include_reporter_name: bool,
+    backend: str = "bs4",
+    normalization: Sequence[str] = normalizing.DEFAULT_NORMALIZATION,
+) -> Dict[str, Optional[str]]:
+    content = _normalize_article_content(
+        document, include_reporter_name, backend, normalization
+    )
+
+    title = _TITLE_PATTERN.search(document)
+    press = _PRESS_PATTERN.search(document)
+    date = _DATE_PATTERN.search(document)
+
+    # The author tag contains the press name with the portal name (e.g. `press |
+    # 네이버`).
+    if press is not None:
+        press = html.unescape(press.group(1)).split("|")[0].strip()
+    if date is not None:
+        date = "-".join(group for group in date.groups() if group is not None)
+
+    return {
+        "title": html.unescape(title.group(1)) if title is not None else None,
+        "press": press,
+        "date": date,
+        "content": content,
+    }
+
+
+def warm_up_parser(
+    backend: str = "bs4",
+    normalization: Sequence[str] = normalizing.DEFAULT_NORMALIZATION,
+):
+    # Import the parser backend and build the normalization stages by parsing a tiny
+    # article, so the first documents sent to a new parsing process are not delayed.
+    # The metrics recorded while warming up are dropped.
+    try:
+        parse_article_record(_WARM_UP_DOCUMENT, False, backend, normalization)
+    except ValueError:
+        pass
+    worker_metrics.drain()
@@ -0,0 +1,70 @@
+from typing import Iterable, Iterator, List
+
+from . import utils
+
+# The orders of the navigation page groups. `category` navigates all dates of each
+# category in turn, while the others take the categories in turns for each date
+# (from the oldest or the newest one).
+NAV_ORDERS = ("newest", "interleaved", "category")
+
+
+def nav_page_urls(base_url: str, sid1: int, date: str, max_page: int) -> List[str]:
+    return [
+        f"{base_url}/main/list.nhn?mode=LSD&mid=shm&sid1={sid1}&date={date}&page={page}"
+        for page in range(1, max_page + 1)
+    ]
+
+
+def nav_group_pages(url: str) -> List[str]:
+    # Get the navigation pages of the group up to the given page, from the first one.
+    prefix, last = url.rsplit("&page=", 1)
+    return [f"{prefix}&page={page}" for page in range(1, int(last) + 1)]
+
+
+class NavPlan:
+    def __init__(
+        self,
+        category: Iterable[int],
+        start_date: str,
+        end_date: str,
+        skip_days: int = 1,
+        max_page: int = 10,
+        base_url: str = "https://news.naver.com",
+        order: str = "newest",
+    ):
+        if order not in NAV_ORDERS:
+            raise ValueError(f"navigation order [{order}] is not supported.")
+
+        self.category = list(category)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.skip_days = skip_days
+        self.max_page = max_page
+        self.base_url = base_url
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.category) * utils.dcount(
+            self.start_date, self.end_date, self.skip_days
+        )
+
+    def __iter__(self) -> Iterator[List[str]]:
+        # The page groups are created lazily, so a long backfill does not keep all
+        # navigation urls in memory and the partial outputs cover every category.
+        if self.order == "category":
+            for sid1 in self.category:
+                for date in utils.drange(
+                    self.start_date, self.end_date, self.skip_days
+                ):
+                    yield nav_page_urls(self.base_url, sid1, date, self.max_page)
+            return
+
+        dates = utils.drange(
+            self.start_date,
+            self.end_date,
+            self.skip_days,
+            reverse=self.order == "newest",
+        )
+        for date in dates:
+            for sid1 in self.category:
+                yield nav_page_urls(self.base_url, sid1, date, self.max_page)
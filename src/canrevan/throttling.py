@@ -0,0 +1,139 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class _HostWindow:
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.in_flight = 0
+        self.congested = False
+        self.last_decrease = 0.0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        max_limit: int = 500,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        latency_threshold: Optional[float] = None,
+    ):
+        self.initial_limit = min(initial_limit, max_limit)
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+
+        self._windows: Dict[str, _HostWindow] = {}
+
+    def limit(self, host: str) -> float:
+        window = self._windows.get(host)
+        return window.limit if window is not None else self.initial_limit
+
+    def in_flight(self) -> int:
+        return sum(window.in_flight for window in self._windows.values())
+
+    async def acquire(self, host: str) -> float:
+        window = self._windows.get(host)
+        if window is None:
+            window = self._windows[host] = _HostWindow(self.initial_limit)
+
+        # Wait until the number of in-flight requests to the host is below the
+        # current window.
+        while window.in_flight >= int(window.limit):
+            waiter = asyncio.get_event_loop().create_future()
+            window.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass the wake-up to the next waiter if this one is cancelled.
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_up(window)
+                raise
+
+        window.in_flight += 1
+        return time.monotonic()
+
+    def release(self, host: str, started: float, succeeded: Optional[bool]):
+        window = self._windows[host]
+        window.in_flight -= 1
+
+        # Keep the window if the outcome says nothing about the congestion (e.g. the
+        # request is cancelled or rejected by the client).
+        if succeeded is None:
+            self._wake_up(window)
+            return
+
+        latency = time.monotonic() - started
+        if self.latency_threshold is not None and latency > self.latency_threshold:
+            succeeded = False
+
+        if succeeded:
+            # Grow the window exponentially until the first congestion (slow start)
+            # and additively by one request per window after that.
+            window.limit += 1 if not window.congested else 1 / window.limit
+            window.limit = min(window.limit, self.max_limit)
+        elif started >= window.last_decrease:
+            # Shrink the window multiplicatively. The failures of the requests which
+            # were sent before the last decrease are ignored, so a burst of failures
+            # shrinks the window only once.
+            window.congested = True
+            window.limit = max(window.limit * self.decrease_factor, self.min_limit)
+            window.last_decrease = time.monotonic()
+
+        self._wake_up(window)
+
+    def _wake_up(self, window: _HostWindow):
+        available = int(window.limit) - window.in_flight
+        while available > 0 and window.waiters:
+            waiter = window.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+
+class RequestBudget:
+    def __init__(self, requests_per_second: float, burst: int = 1):
+        self.interval = 1 / requests_per_second
+        self.burst = max(burst, 1)
+        self._next_slot = 0.0
+
+    async def acquire(self) -> float:
+        # Reserve the next slot of the budget (generic cell rate algorithm). The slots
+        # are reserved in order, so the waiting requests are spread evenly rather than
+        # woken up at once, and up to `burst` requests are sent without waiting.
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self.interval
+
+        delay = slot - now - (self.burst - 1) * self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return max(delay, 0)
+
+
+def retry_delay(
+    attempt: int,
+    backoff: float,
+    max_backoff: float,
+    retry_after: Optional[float] = None,
+) -> float:
+    # Exponential backoff with full jitter. The delay requested by the server is
+    # respected as the minimum.
+    delay = random.uniform(0, min(backoff * 2**attempt, max_backoff))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_backoff))
+    return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Only the delay in seconds is supported, rather than the http date.
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -1,43 +1,181 @@
-import ssl
-from asyncio import AbstractEventLoop
+import re
+import string
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
+if TYPE_CHECKING:
+    from asyncio import AbstractEventLoop
 
-def drange(start: str, end: str, step: int = 1) -> List[str]:
+_OID_PATTERN = re.compile(r"[?&]oid=(\d+)")
+_AID_PATTERN = re.compile(r"[?&]aid=(\d+)")
+_SID1_PATTERN = re.compile(r"[?&]sid1=(\d+)")
+_ARTICLE_PARAM_PATTERN = re.compile(r"[?&](oid|aid|sid1)=(\d+)")
+
+# The leading bracket of the press (e.g. `[서울=뉴시스]`, `(서울=연합뉴스)`) with the
+# reporter names which follow it. Each bracket ends at its first closing one, so the
+# brackets in the sentence are not removed.
+_REPORTER_NAME_PATTERN = re.compile(
+    r"^((\[[^\]]+\]|\([^)]+\))(\s?([가-힣 ]{2,} (기자|특파원),?)+\s*=?)+"
+    r"|(\[[^\]]+\]|\([^)]+\)))\s*"
+)
+
+# The character classes of the text statistics are counted without iterating the
+# characters in python. The ASCII characters are classified by translating their
+# bytes, and the Hangul syllables (U+AC00-U+D7A3) by the high bytes of their UTF-16
+# code units. The non-ASCII whitespaces and punctuations, and the Hangul Jamo
+# Extended-B characters (U+D7A4-U+D7FF) which share the high byte with the Hangul
+# syllables, are rare, so they are collected by a regex and classified separately.
+_ASCII_WHITESPACES = string.whitespace + "\x1c\x1d\x1e\x1f"
+_ASCII_CLASSES = bytes.maketrans(
+    (
+        string.ascii_letters + string.digits + _ASCII_WHITESPACES + string.punctuation
+    ).encode("ascii"),
+    b"L" * len(string.ascii_letters)
+    + b"D" * len(string.digits)
+    + b"W" * len(_ASCII_WHITESPACES)
+    + b"P" * len(string.punctuation),
+)
+_HANGUL_HIGH_BYTES = bytes(ord("H" if 0xAC <= i <= 0xD7 else "O") for i in range(256))
+
+_NON_ASCII_WHITESPACES = "\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000"
+_NON_ASCII_PUNCTUATIONS = (
+    "\xb7\u2010-\u2027\u2030-\u205e\u3001-\u303f"
+    "\uff01-\uff0f\uff1a-\uff20\uff3b-\uff40\uff5b-\uff65"
+)
+_RARE_CHARACTER_PATTERN = re.compile(
+    f"[\ud7a4-\ud7ff{_NON_ASCII_WHITESPACES}{_NON_ASCII_PUNCTUATIONS}]"
+)
+_RARE_CHARACTER_CLASSES = [
+    ("J", re.compile("[\ud7a4-\ud7ff]")),
+    ("W", re.compile(f"[{_NON_ASCII_WHITESPACES}]")),
+    ("P", re.compile(f"[{_NON_ASCII_PUNCTUATIONS}]")),
+]
+
+
+class TextStats(NamedTuple):
+    length: int
+    hangul: int
+    ascii_visible: int
+    letters: int
+    digits: int
+    whitespaces: int
+    punctuations: int
+    line_lengths: Tuple[int, ...]
+
+    @property
+    def visible(self) -> int:
+        return self.length - self.whitespaces
+
+    def _ratio(self, count: int) -> float:
+        return count / self.visible if self.visible > 0 else 0.0
+
+    # The ratios are computed over the characters except whitespaces.
+    @property
+    def hangul_ratio(self) -> float:
+        return self._ratio(self.hangul)
+
+    @property
+    def ascii_ratio(self) -> float:
+        return self._ratio(self.ascii_visible)
+
+    @property
+    def punctuation_density(self) -> float:
+        return self._ratio(self.punctuations)
+
+    @property
+    def normal_ratio(self) -> float:
+        return self._ratio(self.hangul + self.letters + self.digits)
+
+    @property
+    def mean_line_length(self) -> float:
+        if not self.line_lengths:
+            return 0.0
+        return sum(self.line_lengths) / len(self.line_lengths)
+
+
+def dcount(start: str, end: str, step: int = 1) -> int:
     start_date = datetime.strptime(start, "%Y%m%d")
     end_date = datetime.strptime(end, "%Y%m%d")
+    return max((end_date - start_date).days // step + 1, 0)
+
 
-    iters = (end_date - start_date).days // step
-    return [
-        (start_date + timedelta(days=d * step)).strftime("%Y%m%d")
-        for d in range(iters + 1)
-    ]
+def drange(start: str, end: str, step: int = 1, reverse: bool = False) -> Iterator[str]:
+    start_date = datetime.strptime(start, "%Y%m%d")
 
+    # Yield the dates lazily, from the latest one if reversed. The reversed dates are
+    # the same as the forward ones even if the range is not divisible by the step.
+    days = range(dcount(start, end, step))
+    for d in reversed(days) if reverse else days:
+        yield (start_date + timedelta(days=d * step)).strftime("%Y%m%d")
 
-def korean_character_ratio(text: str, ignore_whitespace: bool = True) -> float:
-    if ignore_whitespace:
-        text = "".join(text.split())
 
-    korean_characters = len([c for c in text if ord("가") <= ord(c) <= ord("힣")])
-    return korean_characters / len(text)
+def text_stats(text: str) -> TextStats:
+    ascii_classes = text.encode("ascii", "ignore").translate(_ASCII_CLASSES)
+    ascii_whitespaces = ascii_classes.count(b"W")
 
+    # The text is ASCII-only if no character is dropped by the encoding above.
+    hangul, rare_counts = 0, {"J": 0, "W": 0, "P": 0}
+    if len(ascii_classes) < len(text):
+        # Every Hangul syllable is encoded to a single UTF-16 code unit, and the
+        # surrogate pairs never use the high bytes of the Hangul syllables.
+        hangul = (
+            text.encode("utf-16-le", "surrogatepass")[1::2]
+            .translate(_HANGUL_HIGH_BYTES)
+            .count(b"H")
+        )
 
-def is_normal_character(c: str) -> bool:
-    return (
-        ord("0") <= ord(c) <= ord("9")
-        or ord("a") <= ord(c) <= ord("z")
-        or ord("A") <= ord(c) <= ord("Z")
-        or ord("가") <= ord(c) <= ord("힣")
+        rare = "".join(_RARE_CHARACTER_PATTERN.findall(text))
+        if rare:
+            rare_counts = {
+                name: len(pattern.findall(rare))
+                for name, pattern in _RARE_CHARACTER_CLASSES
+            }
+
+    return TextStats(
+        length=len(text),
+        hangul=hangul - rare_counts["J"],
+        ascii_visible=len(ascii_classes) - ascii_whitespaces,
+        letters=ascii_classes.count(b"L"),
+        digits=ascii_classes.count(b"D"),
+        whitespaces=ascii_whitespaces + rare_counts["W"],
+        punctuations=ascii_classes.count(b"P") + rare_counts["P"],
+        line_lengths=tuple(map(len, text.splitlines())),
     )
 
 
-def ignore_aiohttp_ssl_error(loop: AbstractEventLoop):
+def batch_text_stats(texts: Iterable[str]) -> List[TextStats]:
+    return [text_stats(text) for text in texts]
+
+
+def korean_character_ratio(text: str, ignore_whitespace: bool = True) -> float:
+    stats = text_stats(text)
+    total = stats.visible if ignore_whitespace else stats.length
+    return stats.hangul / total if total > 0 else 0.0
+
+
+def is_normal_character(c: str) -> bool:
+    if c < "\x80":
+        return _ASCII_CLASSES[ord(c)] in b"LD"
+    return "가" <= c <= "힣"
+
+
+def ignore_aiohttp_ssl_error(loop: "AbstractEventLoop"):
+    import ssl
+
     original_handler = loop.get_exception_handler()
 
-    def ignore_ssl_error(loop: AbstractEventLoop, context: Dict):
+    def ignore_ssl_error(loop: "AbstractEventLoop", context: Dict):
         # Ignore SSLError from `aiohttp` module. It is known as a bug.
-        if isinstance(context["exception"], ssl.SSLError):
+        if isinstance(context.get("exception"), ssl.SSLError):
             return
 
         if original_handler is not None:
@@ -47,7 +185,50 @@ def ignore_aiohttp_ssl_error(loop: AbstractEventLoop):
 
     loop.set_exception_handler(ignore_ssl_error)
 
-def remove_reporter_name(s: str):
-    import re
-    s = re.sub('^((\[.+\]|\(.+\))(\s?([가-힣 ]{2,} (기자|특파원),?)+\s*=?)+|(\[.+\]|\(.+\)))\s*', '', s)
-    return s
\ No newline at end of file
+
+def remove_reporter_name(s: str) -> str:
+    return _REPORTER_NAME_PATTERN.sub("", s)
+
+
+def parse_article_id(url: str) -> Optional[Tuple[int, int]]:
+    # Naver news articles are identified by the press id (`oid`) and the article id
+    # (`aid`) regardless of the other query parameters.
+    oid, aid = _OID_PATTERN.search(url), _AID_PATTERN.search(url)
+    if oid is None or aid is None:
+        return None
+    return int(oid.group(1)), int(aid.group(1))
+
+
+def parse_article_category(url: str) -> Optional[int]:
+    sid1 = _SID1_PATTERN.search(url)
+    return int(sid1.group(1)) if sid1 is not None else None
+
+
+def normalize_article_url(url: str) -> Tuple[str, Optional[Tuple[int, int]]]:
+    # Keep the category and the article id only, so the article linked from the
+    # different lists (e.g. with the other `mode` or `sid2`) has the same url. The
+    # first value of each parameter is used like `parse_article_id`.
+    params = dict(reversed(_ARTICLE_PARAM_PATTERN.findall(url)))
+    if "oid" not in params or "aid" not in params:
+        return url, None
+
+    article_id = int(params["oid"]), int(params["aid"])
+    query = f"oid={article_id[0]:03d}&aid={article_id[1]:010d}"
+    if "sid1" in params:
+        query = f"sid1={int(params['sid1'])}&{query}"
+    return f"{url.split('?', 1)[0]}?{query}", article_id
+
+
+def decode_document(body: bytes, charset: Optional[str] = None) -> str:
+    # Decode the document with the charset from the response header if exists.
+    # Otherwise, try UTF-8 and CP949 which are used in Naver news.
+    if charset is not None:
+        try:
+            return body.decode(charset)
+        except LookupError:
+            pass
+
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError:
+        return body.decode("cp949", errors="replace")
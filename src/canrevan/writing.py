@@ -0,0 +1,396 @@
+import asyncio
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from typing import IO, Any, Callable, Dict, List, Optional
+
+from .monitoring import Metrics
+
+_SHARD_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class _HashingFile:
+    def __init__(self, fp: IO[bytes]):
+        self.fp = fp
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.fp.write(data)
+
+    def flush(self):
+        self.fp.flush()
+
+
+class BackgroundWriter:
+    def __init__(
+        self, max_queued_items: int = 10000, commit_interval: Optional[float] = None
+    ):
+        self.commit_interval = commit_interval
+        self._done_fns: List[Callable[[], None]] = []
+        self._error: Optional[BaseException] = None
+        self.metrics: Optional[Metrics] = None
+
+        # Compress and write the items in the background thread to avoid blocking
+        # the event loop.
+        self._queue = queue.Queue(maxsize=max_queued_items)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def attach_metrics(self, metrics: Metrics):
+        # Record the write latencies and the output bytes, and expose the number of
+        # queued items.
+        self.metrics = metrics
+        metrics.register_gauge("write_queue", self._queue.qsize)
+
+    def _start(self):
+        pass
+
+    def _write(self, item: Any, idle: bool):
+        raise NotImplementedError()
+
+    def _flush(self):
+        pass
+
+    def _finish(self):
+        pass
+
+    def _commit(self):
+        # Notify that the written items are safely stored.
+        done_fns, self._done_fns = self._done_fns, []
+        for done_fn in done_fns:
+            done_fn()
+
+    def _run(self):
+        try:
+            self._start()
+
+            while True:
+                # Wake up while there are uncommitted items, so that they are flushed
+                # and committed even if no more item is queued for a while.
+                timeout = self.commit_interval if self._done_fns else None
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    self._flush()
+                    continue
+
+                if item is None:
+                    break
+
+                item, done_fn = item
+                if done_fn is not None:
+                    self._done_fns.append(done_fn)
+
+                # Let the writer know if there is no more queued item, so that the
+                # buffered items can be flushed.
+                started = time.perf_counter()
+                self._write(item, self._queue.empty())
+                if self.metrics is not None:
+                    self.metrics.observe("write", time.perf_counter() - started)
+
+            self._finish()
+        except BaseException as e:
+            self._error = e
+
+            # Drain the queue to unblock the producers.
+            while self._queue.get() is not None:
+                pass
+
+    def write(self, item: Any, done_fn: Optional[Callable[[], None]] = None):
+        if self._error is not None:
+            raise self._error
+        self._queue.put((item, done_fn))
+
+    async def awrite(self, item: Any, done_fn: Optional[Callable[[], None]] = None):
+        if self._error is not None:
+            raise self._error
+
+        # Wait for the background thread in the executor if the queue is full, rather
+        # than blocking the event loop.
+        try:
+            self._queue.put_nowait((item, done_fn))
+        except queue.Full:
+            await asyncio.get_event_loop().run_in_executor(
+                None, self._queue.put, (item, done_fn)
+            )
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ShardedWriter(BackgroundWriter):
+    def __init__(
+        self,
+        path: str,
+        shard_lines: int = 0,
+        shard_bytes: int = 0,
+        compression: Optional[str] = None,
+        append: bool = False,
+        max_queued_lines: int = 10000,
+        commit_interval: float = 1.0,
+    ):
+        if compression not in _SHARD_SUFFIXES:
+            raise ValueError(f"compression [{compression}] is not supported.")
+
+        self.path = path
+        self.shard_lines = shard_lines
+        self.shard_bytes = shard_bytes
+        self.compression = compression
+        self.append = append
+
+        # The output is written to the single file as before if neither rotation nor
+        # compression is used. Otherwise, the lines are written to the shards which
+        # are listed in the manifest file with their line counts and checksums.
+        self.sharded = bool(shard_lines or shard_bytes or compression)
+        self.manifest_path = f"{os.path.splitext(path)[0]}.manifest.json"
+        self.shards: List[Dict] = []
+
+        # Continue after the shards of the previous crawling if appending. The
+        # unfinished shard is truncated to its committed lines and closed, and the
+        # shard which is not in the manifest at all will be overwritten.
+        if self.sharded and append and os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as fp:
+                self.shards = json.load(fp)["shards"]
+            if self.shards and self.shards[-1].pop("partial", False):
+                name = os.path.join(os.path.dirname(path), self.shards[-1]["name"])
+                with open(name, "r+b") as fp:
+                    fp.truncate(self.shards[-1]["bytes"])
+                self._write_manifest()
+        elif self.sharded:
+            self._write_manifest()
+
+        self._raw, self._fp, self._lines = None, None, 0
+        self._committed = time.perf_counter()
+        super().__init__(max_queued_lines, commit_interval)
+
+    def _open_shard(self):
+        if not self.sharded:
+            self._raw = open(self.path, "ab" if self.append else "wb")
+            self._fp = self._raw
+            return
+
+        root, ext = os.path.splitext(self.path)
+        name = f"{root}-{len(self.shards):05d}{ext}"
+        name += _SHARD_SUFFIXES[self.compression]
+
+        self._raw = _HashingFile(open(name, "wb"))
+        self._open_stream()
+
+    def _open_stream(self):
+        # The compressed shard consists of the concatenated gzip members (or zstd
+        # frames), which are ended whenever the written lines are committed.
+        if self.compression == "gzip":
+            self._fp = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif self.compression == "zstd":
+            # `zstandard` is an optional dependency which is required only for zstd
+            # compression.
+            import zstandard
+
+            self._fp = zstandard.ZstdCompressor().stream_writer(self._raw)
+        else:
+            self._fp = self._raw
+
+    def _end_stream(self):
+        if self.compression == "gzip":
+            # Closing the gzip member does not close the underlying shard file. The
+            # next member is started on the next line.
+            self._fp.close()
+            self._fp = None
+        elif self.compression == "zstd":
+            import zstandard
+
+            self._fp.flush(zstandard.FLUSH_FRAME)
+
+    def _describe_shard(self) -> Dict:
+        return {
+            "name": os.path.basename(self._raw.fp.name),
+            "lines": self._lines,
+            "bytes": self._raw.size,
+            "sha256": self._raw.sha256.hexdigest(),
+        }
+
+    def _close_shard(self):
+        if self._raw is None:
+            return
+
+        if self._fp is not None and self._fp is not self._raw:
+            self._fp.close()
+
+        if self.sharded:
+            self._raw.fp.close()
+
+            # Record the finished shard to the manifest.
+            self.shards.append(self._describe_shard())
+            self._write_manifest()
+        else:
+            self._raw.close()
+
+        self._raw, self._fp, self._lines = None, None, 0
+        self._commit()
+
+    def _flush(self):
+        if self._raw is None:
+            return
+
+        # Record the committed part of the unfinished shard to the manifest, after
+        # ending the compressed stream so the shard is readable up to the lines.
+        if self.sharded:
+            if self._fp is not None:
+                self._end_stream()
+            self._raw.flush()
+            self._write_manifest(self._describe_shard())
+        else:
+            self._fp.flush()
+
+        self._committed = time.perf_counter()
+        self._commit()
+
+    def _write_manifest(self, unfinished: Optional[Dict] = None):
+        shards = self.shards
+        if unfinished is not None:
+            shards = shards + [dict(unfinished, partial=True)]
+
+        # Replace the manifest file atomically.
+        with open(f"{self.manifest_path}.tmp", "w") as fp:
+            json.dump({"shards": shards}, fp, indent=2)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+    def _start(self):
+        # The single output file is created even if there is no line to write.
+        if not self.sharded:
+            self._open_shard()
+
+    def _write(self, line: str, idle: bool):
+        if self._raw is None:
+            self._open_shard()
+        elif self._fp is None:
+            self._open_stream()
+
+        data = line.encode("utf-8")
+        self._fp.write(data)
+        self._lines += 1
+
+        if self.metrics is not None:
+            self.metrics.increment("bytes_out", len(data))
+
+        # Rotate the shard if it exceeds the limits. Note that the size of the
+        # compressed shard is checked with the written compressed bytes.
+        if (self.shard_lines and self._lines >= self.shard_lines) or (
+            self.shard_bytes
+            and isinstance(self._raw, _HashingFile)
+            and self._raw.size >= self.shard_bytes
+        ):
+            self._close_shard()
+        elif not self.sharded and idle:
+            self._flush()
+        elif time.perf_counter() - self._committed >= self.commit_interval:
+            # Commit the written lines periodically, rather than deferring all of
+            # them until the shard is closed or the queue is idle.
+            self._flush()
+
+    def _finish(self):
+        self._close_shard()
+
+    def write(self, line: str, done_fn: Optional[Callable[[], None]] = None):
+        super().write(line + "\n", done_fn)
+
+    async def awrite(self, line: str, done_fn: Optional[Callable[[], None]] = None):
+        await super().awrite(line + "\n", done_fn)
+
+
+class ParquetWriter(BackgroundWriter):
+    def __init__(
+        self,
+        path: str,
+        schema: Dict[str, str],
+        row_group_size: int = 10000,
+        file_row_groups: int = 10,
+        append: bool = False,
+        max_queued_records: int = 10000,
+    ):
+        # `pyarrow` is an optional dependency which is required only for parquet
+        # output.
+        import pyarrow
+
+        self.path = path
+        self.schema = pyarrow.schema(
+            [(name, pyarrow.type_for_alias(dtype)) for name, dtype in schema.items()]
+        )
+        self.row_group_size = row_group_size
+        self.file_row_groups = file_row_groups
+
+        # Parquet files cannot be appended, so the records are written to the new
+        # part file next to the previous ones if appending.
+        self._root, self._ext = os.path.splitext(path)
+        if append:
+            self.path = self._next_part_path()
+
+        self._fp, self._rows, self._row_groups = None, [], 0
+        super().__init__(max_queued_records)
+
+    def _next_part_path(self) -> str:
+        for i in itertools.count(1):
+            path = f"{self._root}-{i:05d}{self._ext}"
+            if not os.path.exists(path):
+                return path
+
+    def _start(self):
+        import pyarrow.parquet
+
+        self._fp = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+
+    def _close_file(self):
+        # Since the parquet file is readable only after its footer is written, the
+        # records are notified as stored when their file is closed.
+        self._fp.close()
+        self._fp, self._row_groups = None, 0
+        self._commit()
+
+    def _flush_rows(self):
+        import pyarrow
+
+        if self._rows:
+            if self._fp is None:
+                self.path = self._next_part_path()
+                self._start()
+
+            table = pyarrow.Table.from_pylist(self._rows, schema=self.schema)
+            self._fp.write_table(table, row_group_size=self.row_group_size)
+            self._rows = []
+            self._row_groups += 1
+
+            # Roll over to the next part file after the row groups, so the records
+            # are committed while crawling rather than at the end of it.
+            if self.file_row_groups and self._row_groups >= self.file_row_groups:
+                self._close_file()
+
+    def _write(self, record: Dict[str, Any], idle: bool):
+        # Buffer the records and write them as a row group to keep the memory usage
+        # bounded.
+        self._rows.append(record)
+        if len(self._rows) >= self.row_group_size:
+            self._flush_rows()
+
+    def _finish(self):
+        self._flush_rows()
+        if self._fp is not None:
+            self._close_file()
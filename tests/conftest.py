@@ -0,0 +1,105 @@
+import asyncio
+import collections
+import multiprocessing
+from multiprocessing.connection import Connection
+
+import pytest
+from aiohttp import web
+
+
+# A local http server echoes the requested path.
+async def _handle(request: web.Request) -> web.Response:
+    return web.Response(text=request.path_qs)
+
+
+# Navigation pages link 5 articles starting from the page number, so the adjacent
+# pages share some of the articles. Like Naver news, there are 10 pages and the
+# out-of-range pages repeat the last page.
+async def _handle_nav(request: web.Request) -> web.Response:
+    page = min(int(request.query["page"]), 10)
+    links = "".join(
+        f'<dt><a href="http://{request.host}/read.nhn?oid=001&aid={aid:010d}">'
+        f"</a></dt>"
+        for aid in range(page, page + 5)
+    )
+    return web.Response(
+        text=f'<ul class="type06_headline">{links}</ul><ul class="type06"></ul>'
+    )
+
+
+# Some old pages are encoded in EUC-KR.
+async def _handle_euckr(request: web.Request) -> web.Response:
+    return web.Response(
+        body=f"{request.path_qs} 한국어 문서".encode("euc-kr"),
+        content_type="text/html",
+        charset="euc-kr",
+    )
+
+
+# The server throttles the clients which send more than 8 concurrent requests.
+_in_flight = 0
+
+
+async def _handle_throttle(request: web.Request) -> web.Response:
+    global _in_flight
+    if _in_flight >= 8:
+        return web.Response(status=429, headers={"Retry-After": "0"})
+
+    _in_flight += 1
+    try:
+        await asyncio.sleep(0.01)
+        return web.Response(text=request.path_qs)
+    finally:
+        _in_flight -= 1
+
+
+# The first two requests to each path fail temporarily.
+_requested = collections.Counter()
+
+
+async def _handle_flaky(request: web.Request) -> web.Response:
+    _requested[request.path_qs] += 1
+    if _requested[request.path_qs] <= 2:
+        return web.Response(status=503)
+    return web.Response(text=request.path_qs)
+
+
+# The responses are validated with their etags.
+async def _handle_etag(request: web.Request) -> web.Response:
+    if request.headers.get("If-None-Match") == '"v1"':
+        return web.Response(status=304, headers={"ETag": '"v1"'})
+    return web.Response(text=request.path_qs, headers={"ETag": '"v1"'})
+
+
+def _serve(conn: Connection):
+    app = web.Application()
+    app.router.add_get("/list.nhn", _handle_nav)
+    app.router.add_get("/euckr/{tail:.*}", _handle_euckr)
+    app.router.add_get("/throttle/{tail:.*}", _handle_throttle)
+    app.router.add_get("/flaky/{tail:.*}", _handle_flaky)
+    app.router.add_get("/etag/{tail:.*}", _handle_etag)
+    app.router.add_get("/{tail:.*}", _handle)
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+
+    conn.send(site._server.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+@pytest.fixture
+def stub_server():
+    # Run the server in a separate process rather than a thread, since forking the
+    # parsing processes while the server thread is running may cause a deadlock.
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(child_conn,), daemon=True)
+    process.start()
+
+    yield f"http://127.0.0.1:{parent_conn.recv()}"
+
+    process.terminate()
+    process.join()
@@ -0,0 +1,127 @@
+import gzip
+import math
+import tempfile
+
+from canrevan.archiving import RawArchive, RawArchiveWriter, reparse_archive
+from canrevan.caching import HTTPCache
+from canrevan.crawling import Crawler
+from canrevan.writing import ShardedWriter
+
+
+def _upper(document: str, _: bool) -> str:
+    if "invalid" in document:
+        raise ValueError("invalid document.")
+    return document.upper()
+
+
+def test_raw_archive_write_and_read():
+    with tempfile.TemporaryDirectory() as tdir:
+        with RawArchiveWriter(f"{tdir}/raw.warc.gz") as archive:
+            archive.write("http://a", "한국어 문서".encode("euc-kr"), "euc-kr")
+            archive.write("http://b", b"document b")
+
+        # The records should be appended and the later record of the same url
+        # should override the earlier one.
+        with RawArchiveWriter(f"{tdir}/raw.warc.gz") as archive:
+            archive.write("http://b", b"document b2")
+            archive.write("http://c", b"document c")
+
+        with RawArchive(f"{tdir}/raw.warc.gz") as archive:
+            assert len(archive) == 3 and "http://a" in archive
+            assert archive.read("http://a") == (
+                "한국어 문서".encode("euc-kr"),
+                "euc-kr",
+            )
+            assert archive.read("http://b") == (b"document b2", None)
+            assert archive.read("http://c") == (b"document c", None)
+
+        # The archive should be a valid multi-member gzip file of the WARC records.
+        with gzip.open(f"{tdir}/raw.warc.gz", "rb") as fp:
+            data = fp.read()
+        assert data.count(b"WARC/1.0\r\nWARC-Type: resource\r\n") == 4
+        assert b"WARC-Target-URI: http://c\r\n" in data
+
+
+def test_raw_archive_truncated_index():
+    with tempfile.TemporaryDirectory() as tdir:
+        with RawArchiveWriter(f"{tdir}/raw.warc.gz") as archive:
+            archive.write("http://a", b"document a")
+
+        # Simulate the crawling which is killed while writing the index.
+        with open(f"{tdir}/raw.warc.gz.idx", "a") as fp:
+            fp.write("http://b\t12")
+
+        with RawArchiveWriter(f"{tdir}/raw.warc.gz") as archive:
+            archive.write("http://c", b"document c")
+
+        with RawArchive(f"{tdir}/raw.warc.gz") as archive:
+            assert sorted(archive.index) == ["http://a", "http://c"]
+            assert archive.read("http://c") == (b"document c", None)
+
+
+def test_reparse_archive():
+    with tempfile.TemporaryDirectory() as tdir:
+        with RawArchiveWriter(f"{tdir}/raw.warc.gz") as archive:
+            for i in range(100):
+                archive.write(f"http://article/{i}", f"document {i}".encode("utf-8"))
+            archive.write("http://article/100", b"invalid")
+            archive.write("http://nav/1", b"navigation")
+
+        updated = []
+        with ShardedWriter(f"{tdir}/output.txt") as writer:
+            written = reparse_archive(
+                f"{tdir}/raw.warc.gz",
+                writer,
+                False,
+                _upper,
+                filter_fn=lambda url: "article" in url,
+                update_fn=lambda: updated.append(1),
+                num_processes=2,
+                chunk_size=16,
+            )
+        assert written == 100 and len(updated) == 101
+
+        with open(f"{tdir}/output.txt", "r") as fp:
+            assert fp.read().splitlines() == [f"DOCUMENT {i}" for i in range(100)]
+
+
+def test_crawl_with_raw_archive(stub_server: str):
+    urls = [f"{stub_server}/read.nhn?aid={aid}" for aid in range(10)]
+    urls.append(f"{stub_server}/euckr/read.nhn?aid=10")
+
+    with tempfile.TemporaryDirectory() as tdir:
+        with RawArchiveWriter(f"{tdir}/raw.warc.gz") as archive:
+            with Crawler(concurrent_tasks=4, request_timeout=5, archive=archive) as c:
+                documents = c.reduce_to_array(urls, False, parse_fn=_upper)
+
+        # The archived responses should be parsed to the same results.
+        with ShardedWriter(f"{tdir}/output.txt") as writer:
+            reparse_archive(f"{tdir}/raw.warc.gz", writer, False, _upper)
+        with open(f"{tdir}/output.txt", "r") as fp:
+            assert sorted(fp.read().splitlines()) == sorted(documents)
+
+        with RawArchive(f"{tdir}/raw.warc.gz") as archive:
+            assert set(archive.index) == set(urls)
+            assert archive.read(urls[-1])[1] == "euc-kr"
+
+
+def test_crawl_with_raw_archive_and_http_cache(stub_server: str):
+    urls = [f"{stub_server}/read.nhn?aid={aid}" for aid in range(10)]
+    urls += [f"{stub_server}/etag/read.nhn?aid={aid}" for aid in range(10)]
+
+    with tempfile.TemporaryDirectory() as tdir:
+        ttl_fn = lambda url: 0 if "etag" in url else math.inf  # noqa: E731
+        for _ in range(2):
+            with RawArchiveWriter(f"{tdir}/raw.warc.gz") as archive:
+                with HTTPCache(f"{tdir}/cache.db", ttl_fn=ttl_fn) as cache:
+                    with Crawler(
+                        concurrent_tasks=4,
+                        request_timeout=5,
+                        archive=archive,
+                        cache=cache,
+                    ) as c:
+                        c.reduce_to_array(urls, False, parse_fn=_upper)
+
+        # The cached and revalidated responses should not be archived again.
+        with open(f"{tdir}/raw.warc.gz.idx", "r") as fp:
+            assert len(fp.read().splitlines()) == len(urls)
@@ -0,0 +1,106 @@
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from canrevan.caching import HTTPCache, naver_cache_ttl
+from canrevan.crawling import Crawler
+
+
+def test_http_cache_ttl_and_validators():
+    with tempfile.TemporaryDirectory() as tdir:
+        ttl_fn = lambda url: 0.1 if "nav" in url else math.inf  # noqa: E731
+        with HTTPCache(f"{tdir}/cache.db", ttl_fn=ttl_fn) as cache:
+            cache.store("http://nav", b"page", "euc-kr", etag='"v1"')
+            cache.store("http://article", b"article", last_modified="yesterday")
+            assert cache.lookup("http://unknown") is None
+
+            entry = cache.lookup("http://nav")
+            assert entry.body == b"page" and entry.charset == "euc-kr" and entry.fresh
+            assert entry.validators() == {"If-None-Match": '"v1"'}
+
+            # The entry should be stale after its ttl, until it is revalidated.
+            time.sleep(0.15)
+            assert not cache.lookup("http://nav").fresh
+            cache.refresh("http://nav")
+            assert cache.lookup("http://nav").fresh
+
+        # The entries should be kept across the runs.
+        with HTTPCache(f"{tdir}/cache.db", ttl_fn=ttl_fn) as cache:
+            entry = cache.lookup("http://article")
+            assert entry.fresh and entry.body == b"article"
+            assert entry.validators() == {"If-Modified-Since": "yesterday"}
+
+
+def test_http_cache_lru_eviction():
+    with tempfile.TemporaryDirectory() as tdir:
+        with HTTPCache(
+            f"{tdir}/cache.db",
+            max_bytes=3500,
+            ttl_fn=lambda url: math.inf,
+            compress_level=0,
+        ) as cache:
+            for name in "abc":
+                cache.store(f"http://{name}", os.urandom(1000))
+                time.sleep(0.01)
+
+            # The least recently used entry should be evicted.
+            cache.lookup("http://a")
+            cache.store("http://d", os.urandom(1000))
+            assert cache.lookup("http://b") is None
+            assert all(cache.lookup(f"http://{name}") is not None for name in "acd")
+            assert cache.size <= 3500
+
+
+def test_http_cache_batched_access_times():
+    with tempfile.TemporaryDirectory() as tdir:
+        with HTTPCache(f"{tdir}/cache.db", ttl_fn=lambda url: math.inf) as cache:
+            cache.store("http://a", b"a")
+            with sqlite3.connect(f"{tdir}/cache.db") as conn:
+                stored = conn.execute("SELECT accessed FROM entries").fetchone()[0]
+
+            # The access time should be updated in batches, even if the entry is
+            # looked up from the other threads.
+            time.sleep(0.01)
+            with ThreadPoolExecutor(1) as executor:
+                assert executor.submit(cache.lookup, "http://a").result() is not None
+            with sqlite3.connect(f"{tdir}/cache.db") as conn:
+                accessed = conn.execute("SELECT accessed FROM entries").fetchone()[0]
+            assert accessed == stored
+
+        with sqlite3.connect(f"{tdir}/cache.db") as conn:
+            assert conn.execute("SELECT accessed FROM entries").fetchone()[0] > stored
+
+
+def test_naver_cache_ttl():
+    today = datetime.now().strftime("%Y%m%d")
+    assert naver_cache_ttl("https://n.com/read.nhn?oid=001&aid=0000000001") == math.inf
+    assert naver_cache_ttl(f"https://n.com/list.nhn?date={today}&page=1") == 600
+    assert naver_cache_ttl("https://n.com/list.nhn?date=20100101&page=1") == 86400
+    assert naver_cache_ttl("https://n.com/main.nhn") == 0
+
+
+def test_crawl_with_http_cache(stub_server: str):
+    urls = [f"{stub_server}/read.nhn?aid={aid}" for aid in range(10)]
+    urls += [f"{stub_server}/etag/read.nhn?aid={aid}" for aid in range(10)]
+
+    with tempfile.TemporaryDirectory() as tdir:
+        ttl_fn = lambda url: 0 if "etag" in url else math.inf  # noqa: E731
+        for _ in range(2):
+            with HTTPCache(f"{tdir}/cache.db", ttl_fn=ttl_fn) as cache:
+                with Crawler(concurrent_tasks=4, request_timeout=5, cache=cache) as c:
+                    documents = c.reduce_to_array(urls, include_reporter_name=False)
+                    assert sorted(documents) == sorted(
+                        url[len(stub_server) :] for url in urls
+                    )
+
+        # The fresh responses should be reused without any request, and the stale
+        # ones should be revalidated by the server.
+        counters = c.metrics.snapshot()["counters"]
+        assert counters['cache{result="hit"}'] == 10
+        assert counters['cache{result="revalidated"}'] == 10
+        assert counters['responses{status="304"}'] == 10
+        assert c.connection_stats["requests"] == 10
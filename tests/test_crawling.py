@@ -1,8 +1,14 @@
+import asyncio
+import gc
+import os
 import re
 import tempfile
+from typing import Tuple
 
 from canrevan import DEFAULT_USER_AGENT_STRING
 from canrevan.crawling import Crawler
+from canrevan.parsing import extract_article_urls, warm_up_parser
+from canrevan.writing import ShardedWriter
 
 _dummy_urls = [
     f"https://news.naver.com/main/list.nhn?mode=LSD&mid=shm"
@@ -19,42 +25,404 @@ def _get_current_page_from_html(content: str) -> int:
 
 
 def test_crawl_reduce_array():
-    crawler = Crawler(
+    with Crawler(
         concurrent_tasks=500,
         request_headers={"user-agent": DEFAULT_USER_AGENT_STRING},
         request_timeout=1,
-    )
-    current_pages = crawler.reduce_to_array(
-        _dummy_urls, parse_fn=_get_current_page_from_html
-    )
+    ) as crawler:
+        current_pages = crawler.reduce_to_array(
+            _dummy_urls, parse_fn=_get_current_page_from_html
+        )
 
-    for page in current_pages:
-        # Note that we only crawled up to 3 pages from each category and date.
-        assert isinstance(page, int)
-        assert page < 3
+        for page in current_pages:
+            # Note that we only crawled up to 3 pages from each category and date.
+            assert isinstance(page, int)
+            assert page < 3
 
 
 def test_crawl_reduce_file():
-    crawler = Crawler(
+    with Crawler(
         concurrent_tasks=500,
         request_headers={"user-agent": DEFAULT_USER_AGENT_STRING},
         request_timeout=1,
-    )
+    ) as crawler:
+        with tempfile.TemporaryDirectory() as tdir:
+            written = crawler.reduce_to_file(
+                _dummy_urls,
+                filename=f"{tdir}/crawled.txt",
+                parse_fn=_get_current_page_from_html,
+            )
 
-    with tempfile.TemporaryDirectory() as tdir:
-        written = crawler.reduce_to_file(
-            _dummy_urls,
-            filename=f"{tdir}/crawled.txt",
-            parse_fn=_get_current_page_from_html,
+            # With a high probability, there must be successfully crawled data.
+            assert written > 0
+
+            with open(f"{tdir}/crawled.txt", "r") as fp:
+                for page in fp:
+                    page = int(page.strip())
+
+                    # Note that we only crawled up to 3 pages from each category
+                    # and date.
+                    assert page < 3
+
+
+def test_crawl_releases_finished_tasks(stub_server: str):
+    with Crawler(concurrent_tasks=8, request_timeout=5) as crawler:
+        urls = (f"{stub_server}/read.nhn?aid={i}" for i in range(1000))
+
+        # Count the task objects which are still referenced while crawling.
+        referenced_tasks, updated = [], 0
+
+        def update_fn():
+            nonlocal updated
+            updated += 1
+
+            if updated % 100 == 0:
+                referenced_tasks.append(
+                    sum(isinstance(obj, asyncio.Task) for obj in gc.get_objects())
+                )
+
+        results = crawler.reduce_to_array(urls, False, update_fn=update_fn)
+        assert sorted(results) == sorted(f"/read.nhn?aid={i}" for i in range(1000))
+
+        # Finished tasks must not be accumulated until the end of crawling.
+        assert max(referenced_tasks) < 100
+
+
+def test_crawl_reduce_file_done_and_append(stub_server: str):
+    with Crawler(concurrent_tasks=8, request_timeout=5) as crawler:
+        with tempfile.TemporaryDirectory() as tdir:
+            with open(f"{tdir}/crawled.txt", "w") as fp:
+                fp.write("/previous\n")
+
+            done_urls = []
+            written = crawler.reduce_to_file(
+                [f"{stub_server}/read.nhn?aid={i}" for i in range(10)],
+                filename=f"{tdir}/crawled.txt",
+                include_reporter_name=False,
+                done_fn=done_urls.append,
+                append=True,
+            )
+            assert written == 10
+            assert sorted(done_urls) == sorted(
+                f"{stub_server}/read.nhn?aid={i}" for i in range(10)
+            )
+
+            with open(f"{tdir}/crawled.txt", "r") as fp:
+                assert len(fp.readlines()) == 11
+
+
+def test_crawl_reduce_pipeline_file(stub_server: str):
+    with Crawler(concurrent_tasks=4, request_timeout=5) as crawler:
+        with tempfile.TemporaryDirectory() as tdir:
+            navigated, crawled = [], []
+            with ShardedWriter(f"{tdir}/crawled.txt") as writer:
+                written = crawler.reduce_pipeline_to_writer(
+                    [
+                        [
+                            f"{stub_server}/list.nhn?page={page}"
+                            for page in range(1, 100)
+                        ],
+                        [f"{stub_server}/list.nhn?page={page}" for page in range(1, 4)],
+                    ],
+                    writer,
+                    include_reporter_name=False,
+                    extract_fn=extract_article_urls,
+                    article_urls=[f"{stub_server}/read.nhn?oid=001&aid=0000000100"],
+                    filter_fn=lambda url: not url.endswith("aid=0000000002"),
+                    nav_done_fn=lambda url, urls: navigated.append(url),
+                    done_fn=crawled.append,
+                )
+
+            # The articles linked from the overlapping pages should be crawled only
+            # once, except the one rejected by the filter function.
+            expected = [100] + [aid for aid in range(1, 15) if aid != 2]
+            assert written == len(expected)
+            assert len(navigated) == 11 + 3
+            assert sorted(crawled) == sorted(
+                f"{stub_server}/read.nhn?oid=001&aid={aid:010d}" for aid in expected
+            )
+
+            with open(f"{tdir}/crawled.txt", "r") as fp:
+                assert len(fp.readlines()) == len(expected)
+
+
+def test_crawl_reduce_pages_array(stub_server: str):
+    with Crawler(concurrent_tasks=4, request_timeout=5) as crawler:
+        navigated = []
+        article_urls = crawler.reduce_pages_to_array(
+            [[f"{stub_server}/list.nhn?page={page}" for page in range(1, 100)]],
+            include_reporter_name=False,
+            parse_fn=extract_article_urls,
+            done_fn=lambda url, _: navigated.append(url),
+        )
+
+        # The navigation should stop right after the page which repeats the last page.
+        assert navigated == [
+            f"{stub_server}/list.nhn?page={page}" for page in range(1, 12)
+        ]
+        assert {url for urls in article_urls for url in urls} == {
+            f"{stub_server}/read.nhn?oid=001&aid={aid:010d}" for aid in range(1, 15)
+        }
+
+
+def _identity(document: str, _: bool) -> str:
+    return document
+
+
+def test_crawl_decode_in_subprocess(stub_server: str):
+    with Crawler(
+        concurrent_tasks=4, num_parsing_processes=2, request_timeout=5
+    ) as crawler:
+        documents = crawler.reduce_to_array(
+            [f"{stub_server}/read.nhn?aid=1", f"{stub_server}/euckr/read.nhn?aid=2"],
+            include_reporter_name=False,
+            parse_fn=_identity,
+        )
+        assert sorted(documents) == [
+            "/euckr/read.nhn?aid=2 한국어 문서",
+            "/read.nhn?aid=1",
+        ]
+
+
+def _parse_even_aid(document: str, _: bool) -> Tuple[int, int]:
+    aid = int(document.split("=")[-1])
+    if aid % 2 == 1:
+        raise ValueError("odd article id.")
+    return aid, os.getpid()
+
+
+def test_crawl_batched_parsing(stub_server: str):
+    with Crawler(
+        concurrent_tasks=16,
+        num_parsing_processes=2,
+        request_timeout=5,
+        parse_batch_size=8,
+        parse_batch_timeout=0.05,
+    ) as crawler:
+        results = crawler.reduce_to_array(
+            [f"{stub_server}/read.nhn?aid={i}" for i in range(100)],
+            include_reporter_name=False,
+            parse_fn=_parse_even_aid,
+        )
+
+        # The results should be fanned out to their urls and the invalid documents
+        # should not affect the other ones in the same batch.
+        assert sorted(aid for aid, _ in results) == list(range(0, 100, 2))
+        assert all(pid != os.getpid() for _, pid in results)
+
+
+def _parse_in_process(document: str, _: bool) -> int:
+    return os.getpid()
+
+
+def test_crawl_reuses_parsing_processes(stub_server: str):
+    # The parsing processes should be started once from the forkserver and kept
+    # across the crawlings until the crawler is closed.
+    with Crawler(
+        concurrent_tasks=4,
+        request_timeout=5,
+        parse_initializer=warm_up_parser,
+        start_method="forkserver",
+        preload_modules=["canrevan.parsing"],
+    ) as crawler:
+        pids = [
+            crawler.reduce_to_array(
+                [f"{stub_server}/read.nhn?aid={i}"],
+                include_reporter_name=False,
+                parse_fn=_parse_in_process,
+            )
+            for i in range(2)
+        ]
+        assert pids[0] == pids[1] != [os.getpid()]
+    assert crawler._pool is None
+
+
+def test_crawl_inline_parsing(stub_server: str):
+    with Crawler(
+        concurrent_tasks=4, request_timeout=5, inline_parse_bytes=1024
+    ) as crawler:
+        results = crawler.reduce_to_array(
+            [f"{stub_server}/read.nhn?aid={i}" for i in range(10)],
+            include_reporter_name=False,
+            parse_fn=_parse_even_aid,
         )
+        assert sorted(results) == [(aid, os.getpid()) for aid in range(0, 10, 2)]
+
+
+def test_crawl_retry_temporary_failures(stub_server: str):
+    urls = [f"{stub_server}/flaky/read.nhn?aid={aid}" for aid in range(20)]
+
+    # The failed requests should be retried until they succeed.
+    with Crawler(concurrent_tasks=8, max_retries=3, retry_backoff=0.01) as crawler:
+        documents = crawler.reduce_to_array(urls, include_reporter_name=False)
+        assert sorted(documents) == sorted(url[len(stub_server) :] for url in urls)
+
+    # The failures should be dropped if the retries are exhausted.
+    urls = [f"{stub_server}/flaky/read.nhn?aid={aid}" for aid in range(20, 40)]
+    with Crawler(concurrent_tasks=8, max_retries=1, retry_backoff=0.01) as crawler:
+        assert crawler.reduce_to_array(urls, include_reporter_name=False) == []
+
+
+def test_crawl_adapt_to_throttling(stub_server: str):
+    urls = [f"{stub_server}/throttle/read.nhn?aid={aid}" for aid in range(300)]
+
+    with Crawler(concurrent_tasks=64, max_retries=10, retry_backoff=0.01) as crawler:
+        documents = crawler.reduce_to_array(urls, include_reporter_name=False)
+        assert len(documents) == len(urls)
+
+        # The window of the host should shrink below the server's limit.
+        assert crawler.limiter.limit(stub_server[len("http://") :]) < 16
+
+
+def test_crawl_reuse_connections(stub_server: str):
+    with Crawler(concurrent_tasks=4, request_timeout=5) as crawler:
+        for aids in [range(0, 50), range(50, 100)]:
+            documents = crawler.reduce_to_array(
+                [f"{stub_server}/read.nhn?aid={aid}" for aid in aids],
+                include_reporter_name=False,
+            )
+            assert len(documents) == 50
+
+        # The connections should be kept alive and reused across the crawlings.
+        stats = crawler.connection_stats
+        assert stats["requests"] == 100
+        assert stats["connections_created"] <= 4
+        assert stats["connections_reused"] == 100 - stats["connections_created"]
+
+
+def test_crawl_stream(stub_server: str):
+    async def run():
+        async with Crawler(concurrent_tasks=4, request_timeout=5) as crawler:
+            urls = [f"{stub_server}/read.nhn?aid={aid}" for aid in range(100)]
+            documents = [data async for _, data in crawler.stream(urls, False)]
+            assert sorted(documents) == sorted(url[len(stub_server) :] for url in urls)
+
+            # The articles should be yielded while navigating the pages.
+            documents = [
+                data
+                async for _, data in crawler.stream_pipeline(
+                    [[f"{stub_server}/list.nhn?page={page}" for page in range(1, 4)]],
+                    False,
+                    extract_fn=extract_article_urls,
+                )
+            ]
+            assert sorted(documents) == sorted(
+                f"/read.nhn?oid=001&aid={aid:010d}" for aid in range(1, 8)
+            )
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_crawl_stream_backpressure(stub_server: str):
+    async def run():
+        async with Crawler(concurrent_tasks=4, request_timeout=5) as crawler:
+            urls = (f"{stub_server}/read.nhn?aid={aid}" for aid in range(1000))
+            stream = crawler.stream(urls, False, max_buffered=2)
+
+            # The crawling should wait for the slow consumer after filling the buffer
+            # and the running tasks.
+            await stream.__anext__()
+            await asyncio.sleep(0.2)
+            assert crawler.connection_stats["requests"] <= 1 + 2 + 4
+
+            # The crawling should be stopped if the consumer stops streaming.
+            await stream.aclose()
+            requests = crawler.connection_stats["requests"]
+            await asyncio.sleep(0.1)
+            assert crawler.connection_stats["requests"] == requests
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_crawl_metrics(stub_server: str):
+    urls = [f"{stub_server}/flaky/read.nhn?aid={aid}" for aid in range(10)]
+    urls += [f"{stub_server}/read.nhn?aid={aid}" for aid in range(10)]
+
+    with tempfile.TemporaryDirectory() as tdir:
+        with Crawler(
+            concurrent_tasks=4,
+            num_parsing_processes=2,
+            max_retries=1,
+            retry_backoff=0.01,
+            profile_dir=f"{tdir}/profile",
+        ) as crawler:
+            with ShardedWriter(f"{tdir}/output.txt") as writer:
+                crawler.reduce_to_writer(
+                    urls, writer, include_reporter_name=False, parse_fn=_parse_even_aid
+                )
+
+        # The parsing processes should dump their profiling results.
+        assert any(name.endswith(".prof") for name in os.listdir(f"{tdir}/profile"))
+
+    # The flaky articles fail twice, so they are dropped after a retry.
+    counters = crawler.metrics.snapshot()["counters"]
+    assert counters['responses{status="200"}'] == 10
+    assert counters['responses{status="503"}'] == 20
+    assert counters['retries{error="HTTP 503"}'] == 10
+    assert counters['failures{error="HTTP 503",stage="fetch"}'] == 10
+    assert counters['failures{error="ValueError",stage="parse"}'] == 5
+
+    histograms = crawler.metrics.snapshot()["histograms"]
+    assert histograms["ttfb"]["count"] == 30
+    assert histograms["body"]["count"] == 10
+    assert histograms["parse"]["count"] == 10
+    assert histograms["write"]["count"] == 5
+
+    gauges = crawler.metrics.snapshot()["gauges"]
+    assert gauges["in_flight"] == 0 and gauges["parse_queue"] == 0
+
+
+def test_crawl_reduce_dropped_items(stub_server: str):
+    with Crawler(concurrent_tasks=4, request_timeout=5) as crawler:
+        with tempfile.TemporaryDirectory() as tdir:
+            done_urls = []
+            with ShardedWriter(f"{tdir}/crawled.txt") as writer:
+                written = crawler.reduce_to_writer(
+                    [f"{stub_server}/read.nhn?aid={i}" for i in range(10)],
+                    writer,
+                    include_reporter_name=False,
+                    done_fn=done_urls.append,
+                    format_fn=lambda url, data: data if url[-1] in "02468" else None,
+                )
+
+            # The dropped items should be completed without being written.
+            assert written == 5
+            assert len(done_urls) == 10
+            with open(f"{tdir}/crawled.txt", "r") as fp:
+                assert len(fp.readlines()) == 5
+
+
+def test_crawl_close_implicit_session(stub_server: str):
+    urls = [f"{stub_server}/read.nhn?aid={aid}" for aid in range(10)]
+
+    # The session should be closed after each sync crawling if the crawler is not
+    # used as a context manager.
+    crawler = Crawler(concurrent_tasks=4, request_timeout=5)
+    assert len(crawler.reduce_to_array(urls, include_reporter_name=False)) == 10
+    assert crawler._session is None
+
+    with crawler:
+        assert len(crawler.reduce_to_array(urls, include_reporter_name=False)) == 10
+        assert not crawler._session.closed
+    assert crawler._session is None
+
+
+def test_crawl_mix_sync_and_async_api(stub_server: str):
+    urls = [f"{stub_server}/read.nhn?aid={aid}" for aid in range(10)]
+    expected = sorted(url[len(stub_server) :] for url in urls)
+
+    async def consume(crawler: Crawler):
+        return sorted([data async for _, data in crawler.stream(urls, False)])
 
-        # With a high probability, there must be successfully crawled data.
-        assert written > 0
+    # The session should be recreated on the other event loop (e.g. the one of
+    # `asyncio.run`), rather than being reused on the loop where it is created.
+    with Crawler(concurrent_tasks=4, request_timeout=5) as crawler:
+        assert sorted(crawler.reduce_to_array(urls, False)) == expected
 
-        with open(f"{tdir}/crawled.txt", "r") as fp:
-            for page in fp:
-                page = int(page.strip())
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(consume(crawler)) == expected
+        finally:
+            loop.close()
 
-                # Note that we only crawled up to 3 pages from each category
-                # and date.
-                assert page < 3
+        assert sorted(crawler.reduce_to_array(urls, False)) == expected
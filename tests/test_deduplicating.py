@@ -0,0 +1,119 @@
+import os
+import tempfile
+
+import pytest
+
+from canrevan.deduplicating import (
+    NearDuplicateIndex,
+    band_keys,
+    deduplicate_output,
+    minhash_signature,
+    sign_parsed,
+)
+
+_ARTICLE = (
+    "정부는 내년부터 전국의 초등학교에 인공지능 교육 과정을 도입한다고 밝혔다. "
+    "교육부는 이를 위해 교사 연수와 교재 개발에 약 천억 원을 투입할 계획이다. "
+    "전문가들은 현장의 준비가 부족하다며 단계적인 도입이 필요하다고 지적했다. "
+    "교육부 관계자는 시범 학교의 결과를 바탕으로 과정을 보완하겠다고 말했다."
+)
+
+
+def _parse_content(document: str, _: bool) -> str:
+    return document
+
+
+def test_minhash_signature_similarity():
+    def similarity(a: str, b: str) -> float:
+        sa, sb = minhash_signature(a), minhash_signature(b)
+        return sum(x == y for x, y in zip(sa, sb)) / len(sa)
+
+    # The same wire-service story from the other press should be similar, while the
+    # different story should not.
+    assert similarity(_ARTICLE, _ARTICLE) == 1
+    assert (
+        similarity(_ARTICLE, "[연합뉴스] " + _ARTICLE.replace("밝혔다", "전했다")) > 0.7
+    )
+    assert similarity(_ARTICLE, "오늘 서울의 낮 기온은 30도까지 오르겠습니다.") < 0.2
+
+    # The signature should not depend on the whitespaces.
+    assert minhash_signature(_ARTICLE) == minhash_signature(
+        _ARTICLE.replace(" ", "\n ")
+    )
+    assert minhash_signature("짧은") is None
+
+
+def test_near_duplicate_index_persistence():
+    copied = "[연합뉴스] " + _ARTICLE.replace("밝혔다", "전했다")
+    other = "오늘 서울의 낮 기온은 30도까지 오르겠으며 곳곳에 소나기가 내리겠습니다."
+
+    with tempfile.TemporaryDirectory() as tdir:
+        with NearDuplicateIndex(f"{tdir}/index", capacity=1000) as index:
+            assert not index.add(band_keys(minhash_signature(_ARTICLE), 16))
+            assert index.add(band_keys(minhash_signature(copied), 16))
+            assert len(index) == 1
+
+        # The index should be kept across the runs with its parameters.
+        size = os.path.getsize(f"{tdir}/index")
+        with NearDuplicateIndex(f"{tdir}/index", capacity=10**6) as index:
+            assert len(index) == 1
+            assert index.add(band_keys(minhash_signature(copied), 16))
+            assert not index.add(band_keys(minhash_signature(other), 16))
+        assert os.path.getsize(f"{tdir}/index") == size
+
+        with pytest.raises(ValueError):
+            NearDuplicateIndex(f"{tdir}/index", num_bands=32, rows=4)
+
+
+def test_deduplicate_output():
+    copied = "[연합뉴스] " + _ARTICLE.replace("밝혔다", "전했다")
+    signed = [
+        sign_parsed(_parse_content, 16, 8, 5, document, False)
+        for document in [_ARTICLE, copied, "짧은"]
+    ]
+
+    # The near-duplicates should be dropped, while the contents too short to sign
+    # are kept.
+    format_fn, _ = deduplicate_output(NearDuplicateIndex(capacity=1000))
+    assert [format_fn("url", data) for data in signed] == [_ARTICLE, None, "짧은"]
+
+    # The structured records should be tagged instead if requested.
+    format_fn, _ = deduplicate_output(
+        NearDuplicateIndex(capacity=1000),
+        tag=True,
+        format_fn=lambda url, record: record["near_duplicate"],
+    )
+    records = [
+        sign_parsed(lambda d, _: {"content": d}, 16, 8, 5, document, False)
+        for document in [_ARTICLE, copied]
+    ]
+    assert [format_fn("url", data) for data in records] == [False, True]
+
+
+def test_deduplicate_output_commit():
+    copied = "[연합뉴스] " + _ARTICLE.replace("밝혔다", "전했다")
+    article, duplicate = [
+        sign_parsed(_parse_content, 16, 8, 5, document, False)
+        for document in [_ARTICLE, copied]
+    ]
+
+    with tempfile.TemporaryDirectory() as tdir:
+        # The uncommitted articles should be checked against each other, but they
+        # should not be indexed until they are committed.
+        with NearDuplicateIndex(f"{tdir}/index", capacity=1000) as index:
+            format_fn, commit_fn = deduplicate_output(index)
+            assert format_fn("url1", article) == _ARTICLE
+            assert format_fn("url2", duplicate) is None
+            assert len(index) == 0
+
+        # The lost articles should be written again after the crash.
+        with NearDuplicateIndex(f"{tdir}/index", capacity=1000) as index:
+            format_fn, commit_fn = deduplicate_output(index)
+            assert format_fn("url1", article) == _ARTICLE
+            commit_fn("url1")
+            commit_fn("url2")
+            assert len(index) == 1
+
+        with NearDuplicateIndex(f"{tdir}/index", capacity=1000) as index:
+            format_fn, _ = deduplicate_output(index)
+            assert format_fn("url2", duplicate) is None
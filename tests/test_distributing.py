@@ -0,0 +1,192 @@
+import json
+import multiprocessing
+import tempfile
+import time
+import uuid
+from typing import List
+
+import pytest
+
+from canrevan.crawling import Crawler
+from canrevan.distributing import (
+    RedisWorkQueue,
+    SQLiteWorkQueue,
+    WorkQueue,
+    crawl_from_queue,
+    open_work_queue,
+)
+from canrevan.parsing import extract_article_urls
+from canrevan.writing import ShardedWriter
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def create_queue(request, tmp_path):
+    def create_queue_fn(**kwargs) -> WorkQueue:
+        if request.param == "sqlite":
+            return SQLiteWorkQueue(str(tmp_path / "queue.db"), **kwargs)
+        return RedisWorkQueue(client, **kwargs)
+
+    if request.param == "redis":
+        client = pytest.importorskip("fakeredis").FakeRedis()
+    return create_queue_fn
+
+
+def test_work_queue_lease_and_ack(create_queue):
+    queue = create_queue()
+
+    # The duplicated tasks should be ignored.
+    assert queue.put("article", ["a", "b", "c"]) == 3
+    assert queue.put("article", ["a", "d"]) == 1
+    assert queue.remaining("article") == 4 and queue.remaining("nav") == 0
+
+    # The leased tasks should not be leased again until they are released.
+    leased = queue.lease("article", 3)
+    assert len(leased) == 3
+    assert queue.lease("article", 3) == [item for item in "abcd" if item not in leased]
+
+    queue.ack("article", leased)
+    queue.nack("article", [item for item in "abcd" if item not in leased])
+    assert queue.remaining("article") == 1
+    assert queue.lease("article", 3) == [item for item in "abcd" if item not in leased]
+
+
+def test_work_queue_lease_expiration(create_queue):
+    queue = create_queue(lease_timeout=0.05, max_attempts=2)
+    queue.put("nav", ["a"])
+
+    # The task should be leased again after the lease is expired, and should be
+    # given up after too many attempts.
+    assert queue.lease("nav", 1) == ["a"]
+    assert queue.lease("nav", 1) == []
+    time.sleep(0.1)
+    assert queue.lease("nav", 1) == ["a"]
+    time.sleep(0.1)
+    assert queue.lease("nav", 1) == []
+    assert queue.remaining("nav") == 0
+
+
+def _run_worker(queue_path: str, output_path: str):
+    with Crawler(concurrent_tasks=4, request_timeout=5) as crawler:
+        with open_work_queue(queue_path) as queue:
+            with ShardedWriter(output_path) as writer:
+                crawl_from_queue(
+                    crawler,
+                    queue,
+                    writer,
+                    include_reporter_name=False,
+                    extract_fn=extract_article_urls,
+                    lease_size=2,
+                    nav_lease_size=1,
+                    poll_interval=0.05,
+                )
+
+
+def test_crawl_from_queue_with_workers(stub_server: str):
+    with tempfile.TemporaryDirectory() as tdir:
+        with open_work_queue(f"sqlite://{tdir}/queue.db") as queue:
+            queue.put(
+                "nav",
+                [
+                    json.dumps([f"{stub_server}/list.nhn?page={page}"])
+                    for page in range(1, 4)
+                ]
+                + [
+                    json.dumps(
+                        [f"{stub_server}/list.nhn?page={page}" for page in range(4, 99)]
+                    )
+                ],
+            )
+
+        # Run the workers in separate processes like the ones on different nodes.
+        workers = [
+            multiprocessing.Process(
+                target=_run_worker,
+                args=(f"sqlite://{tdir}/queue.db", f"{tdir}/output-{i}.txt"),
+            )
+            for i in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            assert worker.exitcode == 0
+
+        # Every article should be crawled exactly once by one of the workers.
+        lines = []
+        for i in range(3):
+            with open(f"{tdir}/output-{i}.txt", "r") as fp:
+                lines += fp.read().splitlines()
+        assert sorted(lines) == sorted(
+            f"/read.nhn?oid=001&aid={aid:010d}" for aid in range(1, 15)
+        )
+
+
+def test_crawl_from_queue_with_compressed_writer(create_queue, stub_server: str):
+    queue = create_queue(lease_timeout=0.2)
+    queue.put(
+        "nav",
+        [json.dumps([f"{stub_server}/list.nhn?page={page}" for page in range(1, 99)])],
+    )
+
+    with tempfile.TemporaryDirectory() as tdir:
+        crawled = []
+        with Crawler(concurrent_tasks=4, request_timeout=5) as crawler:
+            writer = ShardedWriter(
+                f"{tdir}/output.txt", compression="gzip", commit_interval=60
+            )
+            written = crawl_from_queue(
+                crawler,
+                queue,
+                writer,
+                include_reporter_name=False,
+                extract_fn=extract_article_urls,
+                done_fn=crawled.append,
+                lease_size=2,
+                poll_interval=0.05,
+            )
+
+            # The worker should finish without waiting for its own articles, which
+            # are acknowledged when the writer stores them.
+            assert crawled == []
+            writer.close()
+
+        expected = [
+            f"{stub_server}/read.nhn?oid=001&aid={aid:010d}" for aid in range(1, 15)
+        ]
+        # The articles should be kept leased until the writer stores them, rather
+        # than being crawled again after their leases are expired.
+        assert written == len(expected)
+        assert sorted(crawled) == expected
+        assert queue.remaining("article") == 0
+
+
+def test_crawl_from_queue_retries_failed_nav_groups(create_queue, stub_server: str):
+    queue = create_queue(max_attempts=3)
+
+    # The flaky page fails twice, so its group should be navigated at the third
+    # attempt rather than being acknowledged after the first failure.
+    flaky_url = f"{stub_server}/flaky/list.nhn?page=1&queue={uuid.uuid4().hex}"
+    queue.put("nav", [json.dumps([flaky_url])])
+
+    navigated = []
+
+    def extract_fn(document: str, include_reporter_name: bool) -> List[str]:
+        navigated.append(document)
+        return extract_article_urls(document, include_reporter_name)
+
+    with tempfile.TemporaryDirectory() as tdir:
+        with Crawler(
+            max_retries=0, request_timeout=5, inline_parse_bytes=1 << 20
+        ) as crawler:
+            with ShardedWriter(f"{tdir}/output.txt") as writer:
+                crawl_from_queue(
+                    crawler,
+                    queue,
+                    writer,
+                    include_reporter_name=False,
+                    extract_fn=extract_fn,
+                    poll_interval=0.05,
+                )
+
+    assert len(navigated) == 1
+    assert queue.remaining("nav") == 0
@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+from canrevan.indexing import ArticleIndex, CompletionIndex
+
+
+def test_completion_index_resume():
+    with tempfile.TemporaryDirectory() as tdir:
+        with CompletionIndex(f"{tdir}/index") as index:
+            index.mark_navigated("nav1", ["article1", "article2"])
+            index.mark_navigated("nav2", [])
+            index.mark_crawled("article1")
+            index.mark_group("nav1")
+
+        with CompletionIndex(f"{tdir}/index", resume=True) as index:
+            assert index.navigated == {"nav1": ["article1", "article2"], "nav2": []}
+            assert index.crawled == {"article1"}
+            assert index.groups == {"nav1"}
+
+        # The index should be cleared if not resuming.
+        with CompletionIndex(f"{tdir}/index") as index:
+            assert not index.navigated and not index.crawled
+        assert os.path.getsize(f"{tdir}/index") == 0
+
+
+def test_completion_index_truncated_record():
+    with tempfile.TemporaryDirectory() as tdir:
+        with open(f"{tdir}/index", "w") as fp:
+            fp.write("article\tarticle1\narticle\tartic")
+
+        # The truncated record should be ignored and overwritten by new records.
+        with CompletionIndex(f"{tdir}/index", resume=True) as index:
+            assert index.crawled == {"article1"}
+            index.mark_crawled("article2")
+
+        with CompletionIndex(f"{tdir}/index", resume=True) as index:
+            assert index.crawled == {"article1", "article2"}
+
+
+def test_article_index_update_and_lookup():
+    with tempfile.TemporaryDirectory() as tdir:
+        with ArticleIndex(f"{tdir}/ids") as index:
+            assert len(index) == 0
+            assert (1, 2625369) not in index
+
+            index.update([(29, 2625369), (1, 11892040), (29, 2625369)])
+            assert len(index) == 2
+            assert (29, 2625369) in index
+            assert (1, 11892040) in index
+            assert (1, 2625369) not in index
+
+        # The stored ids should be merged with the new ones in the next runs.
+        with ArticleIndex(f"{tdir}/ids") as index:
+            index.update([(421, 4881296), (1, 11892040)])
+            assert len(index) == 3
+            assert list(index.ids) == sorted(index.ids)
+            assert (29, 2625369) in index and (421, 4881296) in index
@@ -0,0 +1,91 @@
+import json
+import tempfile
+import urllib.request
+
+from canrevan.monitoring import Histogram, Metrics, MetricsExporter, MetricsRecorder
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+    for value in [0.05] * 50 + [0.5] * 49 + [5.0]:
+        histogram.observe(value)
+
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.99) == 1.0
+    assert histogram.quantile(1.0) == 10.0
+    assert histogram.quantile(0.75) == 0.1 + 0.9 * 25 / 49
+    assert histogram.cumulative_counts() == {
+        "0.1": 50,
+        "1.0": 99,
+        "10.0": 100,
+        "+Inf": 100,
+    }
+
+
+def test_histogram_sub_millisecond_quantiles():
+    # The default buckets should distinguish the stages which take microseconds.
+    histogram = Histogram()
+    for value in [0.00003] * 99 + [0.0002]:
+        histogram.observe(value)
+    assert 0.000025 < histogram.quantile(0.5) <= 0.00005
+    assert histogram.quantile(0.99) <= 0.00005
+
+
+def test_metrics_snapshot_and_prometheus():
+    metrics = Metrics()
+    metrics.observe("ttfb", 0.02)
+    metrics.increment("responses", status=200)
+    metrics.increment("responses", status=200)
+    metrics.increment("failures", stage="parse", error="ValueError")
+    metrics.add_gauge("in_flight", 3)
+    metrics.register_gauge("write_queue", lambda: 7)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {
+        'failures{error="ValueError",stage="parse"}': 1,
+        'responses{status="200"}': 2,
+    }
+    assert snapshot["gauges"] == {"in_flight": 3, "write_queue": 7}
+    assert snapshot["histograms"]["ttfb"]["count"] == 1
+
+    text = metrics.to_prometheus()
+    assert 'canrevan_responses_total{status="200"} 2' in text
+    assert "canrevan_write_queue 7" in text
+    assert 'canrevan_ttfb_seconds_bucket{le="0.025"} 1' in text
+    assert "canrevan_ttfb_seconds_count 1" in text
+
+
+def test_metrics_exporter():
+    metrics = Metrics()
+    metrics.increment("requests")
+
+    with tempfile.TemporaryDirectory() as tdir:
+        with MetricsExporter(
+            metrics, snapshot_path=f"{tdir}/metrics.jsonl", interval=60, port=0
+        ) as exporter:
+            port = exporter.server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as resp:
+                assert "canrevan_requests_total 1" in resp.read().decode("utf-8")
+
+        # The last snapshot should be written on close.
+        with open(f"{tdir}/metrics.jsonl", "r") as fp:
+            snapshots = [json.loads(line) for line in fp]
+        assert snapshots[-1]["counters"] == {"requests": 1}
+
+
+def test_metrics_merge_recorded():
+    recorder = MetricsRecorder()
+    recorder.observe("parse", 0.002)
+    recorder.observe("parse", 0.02)
+    recorder.increment("dropped", 3, stage="length")
+
+    metrics = Metrics()
+    metrics.observe("parse", 0.002)
+    metrics.merge(recorder.drain())
+
+    # The recorded metrics should be merged, and the recorder should be emptied.
+    snapshot = metrics.snapshot()
+    assert snapshot["histograms"]["parse"]["count"] == 3
+    assert snapshot["counters"] == {'dropped{stage="length"}': 3}
+    assert recorder.drain() == ({}, {})
@@ -0,0 +1,55 @@
+import pytest
+
+from canrevan.normalizing import build_normalizer, normalize_lines, worker_metrics
+
+
+def test_default_normalization():
+    lines = [
+        "[서울=뉴시스] 홍길동 기자 = 정부는 [속보] 내용을 발표했다.",
+        "",
+        "사진 설명",
+        "정부는 이를 보완하겠다고 밝혔다.",
+    ]
+
+    # The lines without a period should be removed, and the reporter name should be
+    # removed from the first line only.
+    assert normalize_lines(lines) == [
+        "정부는 [속보] 내용을 발표했다.",
+        "정부는 이를 보완하겠다고 밝혔다.",
+    ]
+    assert normalize_lines(lines, include_reporter_name=True)[0] == lines[0]
+    assert normalize_lines(["[서울=뉴시스]"], ["reporter_name"]) == []
+
+
+def test_normalization_stages():
+    lines = [
+        "자세한 내용은 https://example.com/news?id=1 에서 확인할 수 있다. 문의는 "
+        "press@example.co.kr 로 하면 된다.",
+        "홍길동 기자 hong@example.com",
+        "짧다.",
+    ]
+    assert normalize_lines(
+        lines, ["urls", "emails", "sentences", "sentence_endings", "min_length=5"]
+    ) == ["자세한 내용은 에서 확인할 수 있다.", "문의는 로 하면 된다."]
+    assert normalize_lines(lines, ["sentence_endings=다.", "max_length=10"]) == [
+        "짧다."
+    ]
+
+    with pytest.raises(ValueError):
+        build_normalizer(("unknown",))
+    with pytest.raises(ValueError):
+        build_normalizer(("min_length",))
+
+
+def test_normalization_metrics():
+    worker_metrics.drain()
+    normalize_lines(
+        ["첫 문장.", "둘째 줄", "셋째 줄"], ["sentence_endings", "min_length=3"]
+    )
+
+    # The elapsed time and the dropped lines of each stage should be recorded.
+    histograms, counters = worker_metrics.drain()
+    assert histograms["normalize_sentence_endings"].count == 1
+    assert histograms["normalize_min_length"].count == 1
+    assert counters[("normalize_dropped_lines", (("stage", "sentence_endings"),))] == 2
+    assert ("normalize_dropped_lines", (("stage", "min_length"),)) not in counters
@@ -1,7 +1,17 @@
 import json
 import os
 
-from canrevan.parsing import extract_article_urls, parse_article_content
+import pytest
+
+from canrevan.monitoring import worker_metrics
+from canrevan.parsing import (
+    PARSER_BACKENDS,
+    extract_article_links,
+    extract_article_urls,
+    parse_article_content,
+    parse_article_record,
+    warm_up_parser,
+)
 
 
 def _get_resource_content(name: str) -> str:
@@ -11,34 +21,60 @@ def _get_resource_content(name: str) -> str:
 
 
 def test_extracting_article_urls():
-    article_urls = extract_article_urls(_get_resource_content("nav_html"))
-    article_urls = [url[55:] for url in article_urls]
+    article_urls = extract_article_urls(_get_resource_content("nav_html"), False)
+    assert all(
+        url.startswith("https://news.naver.com/main/read.nhn?") for url in article_urls
+    )
+
+    # The article urls should be normalized to the category and the article ids.
+    article_urls = [url[37:] for url in article_urls]
     assert article_urls == [
-        "sid1=100&sid2=265&oid=029&aid=0002625369",
-        "sid1=100&sid2=265&oid=079&aid=0003409069",
-        "sid1=100&sid2=265&oid=421&aid=0004881296",
-        "sid1=100&sid2=265&oid=421&aid=0004881295",
-        "sid1=100&sid2=265&oid=421&aid=0004881294",
-        "sid1=100&sid2=265&oid=001&aid=0011892040",
-        "sid1=100&sid2=265&oid=001&aid=0011892037",
-        "sid1=100&sid2=265&oid=001&aid=0011892036",
-        "sid1=100&sid2=265&oid=001&aid=0011892035",
-        "sid1=100&sid2=265&oid=001&aid=0011892034",
-        "sid1=100&sid2=265&oid=001&aid=0011892013",
-        "sid1=100&sid2=265&oid=014&aid=0004497351",
-        "sid1=100&sid2=265&oid=421&aid=0004881269",
-        "sid1=100&sid2=265&oid=468&aid=0000698806",
-        "sid1=100&sid2=265&oid=001&aid=0011891993",
-        "sid1=100&sid2=265&oid=001&aid=0011891992",
-        "sid1=100&sid2=265&oid=001&aid=0011891989",
-        "sid1=100&sid2=265&oid=001&aid=0011891986",
-        "sid1=100&sid2=265&oid=001&aid=0011891985",
-        "sid1=100&sid2=265&oid=001&aid=0011891984",
+        "sid1=100&oid=029&aid=0002625369",
+        "sid1=100&oid=079&aid=0003409069",
+        "sid1=100&oid=421&aid=0004881296",
+        "sid1=100&oid=421&aid=0004881295",
+        "sid1=100&oid=421&aid=0004881294",
+        "sid1=100&oid=001&aid=0011892040",
+        "sid1=100&oid=001&aid=0011892037",
+        "sid1=100&oid=001&aid=0011892036",
+        "sid1=100&oid=001&aid=0011892035",
+        "sid1=100&oid=001&aid=0011892034",
+        "sid1=100&oid=001&aid=0011892013",
+        "sid1=100&oid=014&aid=0004497351",
+        "sid1=100&oid=421&aid=0004881269",
+        "sid1=100&oid=468&aid=0000698806",
+        "sid1=100&oid=001&aid=0011891993",
+        "sid1=100&oid=001&aid=0011891992",
+        "sid1=100&oid=001&aid=0011891989",
+        "sid1=100&oid=001&aid=0011891986",
+        "sid1=100&oid=001&aid=0011891985",
+        "sid1=100&oid=001&aid=0011891984",
+    ]
+
+
+def test_extracting_article_links():
+    links = extract_article_links(
+        '<ul class="type06_headline"><dt> </dt><dt>no link</dt>'
+        '<dt><a href="/read.nhn?mode=LS2D&amp;sid2=265&amp;oid=1&amp;aid=2">'
+        '</a></dt></ul><ul class="type06"><dt><a href="/read.nhn?oid=001&aid=2">'
+        '</a></dt><dt><a href="/list.nhn">'
+        '</a></dt></ul><ul><dt><a href="/read.nhn?oid=001&aid=3"></a></dt></ul>'
+    )
+
+    # The empty containers should be skipped, and the duplicated articles should be
+    # listed once.
+    assert links == [
+        ("/read.nhn?oid=001&aid=0000000002", (1, 2)),
+        ("/list.nhn", None),
     ]
+    assert extract_article_links("<html></html>") == []
 
 
-def test_parsing_article_contents():
-    content = parse_article_content(_get_resource_content("article_html"))
+@pytest.mark.parametrize("backend", sorted(PARSER_BACKENDS))
+def test_parsing_article_contents(backend: str):
+    content = parse_article_content(
+        _get_resource_content("articles/naver_html"), True, backend=backend
+    )
     assert json.decoder.scanstring(content, 1)[0] == (
         '이재명 경기도지사가 19일 "지자체에 지역화폐가 확산하면 단점이 '
         '심화할 수 있다"고 지적한 국민의힘 윤희숙 의원을 향해 "언론 뒤에 '
@@ -62,3 +98,46 @@ def test_parsing_article_contents():
         "찍어누르려 하는 것은 한 나라의 지적 인프라를 위협하는 일인 동시에 "
         '본인들 식견의 얕음을 내보이는 일"이라고 날을 세웠다.'
     )
+
+
+@pytest.mark.parametrize("backend", sorted(PARSER_BACKENDS))
+def test_parsing_article_contents_without_reporter_name(backend: str):
+    document = _get_resource_content("articles/naver_html")
+    with_name = parse_article_content(document, True, backend=backend)
+    without_name = parse_article_content(document, False, backend=backend)
+
+    # The line-break after the first line should be kept.
+    assert without_name.count("\\n") == with_name.count("\\n")
+    assert parse_article_content(document, False, normalization=[]).count("\\n") > 4
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["articles/naver_html", "articles/edge_cases_html", "article_html", "nav_html"],
+)
+def test_parser_backends_equivalence(name: str):
+    # All parser backends should extract exactly the same text from the documents.
+    document = _get_resource_content(name)
+    contents = {backend: fn(document) for backend, fn in PARSER_BACKENDS.items()}
+    assert len(set(contents.values())) == 1
+
+
+@pytest.mark.parametrize("backend", sorted(PARSER_BACKENDS))
+def test_parsing_article_records(backend: str):
+    document = _get_resource_content("articles/naver_html")
+    record = parse_article_record(document, True, backend=backend)
+
+    assert record["title"] == '이재명, 자신 비판한 윤희숙에 "공개 토론하자"'
+    assert record["press"] == "디지털타임스"
+    assert record["date"] == "2020-09-19"
+    assert json.encoder.encode_basestring(record["content"]) == (
+        parse_article_content(document, True, backend=backend)
+    )
+
+
+@pytest.mark.parametrize("backend", sorted(PARSER_BACKENDS))
+def test_warm_up_parser(backend: str):
+    # The metrics of the warming up should not be sent with the first results.
+    worker_metrics.drain()
+    warm_up_parser(backend, ("sentences", "min_length=5"))
+    assert worker_metrics.drain() == ({}, {})
@@ -0,0 +1,56 @@
+import pytest
+
+from canrevan.planning import NavPlan, nav_group_pages
+
+
+def _groups(plan: NavPlan):
+    # Identify each page group by the category and date of its first page.
+    return [
+        tuple(param.split("=")[1] for param in pages[0].split("&")[2:4])
+        for pages in plan
+    ]
+
+
+def test_nav_plan_orders():
+    args = ([100, 101], "20200501", "20200503")
+
+    plan = NavPlan(*args, max_page=3)
+    assert len(plan) == 6
+    assert _groups(plan) == [
+        ("100", "20200503"),
+        ("101", "20200503"),
+        ("100", "20200502"),
+        ("101", "20200502"),
+        ("100", "20200501"),
+        ("101", "20200501"),
+    ]
+    assert [url[-6:] for url in next(iter(plan))] == ["page=1", "page=2", "page=3"]
+
+    assert _groups(NavPlan(*args, order="interleaved"))[:3] == [
+        ("100", "20200501"),
+        ("101", "20200501"),
+        ("100", "20200502"),
+    ]
+    assert _groups(NavPlan(*args, skip_days=2, order="category")) == [
+        ("100", "20200501"),
+        ("100", "20200503"),
+        ("101", "20200501"),
+        ("101", "20200503"),
+    ]
+
+    with pytest.raises(ValueError):
+        NavPlan(*args, order="random")
+
+
+def test_nav_plan_is_lazy():
+    # The groups of a long backfill should be created only when they are consumed.
+    plan = iter(NavPlan(range(100, 106), "20000101", "20991231"))
+    assert next(plan)[0].endswith("sid1=100&date=20991231&page=1")
+
+
+def test_nav_group_pages():
+    pages = next(iter(NavPlan([100], "20200501", "20200501", max_page=5)))
+
+    # The pages of the group should be restored from any page of the group.
+    assert nav_group_pages(pages[2]) == pages[:3]
+    assert nav_group_pages(pages[0]) == pages[:1]
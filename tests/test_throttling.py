@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from canrevan.throttling import (
+    AdaptiveLimiter,
+    RequestBudget,
+    parse_retry_after,
+    retry_delay,
+)
+
+
+def test_adaptive_limiter_window():
+    async def run():
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=8)
+
+        # The window should grow by one for each success before the first
+        # congestion.
+        started = await limiter.acquire("host")
+        limiter.release("host", started, succeeded=True)
+        assert limiter.limit("host") == 5
+
+        # The failures of the requests sent before the decrease should shrink the
+        # window only once.
+        started = [await limiter.acquire("host") for _ in range(4)]
+        for s in started:
+            limiter.release("host", s, succeeded=False)
+        assert limiter.limit("host") == 2.5
+
+        # The window should grow additively after the congestion.
+        started = await limiter.acquire("host")
+        limiter.release("host", started, succeeded=True)
+        assert limiter.limit("host") == 2.5 + 1 / 2.5
+
+        # The cancelled or rejected requests should not change the window.
+        started = await limiter.acquire("host")
+        limiter.release("host", started, succeeded=None)
+        assert limiter.limit("host") == 2.5 + 1 / 2.5
+        assert limiter.in_flight() == 0
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_adaptive_limiter_waits_for_window():
+    async def run():
+        limiter = AdaptiveLimiter(initial_limit=2)
+        first = await limiter.acquire("host")
+        await limiter.acquire("host")
+
+        # The third request should wait until one of the requests is finished.
+        waiting = asyncio.ensure_future(limiter.acquire("host"))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+
+        limiter.release("host", first, succeeded=True)
+        await asyncio.wait_for(waiting, 1)
+
+        # The windows of the other hosts should be independent.
+        await asyncio.wait_for(limiter.acquire("other"), 1)
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_request_budget():
+    async def run():
+        # The requests within the burst should be sent at once, and the others should
+        # be spread by the interval of the budget.
+        budget = RequestBudget(50, burst=2)
+        started = time.monotonic()
+        delays = await asyncio.gather(*[budget.acquire() for _ in range(6)])
+        elapsed = time.monotonic() - started
+
+        assert delays[:2] == [0, 0]
+        assert delays[2:] == sorted(delays[2:])
+        assert 0.07 <= elapsed < 0.5
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_retry_delay():
+    for attempt in range(10):
+        assert 0 <= retry_delay(attempt, 0.5, 4) <= min(0.5 * 2**attempt, 4)
+    assert retry_delay(0, 0.5, 4, retry_after=3) >= 3
+    assert retry_delay(0, 0.5, 4, retry_after=60) <= 4
+
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+    assert parse_retry_after(None) is None
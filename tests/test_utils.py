@@ -1,15 +1,35 @@
-from canrevan.utils import drange, is_normal_character, korean_character_ratio
+from canrevan.utils import (
+    batch_text_stats,
+    dcount,
+    decode_document,
+    drange,
+    is_normal_character,
+    korean_character_ratio,
+    normalize_article_url,
+    parse_article_category,
+    parse_article_id,
+    text_stats,
+)
 
 
 def test_drange():
-    assert drange("20200501", "20200531") == [
+    assert list(drange("20200501", "20200531")) == [
         "202005{:02d}".format(d) for d in range(1, 31 + 1)
     ]
-    assert drange("20200401", "20200531") == (
+    assert list(drange("20200401", "20200531")) == (
         ["202004{:02d}".format(d) for d in range(1, 30 + 1)]
         + ["202005{:02d}".format(d) for d in range(1, 31 + 1)]
     )
 
+    # The reversed dates should be the same as the forward ones, from the latest.
+    assert list(drange("20200501", "20200510", 4, reverse=True)) == [
+        "20200509",
+        "20200505",
+        "20200501",
+    ]
+    assert dcount("20200501", "20200510", 4) == 3
+    assert dcount("20200510", "20200501") == 0
+
 
 def test_korean_character_ratio():
     ratio = korean_character_ratio(
@@ -36,6 +56,33 @@ def test_korean_character_ratio():
     )
     assert ratio == 0
 
+    assert korean_character_ratio("") == 0
+    assert korean_character_ratio(" \n") == 0
+
+
+def test_text_stats():
+    stats = text_stats("한국어 text,\u3000힣힤 123。\n\n!")
+    assert stats.length == 20
+    assert stats.hangul == 4
+    assert stats.letters == 4
+    assert stats.digits == 3
+    assert stats.whitespaces == 5
+    assert stats.punctuations == 3
+    assert stats.line_lengths == (17, 0, 1)
+    assert stats.hangul_ratio == 4 / 15
+    assert stats.ascii_ratio == 9 / 15
+    assert stats.punctuation_density == 3 / 15
+    assert stats.normal_ratio == 11 / 15
+
+    # The statistics should be same as the ones counted for each character.
+    texts = ["", "\t\xa0\u2028", "Ａ１ ㄱ ・ “인용”", "𝔸😀가"]
+    for text, stats in zip(texts, batch_text_stats(texts)):
+        assert stats.hangul == sum("가" <= c <= "힣" for c in text)
+        assert stats.whitespaces == sum(c.isspace() for c in text)
+        assert stats.hangul + stats.letters + stats.digits == sum(
+            map(is_normal_character, text)
+        )
+
 
 def test_normal_characters():
     assert is_normal_character("하")
@@ -47,3 +94,49 @@ def test_normal_characters():
     assert not is_normal_character("(")
     assert not is_normal_character(".")
     assert not is_normal_character("'")
+
+
+def test_parse_article_id():
+    assert parse_article_id(
+        "https://news.naver.com/main/read.nhn?mode=LS2D&mid=shm"
+        "&sid1=100&sid2=265&oid=029&aid=0002625369"
+    ) == (29, 2625369)
+    assert parse_article_id(
+        "https://news.naver.com/main/read.nhn?aid=0011892040&oid=001"
+    ) == (1, 11892040)
+    assert parse_article_id("https://news.naver.com/main/read.nhn?oid=001") is None
+
+
+def test_parse_article_category():
+    assert (
+        parse_article_category(
+            "https://news.naver.com/main/read.nhn?mode=LS2D&mid=shm"
+            "&sid1=100&sid2=265&oid=029&aid=0002625369"
+        )
+        == 100
+    )
+    assert parse_article_category("https://news.naver.com/main/read.nhn") is None
+
+
+def test_decode_document():
+    assert decode_document("한국어".encode("utf-8")) == "한국어"
+    assert decode_document("한국어".encode("euc-kr"), "euc-kr") == "한국어"
+    assert decode_document("한국어".encode("cp949")) == "한국어"
+    assert decode_document("한국어".encode("utf-8"), "unknown") == "한국어"
+
+
+def test_normalize_article_url():
+    assert normalize_article_url(
+        "https://news.naver.com/main/read.nhn?mode=LS2D&mid=shm"
+        "&sid1=100&sid2=265&oid=29&aid=2625369"
+    ) == (
+        "https://news.naver.com/main/read.nhn?sid1=100&oid=029&aid=0002625369",
+        (29, 2625369),
+    )
+    assert normalize_article_url(
+        "http://localhost/read.nhn?aid=0000000002&oid=001"
+    ) == ("http://localhost/read.nhn?oid=001&aid=0000000002", (1, 2))
+    assert normalize_article_url("http://localhost/list.nhn?oid=001") == (
+        "http://localhost/list.nhn?oid=001",
+        None,
+    )
@@ -0,0 +1,250 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from canrevan.writing import ParquetWriter, ShardedWriter
+
+
+def test_sharded_writer_single_file():
+    with tempfile.TemporaryDirectory() as tdir:
+        with ShardedWriter(f"{tdir}/output.txt") as writer:
+            for i in range(10):
+                writer.write(f"line{i}")
+
+        with open(f"{tdir}/output.txt", "r") as fp:
+            assert fp.read().splitlines() == [f"line{i}" for i in range(10)]
+
+        # The lines should be appended to the previous output file.
+        with ShardedWriter(f"{tdir}/output.txt", append=True) as writer:
+            writer.write("line10")
+
+        with open(f"{tdir}/output.txt", "r") as fp:
+            assert fp.read().splitlines() == [f"line{i}" for i in range(11)]
+        assert not os.path.exists(f"{tdir}/output.manifest.json")
+
+
+def test_sharded_writer_rotation_and_manifest():
+    with tempfile.TemporaryDirectory() as tdir:
+        with ShardedWriter(
+            f"{tdir}/output.txt", shard_lines=4, compression="gzip"
+        ) as writer:
+            for i in range(10):
+                writer.write(f"line{i}")
+
+        with open(f"{tdir}/output.manifest.json", "r") as fp:
+            shards = json.load(fp)["shards"]
+        assert [shard["name"] for shard in shards] == [
+            "output-00000.txt.gz",
+            "output-00001.txt.gz",
+            "output-00002.txt.gz",
+        ]
+        assert [shard["lines"] for shard in shards] == [4, 4, 2]
+
+        # Check the sizes and checksums of the compressed shards.
+        lines = []
+        for shard in shards:
+            with open(f"{tdir}/{shard['name']}", "rb") as fp:
+                data = fp.read()
+            assert len(data) == shard["bytes"]
+            assert hashlib.sha256(data).hexdigest() == shard["sha256"]
+            lines += gzip.decompress(data).decode("utf-8").splitlines()
+        assert lines == [f"line{i}" for i in range(10)]
+
+        # The shard numbering should continue after the previous shards.
+        with ShardedWriter(
+            f"{tdir}/output.txt", shard_lines=4, compression="gzip", append=True
+        ) as writer:
+            writer.write("line10")
+
+        with open(f"{tdir}/output.manifest.json", "r") as fp:
+            shards = json.load(fp)["shards"]
+        assert len(shards) == 4 and shards[-1]["name"] == "output-00003.txt.gz"
+
+
+def test_sharded_writer_done_fn():
+    with tempfile.TemporaryDirectory() as tdir:
+        done = []
+        with ShardedWriter(f"{tdir}/output.txt", shard_lines=3) as writer:
+            for i in range(5):
+                writer.write(f"line{i}", lambda i=i: done.append(i))
+
+        # The lines should be notified only after they are recorded to the manifest
+        # with their shard.
+        assert done == list(range(5))
+        with open(f"{tdir}/output-00001.txt", "r") as fp:
+            assert fp.read().splitlines() == ["line3", "line4"]
+
+
+def test_sharded_writer_periodic_commit():
+    with tempfile.TemporaryDirectory() as tdir:
+        done = []
+        writer = ShardedWriter(
+            f"{tdir}/output.txt", compression="gzip", commit_interval=0.05
+        )
+        for i in range(3):
+            writer.write(f"line{i}", lambda i=i: done.append(i))
+        time.sleep(0.2)
+
+        # The lines of the unfinished shard should be committed after the interval,
+        # and the shard should be readable up to the committed lines.
+        assert done == [0, 1, 2]
+        with open(f"{tdir}/output.manifest.json", "r") as fp:
+            shard = json.load(fp)["shards"][0]
+        assert shard["partial"] and shard["lines"] == 3
+        with open(f"{tdir}/{shard['name']}", "rb") as fp:
+            data = fp.read(shard["bytes"])
+        assert gzip.decompress(data).decode("utf-8").splitlines() == [
+            "line0",
+            "line1",
+            "line2",
+        ]
+
+        # Simulate an interrupted crawling, which leaves the uncommitted data after
+        # the committed lines of the unfinished shard.
+        with open(f"{tdir}/output.manifest.json", "r") as fp:
+            manifest = fp.read()
+        writer.close()
+        with open(f"{tdir}/output.manifest.json", "w") as fp:
+            fp.write(manifest)
+        with open(f"{tdir}/{shard['name']}", "ab") as fp:
+            fp.write(b"uncommitted")
+
+        # The unfinished shard should be truncated to the committed lines and closed
+        # if appending.
+        with ShardedWriter(
+            f"{tdir}/output.txt", compression="gzip", append=True
+        ) as writer:
+            writer.write("line3")
+
+        with open(f"{tdir}/output.manifest.json", "r") as fp:
+            shards = json.load(fp)["shards"]
+        assert [shard["lines"] for shard in shards] == [3, 1]
+        assert "partial" not in shards[0]
+        lines = []
+        for shard in shards:
+            with open(f"{tdir}/{shard['name']}", "rb") as fp:
+                data = fp.read()
+            assert len(data) == shard["bytes"]
+            assert hashlib.sha256(data).hexdigest() == shard["sha256"]
+            lines += gzip.decompress(data).decode("utf-8").splitlines()
+        assert lines == [f"line{i}" for i in range(4)]
+
+
+def test_sharded_writer_commit_under_load():
+    with tempfile.TemporaryDirectory() as tdir:
+        blocked, release = threading.Event(), threading.Event()
+
+        def block_fn():
+            blocked.set()
+            release.wait()
+
+        # Keep the queue busy by blocking the writer while the lines are queued.
+        committed = []
+        writer = ShardedWriter(f"{tdir}/output.txt", commit_interval=0)
+        writer.write("line", block_fn)
+        assert blocked.wait(5)
+        for i in range(100):
+            writer.write(f"line{i}", lambda: committed.append(writer._queue.qsize()))
+        release.set()
+        writer.close()
+
+        # The single output file should be committed periodically even if the queue
+        # is never idle.
+        assert len(committed) == 100 and committed[0] > 50
+
+
+def test_sharded_writer_awrite_without_blocking():
+    with tempfile.TemporaryDirectory() as tdir:
+        blocked, release = threading.Event(), threading.Event()
+
+        def block_fn():
+            blocked.set()
+            release.wait()
+
+        writer = ShardedWriter(f"{tdir}/output.txt", max_queued_lines=1)
+        writer.write("line", block_fn)
+        assert blocked.wait(5)
+
+        # The event loop should keep running while waiting for the full queue, so
+        # the writer is released from the loop. The timer releases it otherwise.
+        async def write_lines():
+            asyncio.get_event_loop().call_later(0.05, release.set)
+            for i in range(3):
+                await writer.awrite(f"line{i}")
+
+        timer = threading.Timer(5, release.set)
+        timer.start()
+        loop = asyncio.new_event_loop()
+        try:
+            started = time.perf_counter()
+            loop.run_until_complete(write_lines())
+            assert time.perf_counter() - started < 1
+        finally:
+            loop.close()
+            timer.cancel()
+        writer.close()
+
+        with open(f"{tdir}/output.txt", "r") as fp:
+            assert fp.read().splitlines() == ["line", "line0", "line1", "line2"]
+
+
+def test_parquet_writer_row_groups():
+    parquet = pytest.importorskip("pyarrow.parquet")
+
+    with tempfile.TemporaryDirectory() as tdir:
+        done = []
+        schema = {"aid": "int64", "content": "string"}
+        with ParquetWriter(
+            f"{tdir}/output.parquet", schema, row_group_size=4
+        ) as writer:
+            for i in range(10):
+                writer.write({"aid": i, "content": f"line{i}"}, lambda: done.append(1))
+
+            # The records should be notified after the parquet file is closed.
+            writer.close()
+            assert len(done) == 10
+
+        table = parquet.ParquetFile(f"{tdir}/output.parquet")
+        assert table.metadata.num_row_groups == 3
+        assert table.read().to_pydict() == {
+            "aid": list(range(10)),
+            "content": [f"line{i}" for i in range(10)],
+        }
+
+        # The appended records should be written to the new part file.
+        with ParquetWriter(f"{tdir}/output.parquet", schema, append=True) as writer:
+            writer.write({"aid": 10, "content": "line10"})
+        assert parquet.read_table(f"{tdir}/output-00001.parquet").num_rows == 1
+
+
+def test_parquet_writer_rollover():
+    parquet = pytest.importorskip("pyarrow.parquet")
+
+    with tempfile.TemporaryDirectory() as tdir:
+        done = []
+        schema = {"aid": "int64", "content": "string"}
+        with ParquetWriter(
+            f"{tdir}/output.parquet", schema, row_group_size=2, file_row_groups=2
+        ) as writer:
+            for i in range(10):
+                writer.write({"aid": i, "content": f"line{i}"}, lambda: done.append(1))
+
+            # The records should be notified when each part file is closed.
+            time.sleep(0.2)
+            assert len(done) == 8
+
+        assert len(done) == 10
+        names = ["output.parquet", "output-00001.parquet", "output-00002.parquet"]
+        assert sorted(os.listdir(tdir)) == sorted(names)
+        assert [parquet.read_table(f"{tdir}/{name}").num_rows for name in names] == [
+            4,
+            4,
+            2,
+        ]